@@ -0,0 +1,69 @@
+"""Compare bytes on the wire and wall time of batch updates and list_rows
+with and without compressed bodies, against a local stub server that
+simulates a slow link.
+
+    python demo/compression_benchmark.py
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api import Base
+from stub_server import StubServer
+
+ROWS = 10000
+BANDWIDTH = 2 * 1024 * 1024  # bytes per second, a typical remote worker uplink
+
+
+def gen_updates():
+    return [{
+        'row_id': 'row%06d' % i,
+        'row': {
+            'Name': 'name-%d' % i,
+            'Number': i,
+            'Status': ['open', 'in progress', 'done'][i % 3],
+            'Notes': 'Imported from the nightly export, batch %d, see the ticket for details' % (i // 100),
+        },
+    } for i in range(ROWS)]
+
+
+def run_updates(server, compress_requests):
+    base = Base('stub-api-token', server.url, compress_requests=compress_requests)
+    base.auth()
+    updates = gen_updates()
+    server.reset_stats()
+    start = time.perf_counter()
+    result = base.batch_update_rows('Table1', updates)
+    elapsed = time.perf_counter() - start
+    assert result['success'] and server.stats['items_received'] == ROWS
+    return elapsed, server.stats['bytes_received']
+
+
+def run_iter_rows(server):
+    base = Base('stub-api-token', server.url)
+    base.auth()
+    server.reset_stats()
+    start = time.perf_counter()
+    rows = list(base.iter_rows('Table1'))
+    elapsed = time.perf_counter() - start
+    assert len(rows) == ROWS
+    return elapsed, server.stats['bytes_sent']
+
+
+def main():
+    print('%d rows, link of %.1f MB/s' % (ROWS, BANDWIDTH / 1024 / 1024))
+    with StubServer(total_rows=ROWS, bandwidth=BANDWIDTH) as server:
+        for compress_requests in (None, 'gzip', 'deflate'):
+            elapsed, sent = run_updates(server, compress_requests)
+            print('batch_update_rows, %-8s: %.3fs, %.1f KB sent' % (
+                compress_requests or 'plain', elapsed, sent / 1024))
+        elapsed, received = run_iter_rows(server)
+        print('iter_rows, plain           : %.3fs, %.1f KB received' % (elapsed, received / 1024))
+    with StubServer(total_rows=ROWS, bandwidth=BANDWIDTH, compress_responses=True) as server:
+        elapsed, received = run_iter_rows(server)
+        print('iter_rows, gzip            : %.3fs, %.1f KB received' % (elapsed, received / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Time convert_db_rows on a 100k row dtable-db result with select,
+link, link-formula and date columns, against the if / elif chain it
+used to run for every cell.
+
+    python demo/convert_benchmark.py
+"""
+import copy
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.utils import convert_db_rows, is_single_multiple_structure
+
+ROWS = 100000
+
+OPTIONS = [{'id': 'op%d' % i, 'name': 'option-%d' % i} for i in range(20)]
+
+METADATA = [
+    {'key': '_id', 'name': '_id', 'type': 'text'},
+    {'key': '0000', 'name': 'Name', 'type': 'text'},
+    {'key': '0001', 'name': 'Status', 'type': 'single-select', 'data': {'options': OPTIONS}},
+    {'key': '0002', 'name': 'Tags', 'type': 'multiple-select', 'data': {'options': OPTIONS}},
+    {'key': '0003', 'name': 'Link', 'type': 'link', 'data': {
+        'array_type': 'single-select', 'array_data': {'options': OPTIONS}}},
+    {'key': '0004', 'name': 'Lookup', 'type': 'link-formula', 'data': {
+        'array_type': 'multiple-select', 'array_data': {'options': OPTIONS}}},
+    {'key': '0005', 'name': 'Day', 'type': 'date', 'data': {'format': 'YYYY-MM-DD'}},
+    {'key': '0006', 'name': 'Time', 'type': 'date', 'data': {'format': 'YYYY-MM-DD HH:mm'}},
+]
+
+
+def legacy_convert_db_rows(metadata, results):
+    """ convert_db_rows before the converters were precompiled
+
+    :param metadata: list
+    :param results: list
+    :return: list
+    """
+    if not results:
+        return []
+    converted_results = []
+    column_map = {column['key']: column for column in metadata}
+    select_map = {}
+    for column in metadata:
+            is_sm_structure, column_options = is_single_multiple_structure(column)
+            if is_sm_structure:
+                column_data = column['data']
+                if not column_data:
+                    continue
+                column_key = column['key']
+                select_map[column_key] = {
+                    select['id']: select['name'] for select in column_options}
+
+    for result in results:
+        item = {}
+        for column_key, value in result.items():
+            if column_key in column_map:
+                column = column_map[column_key]
+                column_name = column['name']
+                column_type = column['type']
+                s_map = select_map.get(column_key)
+                if column_type == 'single-select' and value and s_map:
+                    item[column_name] = s_map.get(value, value)
+                elif column_type == 'multiple-select' and value and s_map:
+                    item[column_name] = [s_map.get(s, s) for s in value]
+                elif column_type == 'link' and value and s_map:
+                    new_data = []
+                    for s in value:
+                        old_display_value = s.get('display_value')
+                        if isinstance(old_display_value, list):
+                            s['display_value'] = old_display_value and [s_map.get(v, v) for v in old_display_value] or []
+                        else:
+                            s['display_value'] = s_map.get(old_display_value, old_display_value)
+                        new_data.append(s)
+                    item[column_name] = new_data
+                elif column_type == 'link-formula' and value and s_map:
+                    if isinstance(value[0], list):
+                        item[column_name] = [[s_map.get(v, v) for v in s] for s in value]
+                    else:
+                        item[column_name] = [s_map.get(s, s) for s in value]
+
+                elif column_type == 'date':
+                    try:
+                        if value:
+                            date_value = datetime.fromisoformat(value)
+                            date_format = column['data']['format']
+                            if date_format == 'YYYY-MM-DD':
+                                value = date_value.strftime('%Y-%m-%d')
+                            else:
+                                value = date_value.strftime('%Y-%m-%d %H:%M:%S')
+                        else:
+                            value = None
+                    except Exception as e:
+                        print('[Warning] format date:', e)
+                    item[column_name] = value
+                else:
+                    item[column_name] = value
+            else:
+                item[column_key] = value
+        converted_results.append(item)
+
+    return converted_results
+
+
+def gen_results():
+    return [{
+        '_id': 'row%06d' % i,
+        '0000': 'name-%d' % i,
+        '0001': 'op%d' % (i % 20),
+        '0002': ['op%d' % (i % 20), 'op%d' % (i % 7)],
+        '0003': [{'row_id': 'other%d' % i, 'display_value': 'op%d' % (i % 20)}],
+        '0004': [['op%d' % (i % 20)], ['op%d' % (i % 3)]],
+        '0005': '2024-01-%02dT00:00:00+00:00' % (i % 28 + 1),
+        '0006': '2024-01-%02dT%02d:30:00.000+00:00' % (i % 28 + 1, i % 24),
+    } for i in range(ROWS)]
+
+
+def run(convert, results):
+    start = time.perf_counter()
+    rows = convert(METADATA, results)
+    return time.perf_counter() - start, rows
+
+
+def main():
+    results = gen_results()
+    legacy_time, legacy_rows = run(legacy_convert_db_rows, copy.deepcopy(results))
+    # the first call compiles the converters, the following ones reuse them
+    first_time, rows = run(convert_db_rows, copy.deepcopy(results))
+    cached_time, rows = run(convert_db_rows, copy.deepcopy(results))
+    assert rows == legacy_rows
+
+    print('%d rows, %d columns' % (ROWS, len(METADATA)))
+    print('if / elif chain : %.3fs' % legacy_time)
+    print('first query     : %.3fs' % first_time)
+    print('cached          : %.3fs' % cached_time)
+    print('speedup         : %.2fx' % (legacy_time / cached_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compare peak memory of downloading a file into memory at once, as
+download_file used to, with the streamed download, against a local stub
+server, and resume a transfer that breaks off halfway.
+
+    python demo/download_benchmark.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api import Base, FileCache
+from stub_server import StubServer
+
+FILE_SIZE = 200 * 1024 * 1024
+DTABLE_FILE_URL = 'https://cloud.seatable.io/workspace/1/asset/6a4b12d7-5ab8-4d8e-9d6f-6c59f5b4e3a1/files/2024-01/file.bin'
+
+
+def download_in_memory(base, save_path):
+    """Mimics the old behaviour: the whole body is read before it is written"""
+    download_link = base.get_file_download_link('files/2024-01/file.bin')
+    response = base.session.get(download_link, timeout=base.timeout)
+    with open(save_path, 'wb') as f:
+        f.write(response.content)
+
+
+def measure(download):
+    tracemalloc.start()
+    start = time.perf_counter()
+    download()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp()
+    save_path = os.path.join(tmp_dir, 'file.bin')
+    with StubServer(file_size=FILE_SIZE) as server:
+        base = Base('stub-api-token', server.url, file_cache=FileCache(os.path.join(tmp_dir, 'cache')))
+        base.auth()
+
+        print('%d MB file' % (FILE_SIZE // 1024 // 1024))
+        elapsed, peak = measure(lambda: download_in_memory(base, save_path))
+        print('in memory : %.3fs, peak %.1f MB' % (elapsed, peak / 1024 / 1024))
+        os.remove(save_path)
+
+        server.break_download(FILE_SIZE // 2)
+        server.reset_stats()
+        elapsed, peak = measure(lambda: base.download_file(DTABLE_FILE_URL, save_path))
+        assert os.path.getsize(save_path) == FILE_SIZE
+        print('streamed  : %.3fs, peak %.1f MB, %d requests, broken off once and resumed' % (
+            elapsed, peak / 1024 / 1024, server.stats['downloads']))
+        os.remove(save_path)
+
+        server.reset_stats()
+        elapsed, peak = measure(lambda: base.download_file(DTABLE_FILE_URL, save_path))
+        assert os.path.getsize(save_path) == FILE_SIZE and server.stats['downloads'] == 0
+        print('cached    : %.3fs, peak %.1f MB, no download' % (elapsed, peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare peak memory and time of a chained queryset that shares its
+rows with one that deep-copies them at every step, as QuerySet used to.
+
+    python demo/queryset_memory_benchmark.py
+"""
+import copy
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.query import QuerySet
+
+ROWS = 50000
+
+COLUMNS = [
+    {'name': 'Name', 'type': 'text'},
+    {'name': 'Number', 'type': 'number'},
+    {'name': 'Done', 'type': 'checkbox'},
+    {'name': 'Tags', 'type': 'multiple-select'},
+]
+
+
+class DeepCopyQuerySet(QuerySet):
+    """Mimics the old behaviour: every step deep-copies rows and columns.
+    """
+
+    def _execute_conditions(self):
+        self.raw_rows = copy.deepcopy(self.raw_rows)
+        self.raw_columns = copy.deepcopy(self.raw_columns)
+        super(DeepCopyQuerySet, self)._execute_conditions()
+
+    def filter(self, conditions=''):
+        clone = self._clone()
+        clone.raw_rows = copy.deepcopy(self.rows)
+        clone.raw_columns = copy.deepcopy(self.raw_columns)
+        clone.conditions = conditions
+        clone._execute_conditions()
+        return clone
+
+
+def gen_rows():
+    return [{
+        '_id': 'row%06d' % i,
+        'Name': 'name-%d' % i,
+        'Number': i,
+        'Done': i % 2 == 0,
+        'Tags': ['tag-%d' % (i % 7), 'tag-%d' % (i % 11)],
+    } for i in range(ROWS)]
+
+
+def run(queryset_class):
+    queryset = queryset_class(None, 'Table1')
+    queryset.raw_rows = gen_rows()
+    queryset.raw_columns = COLUMNS
+    queryset._execute_conditions()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    matched = queryset.filter('Number > 100').filter('Done = true')
+    row = (len(matched), matched.first())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, row
+
+
+def main():
+    deepcopy_time, deepcopy_peak, deepcopy_row = run(DeepCopyQuerySet)
+    shared_time, shared_peak, shared_row = run(QuerySet)
+    assert deepcopy_row == shared_row
+
+    print('%d rows, .filter().filter(), len() and first()' % ROWS)
+    print('deepcopy : %.3fs, peak %.1f MB' % (deepcopy_time, deepcopy_peak / 1024 / 1024))
+    print('shared   : %.3fs, peak %.1f MB' % (shared_time, shared_peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
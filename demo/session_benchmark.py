@@ -0,0 +1,60 @@
+"""Compare the pooled base session with one connection per call
+against a local stub server.
+
+    python demo/session_benchmark.py
+"""
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api import Base
+from stub_server import StubServer
+
+CALLS = 500
+
+
+class PerCallSession(object):
+    """Mimics the old behaviour: every call goes through the module-level
+    requests functions and opens a fresh connection.
+    """
+
+    def get(self, *args, **kwargs):
+        return requests.get(*args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return requests.post(*args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        return requests.put(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return requests.delete(*args, **kwargs)
+
+
+def run(server, session=None):
+    base = Base('stub-api-token', server.url, session=session)
+    base.auth()
+    server.reset_stats()
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        base.list_rows('Table1', limit=10)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(server.stats['connections'])
+
+
+def main():
+    with StubServer() as server:
+        per_call_time, per_call_conns = run(server, session=PerCallSession())
+        pooled_time, pooled_conns = run(server)
+
+    print('%d list_rows calls' % CALLS)
+    print('per-call : %.3fs, %d connections' % (per_call_time, per_call_conns))
+    print('pooled   : %.3fs, %d connections' % (pooled_time, pooled_conns))
+    print('speedup  : %.2fx' % (per_call_time / pooled_time))
+
+
+if __name__ == '__main__':
+    main()
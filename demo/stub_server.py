@@ -0,0 +1,283 @@
+"""A minimal local stand-in for dtable-web / dtable-server / dtable-db,
+used by the benchmark scripts in this folder. It only knows the handful
+of endpoints the benchmarks touch and answers with generated data.
+"""
+import gzip
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+
+DTABLE_UUID = '6a4b12d7-5ab8-4d8e-9d6f-6c59f5b4e3a1'
+
+
+def gen_rows(start, limit, total):
+    return [{
+        '_id': 'row%06d' % i,
+        'Name': 'name-%d' % i,
+        'Number': i,
+    } for i in range(start, min(start + limit, total))]
+
+
+METADATA = {
+    'tables': [{
+        '_id': '0000',
+        'name': 'Table1',
+        'columns': [
+            {'key': '0000', 'name': 'Name', 'type': 'text', 'data': None},
+            {'key': '0001', 'name': 'Number', 'type': 'number', 'data': None},
+        ],
+        'views': [{'_id': '0000', 'name': 'Default View'}],
+    }],
+}
+
+FILE_CHUNK = bytes(range(256)) * 4096
+
+
+def gen_file_bytes(start, end):
+    """The bytes start..end of a generated file, in chunks of up to 1 MB"""
+    while start < end:
+        offset = start % len(FILE_CHUNK)
+        chunk = FILE_CHUNK[offset:offset + end - start]
+        yield chunk
+        start += len(chunk)
+
+
+QUERY_METADATA = [
+    {'key': '_id', 'name': '_id', 'type': 'text'},
+    {'key': '0000', 'name': 'Name', 'type': 'text'},
+    {'key': '0001', 'name': 'Number', 'type': 'number'},
+]
+
+
+def gen_query_results(sql, total):
+    match = re.search(r'limit\s+(\d+)(?:\s+offset\s+(\d+))?', sql, re.IGNORECASE)
+    limit = int(match.group(1)) if match else 100
+    offset = int(match.group(2) or 0) if match else 0
+    return [{
+        '_id': row['_id'], '0000': row['Name'], '0001': row['Number'],
+    } for row in gen_rows(offset, limit, total)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one segment, avoids delayed-ACK stalls on keep-alive
+    wbufsize = 64 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def _transfer(self, size):
+        # simulate a link of server.bandwidth bytes per second
+        if self.server.bandwidth:
+            time.sleep(size / self.server.bandwidth)
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.compress_responses and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self._transfer(len(body))
+        self.server.stats['bytes_sent'] += len(body)
+        self.wfile.write(body)
+
+    def _send_file(self, size):
+        self.server.stats['downloads'] += 1
+        start = 0
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range') or '')
+        if match:
+            start = int(match.group(1))
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%d' % size)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        # bytes sent before the connection is dropped, to simulate a broken transfer
+        cut_after = self.server.cut_downloads.pop(0) if self.server.cut_downloads else None
+        sent = 0
+        for chunk in gen_file_bytes(start, size):
+            if cut_after is not None and sent + len(chunk) > cut_after:
+                self.wfile.write(chunk[:cut_after - sent])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(chunk)
+            sent += len(chunk)
+        self.server.stats['bytes_sent'] += sent
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self._transfer(len(body))
+        self.server.stats['bytes_received'] += len(body)
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        return body
+
+    def _handle(self):
+        self.server.stats['requests'] += 1
+        self.server.stats['connections'].add(self.client_address)
+        body = self._read_body()
+        if self.server.fail_statuses:
+            status = self.server.fail_statuses.pop(0)
+            body = json.dumps({'error_msg': 'stub failure'}).encode('utf-8')
+            self.send_response(status)
+            if status == 429 and self.server.retry_after is not None:
+                self.send_header('Retry-After', self.server.retry_after)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = parse.urlparse(self.path)
+        if url.path.startswith('/seafhttp/files/'):
+            return self._send_file(self.server.file_size)
+        if url.path.startswith('/seafhttp/upload-api/'):
+            if url.path != '/seafhttp/upload-api/stub-upload-%d' % self.server.upload_link_version:
+                return self._send_json({'error': 'Access denied'}, status=403)
+            self.server.stats['uploads'] += 1
+            match = re.search(rb'filename="([^"]*)"\r\nContent-Type: [^\r]*\r\n\r\n', body)
+            size = len(body) - match.end() - len(body.rsplit(b'\r\n--', 1)[1]) - 4
+            return self._send_json([{'name': match.group(1).decode('utf-8'), 'size': size}])
+        authorization = self.headers.get('Authorization') or ''
+        if authorization.startswith('Token stub-jwt-token-') and \
+                authorization != 'Token stub-jwt-token-%d' % self.server.token_version:
+            return self._send_json({'error_msg': 'Token expired.'}, status=403)
+        query = dict(parse.parse_qsl(url.query))
+        server_url = 'http://%s:%s' % self.server.server_address
+
+        if url.path == '/api2/auth-token/':
+            return self._send_json({'token': 'stub-account-token'})
+        if url.path.endswith('/temp-api-token/'):
+            return self._send_json({'api_token': 'stub-api-token'})
+        if url.path == '/api/v2.1/dtable/app-access-token/':
+            self.server.stats['auths'] += 1
+            return self._send_json({
+                'app_name': 'stub',
+                'access_token': 'stub-jwt-token-%d' % self.server.token_version,
+                'dtable_uuid': DTABLE_UUID,
+                'dtable_server': server_url + '/dtable-server/',
+                'dtable_db': server_url + '/dtable-db/',
+                'workspace_id': 1,
+                'dtable_name': 'stub',
+                'use_api_gateway': self.server.use_api_gateway,
+            })
+        if url.path.endswith('/app-upload-link/'):
+            self.server.stats['upload_links'] += 1
+            return self._send_json({
+                'upload_link': server_url + '/seafhttp/upload-api/stub-upload-%d' % self.server.upload_link_version,
+                'parent_path': '/asset/' + DTABLE_UUID,
+                'img_relative_path': 'images/2024-01',
+                'file_relative_path': 'files/2024-01',
+            })
+        if url.path.endswith('/app-download-link/'):
+            return self._send_json({'download_link': server_url + '/seafhttp/files/stub-token/file.bin'})
+        if url.path.endswith('/metadata/'):
+            return self._send_json({'metadata': METADATA})
+        if url.path.endswith('/columns/') and self.command == 'GET':
+            return self._send_json({'columns': METADATA['tables'][0]['columns']})
+        if url.path.endswith('/rows/') and self.command == 'GET':
+            start = int(query.get('start') or 0)
+            # like dtable-server, at most 1000 rows per request
+            limit = min(int(query.get('limit') or 1000), 1000)
+            return self._send_json({'rows': gen_rows(start, limit, self.server.total_rows)})
+        if '/api/v1/query/' in url.path:
+            sql = json.loads(body).get('sql', '')
+            self.server.stats['queries'].append(sql)
+            return self._send_json({
+                'success': True,
+                'metadata': QUERY_METADATA,
+                'results': gen_query_results(sql, self.server.total_rows),
+            })
+        if body:
+            payload = json.loads(body)
+            self.server.stats['items_received'] += len(payload.get('rows') or payload.get('updates') or [])
+        return self._send_json({'success': True})
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+
+
+class StubServer(object):
+
+    def __init__(self, total_rows=1000, compress_responses=False, bandwidth=None, file_size=1024 * 1024,
+                 latency=None):
+        """
+        :param latency: float, seconds every request waits before it is answered
+        :param file_size: int, bytes of the file behind every download link
+        :param compress_responses: bool, gzip responses to clients that accept it
+        :param bandwidth: int, simulated bytes per second of request and response bodies
+        """
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.total_rows = total_rows
+        # statuses answered, one per request, before the stub responds normally
+        self.httpd.fail_statuses = []
+        # Retry-After header of a failed 429, None to leave it out
+        self.httpd.retry_after = '1'
+        self.httpd.token_version = 0
+        self.httpd.use_api_gateway = False
+        self.httpd.compress_responses = compress_responses
+        self.httpd.bandwidth = bandwidth
+        self.httpd.file_size = file_size
+        self.httpd.latency = latency
+        self.httpd.upload_link_version = 0
+        # per download, bytes sent before the connection is dropped
+        self.httpd.cut_downloads = []
+        self.reset_stats()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self.httpd.server_address
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    def reset_stats(self):
+        self.httpd.stats = {
+            'requests': 0, 'connections': set(), 'bytes_received': 0, 'bytes_sent': 0, 'items_received': 0,
+            'auths': 0, 'downloads': 0, 'uploads': 0, 'upload_links': 0, 'queries': [],
+        }
+
+    def expire_tokens(self):
+        """Reject every access token issued so far as expired"""
+        self.httpd.token_version += 1
+
+    def expire_upload_links(self):
+        """Reject every upload link issued so far"""
+        self.httpd.upload_link_version += 1
+
+    def break_download(self, after):
+        """Drop the connection of the next download after `after` bytes"""
+        self.httpd.cut_downloads.append(after)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -8,13 +8,10 @@ api_token = '48b6a41a0c2e1ee4bf294ed42445914025a0a60c'
 def sync_mysql():
     """Sync database into the table
     """
-    # seatable data
     base = Base(api_token, server_url)
     base.auth()
 
     table_name = 'Table1'
-    rows = base.list_rows(table_name)
-    row_keys = [row.get('Name') for row in rows]
 
     # mysql data
     host = 'localhost'
@@ -28,13 +25,10 @@ def sync_mysql():
         cursor.execute(sql)
         mysql_data = cursor.fetchall()
 
-    # sync
-    for item in mysql_data:
-        if item.get('name') not in row_keys:
-            row_data = {
-                'Name': item.get('name'),
-            }
-            base.append_row(table_name, row_data)
+    # sync, only rows changed since the last run are read from and written to the table
+    source_rows = [{'Name': item.get('name')} for item in mysql_data]
+    report = base.sync_rows(table_name, source_rows, key='Name', state_path='sync_state.json')
+    print(report)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+"""Compare uploading a folder of files one by one with upload_local_file,
+one upload link per file, against upload_files, one upload link for the
+batch and several files at a time, on a local stub server with 20 ms of
+latency per request. Then upload the same logo once per row, with an
+upload index that sends it only once.
+
+    python demo/upload_benchmark.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api import Base, UploadIndex
+from stub_server import StubServer
+
+FILES = 200
+FILE_SIZE = 64 * 1024
+LATENCY = 0.02
+WORKERS = 8
+
+
+def gen_files():
+    folder = tempfile.mkdtemp()
+    paths = []
+    for i in range(FILES):
+        path = os.path.join(folder, 'image-%04d.jpg' % i)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(FILE_SIZE))
+        paths.append(path)
+    return paths
+
+
+def main():
+    paths = gen_files()
+    with StubServer(latency=LATENCY) as server:
+        base = Base('stub-api-token', server.url, pool_size=WORKERS)
+        base.auth()
+
+        server.reset_stats()
+        start = time.perf_counter()
+        sequential = [base.upload_local_file(path, file_type='image') for path in paths]
+        sequential_time = time.perf_counter() - start
+        sequential_requests = server.stats['requests']
+
+        server.reset_stats()
+        start = time.perf_counter()
+        parallel = base.upload_files(paths, file_type='image', workers=WORKERS)
+        parallel_time = time.perf_counter() - start
+        assert parallel == sequential and all(info['size'] == FILE_SIZE for info in parallel)
+
+        print('%d files of %d KB, %d ms latency' % (FILES, FILE_SIZE // 1024, LATENCY * 1000))
+        print('upload_local_file        : %.3fs, %d requests' % (sequential_time, sequential_requests))
+        print('upload_files, %d workers  : %.3fs, %d requests' % (WORKERS, parallel_time, server.stats['requests']))
+
+        base.upload_index = UploadIndex(':memory:')
+        logo = os.urandom(FILE_SIZE)
+        server.reset_stats()
+        start = time.perf_counter()
+        infos = [base.upload_bytes_file('logo-%d.png' % i, logo, file_type='image') for i in range(FILES)]
+        elapsed = time.perf_counter() - start
+        assert len(set(info['url'] for info in infos)) == 1
+        print('same logo per row, index : %.3fs, %d requests, %d KB sent' % (
+            elapsed, server.stats['requests'], server.stats['bytes_received'] // 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 from .main import SeaTableAPI, Account
+from .rate_limit import RateLimiter
+from .cache import MetadataCache, FileCache
+from .dedup import UploadIndex
+from .async_main import AsyncSeaTableAPI
 from .context import context
 from .date_utils import dateutils
 from .convert_airtable import AirtableConvertor
 
 
 Base = SeaTableAPI
+AsyncBase = AsyncSeaTableAPI
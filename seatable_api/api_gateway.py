@@ -1,11 +1,10 @@
-import requests
+from .constants import ColumnTypes
+from .columnar import convert_rows_columns
+from .request_builder import APIGatewayRequestBuilder, query_result
+from .session import gen_session, send_request
 
-from .constants import ROW_FILTER_KEYS, ColumnTypes
-from .constants import RENAME_COLUMN, RESIZE_COLUMN, FREEZE_COLUMN, MOVE_COLUMN, MODIFY_COLUMN_TYPE, DELETE_COLUMN
-from .utils import convert_db_rows, parse_response, like_table_id, parse_headers
 
-
-class APIGateway(object):
+class APIGateway(APIGatewayRequestBuilder):
     """SeaTable API
     """
 
@@ -15,7 +14,10 @@ class APIGateway(object):
             api_gateway_url,
             server_url,
             headers,
-            dtable_uuid
+            dtable_uuid,
+            session=None,
+            metadata_cache=None,
+            compress_requests=None
     ):
 
 
@@ -26,75 +28,31 @@ class APIGateway(object):
         self._cache_table_name_id_map = {}
         self.token = token
         self.timeout = 30
+        self.session = session or gen_session()
+        self.metadata_cache = metadata_cache
+        self.compress_requests = compress_requests
 
-    def _metadata_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/metadata/'
-
-    def _table_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/tables/'
-
-    def _view_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/views/'
-
-    def _row_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/rows/'
-
-    def _batch_row_server_url(self):
-        return self._row_server_url()
-
-    def _batch_update_row_server_url(self):
-        return self._row_server_url()
-
-    def _batch_delete_row_server_url(self):
-        return self._row_server_url()
-
-    def _filtered_rows_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/filtered-rows/'
-
-    def _row_link_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/links/'
-
-    def _query_links_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/query-links/'
-
-    def _batch_update_row_link_server_url(self):
-        return self._row_link_server_url()
-
-    def _column_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/columns/'
+    def _send(self, request):
+        return request.result(send_request(self, request))
 
-    def _column_options_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/column-options/'
-
-    def _column_cascade_setting_server_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/column-cascade-settings/'
-
-    def _dtable_db_query_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/sql'
-
-    def _dtable_db_insert_rows_url(self):
-        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/add-archived-rows/'
-
-    def _send_toast_notification_url(self):
-        return '%(dtable_server_url)s/api/v2/dtables/%(dtable_uuid)s/ui-toasts/' % {
-            'dtable_server_url': self.api_gateway_url,
-            'dtable_uuid': self.dtable_uuid
-        }
+    def _get_metadata(self):
+        return self._send(self._metadata_request())
 
     def get_metadata(self):
         """
         :return: dict
         """
-        url = self._metadata_server_url()
-        response = requests.get(url, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('metadata')
+        if self.metadata_cache is not None:
+            return self.metadata_cache.get(self._get_metadata)
+        return self._get_metadata()
 
     def list_tables(self):
         meta = self.get_metadata()
         return meta.get('tables') or []
 
     def get_table_by_name(self, table_name):
+        if self.metadata_cache is not None:
+            return self.metadata_cache.get_table(self._get_metadata, table_name)
         tables = self.list_tables()
         for t in tables:
             if t.get('name') == table_name:
@@ -106,91 +64,34 @@ class APIGateway(object):
         :param lang: str, currently 'en' for English, and 'zh-cn' for Chinese
         :param columns: list
         """
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-            'lang': lang,
-        }
-        if columns:
-            json_data['columns'] = columns
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._add_table_request(table_name, lang, columns))
 
     def rename_table(self, table_name, new_table_name):
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-            'new_table_name': new_table_name
-        }
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._rename_table_request(table_name, new_table_name))
 
     def delete_table(self, table_name):
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-        }
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_table_request(table_name))
 
     def list_views(self, table_name):
-        url = self._view_server_url()
-        params = {
-            'table_name': table_name
-        }
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._list_views_request(table_name))
 
     def get_view_by_name(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        response = requests.get(view_url, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._get_view_by_name_request(table_name, view_name))
 
 
     def add_view(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'table_name': table_name
-        })
-        json_data = {
-            'name': view_name
-        }
-        response = requests.post(view_url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._add_view_request(table_name, view_name))
 
 
     def rename_view(self, table_name, view_name, new_view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        json_data = {
-            'name': new_view_name
-        }
-        response = requests.put(view_url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._rename_view_request(table_name, view_name, new_view_name))
 
 
     def delete_view(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        response = requests.delete(view_url, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_view_request(table_name, view_name))
 
 
-    def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None):
+    def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None, format='rows'):
         """
         :param table_name: str
         :param view_name: str
@@ -198,28 +99,13 @@ class APIGateway(object):
         :param desc: boolean
         :param start: int
         :param limit: int
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_rows_columns
         :return: list
         """
-        url = self._row_server_url()
-        params = {
-            'table_name': table_name,
-            'convert_keys': True
-        }
-
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        if view_name:
-            params['view_name'] = view_name
-        if order_by:
-            params['order_by'] = order_by
-            params['direction'] = 'desc' if desc else 'asc'
-        if start:
-            params['start'] = start
-        if limit:
-            params['limit'] = limit
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('rows')
+        rows = self._send(self._list_rows_request(table_name, view_name, order_by, desc, start, limit))
+        if format != 'rows':
+            return convert_rows_columns(self.list_columns(table_name, view_name), rows or [], format)
+        return rows
 
 
     def get_row(self, table_name, row_id):
@@ -228,17 +114,7 @@ class APIGateway(object):
         :param row_id: str
         :return: dict
         """
-        url = self._row_server_url() + row_id + '/'
-        params = {
-            'table_name': table_name,
-            'convert_keys': True
-        }
-
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._get_row_request(table_name, row_id))
 
 
     def append_row(self, table_name, row_data, apply_default=None):
@@ -246,18 +122,7 @@ class APIGateway(object):
         :param table_name: str
         :param row_data: dict
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'rows': [row_data,]
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if apply_default is not None:
-            json_data['apply_default'] = apply_default
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('first_row')
+        return self._send(self._append_row_request(table_name, row_data, apply_default))
 
 
     def batch_append_rows(self, table_name, rows_data, apply_default=None):
@@ -265,17 +130,7 @@ class APIGateway(object):
         :param table_name: str
         :param rows_data: dict
         """
-        url = self._batch_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'rows': rows_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if apply_default is not None:
-            json_data['apply_default'] = apply_default
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_append_rows_request(table_name, rows_data, apply_default))
 
 
     def insert_row(self, table_name, row_data, anchor_row_id, apply_default=None):
@@ -284,7 +139,7 @@ class APIGateway(object):
         :param row_data: dict
         :param anchor_row_id: str
         """
-        return self.append_row(table_name, row_data, apply_default=apply_default)
+        return self._send(self._insert_row_request(table_name, row_data, anchor_row_id, apply_default))
 
 
     def update_row(self, table_name, row_id, row_data):
@@ -293,16 +148,7 @@ class APIGateway(object):
         :param row_id: str
         :param row_data: dict
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'updates': [{
-                'row_id': row_id,
-                'row': row_data
-            }]
-        }
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._update_row_request(table_name, row_id, row_data))
 
 
     def batch_update_rows(self, table_name, rows_data):
@@ -311,15 +157,7 @@ class APIGateway(object):
         :param rows_data: list
         :return:
         """
-        url = self._batch_update_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'updates': rows_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_update_rows_request(table_name, rows_data))
 
 
     def delete_row(self, table_name, row_id):
@@ -327,15 +165,7 @@ class APIGateway(object):
         :param table_name: str
         :param row_id: str
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row_ids' : [row_id, ]
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_row_request(table_name, row_id))
 
 
     def batch_delete_rows(self, table_name, row_ids):
@@ -343,15 +173,7 @@ class APIGateway(object):
         :param table_name: str
         :param row_ids: list
         """
-        url = self._batch_delete_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row_ids': row_ids,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_delete_rows_request(table_name, row_ids))
 
 
     def filter_rows(self, table_name, filters, view_name=None, filter_conjunction='And'):
@@ -362,39 +184,7 @@ class APIGateway(object):
         :param filter_conjunction: str, 'And' or 'Or'
         :return: list
         """
-        # params check
-        if not filters:
-            raise ValueError('filters can not be empty.')
-        if not isinstance(filters, list):
-            raise ValueError('filters invalid.')
-        if len(filters) != len([f for f in filters if isinstance(f, dict)]):
-            raise ValueError('filters invalid.')
-
-        for f in filters:
-            for key in f.keys():
-                if key not in ROW_FILTER_KEYS:
-                    raise ValueError('filters invalid.')
-
-        if filter_conjunction not in ['And', 'Or']:
-            raise ValueError('filter_conjunction invalid, filter_conjunction must be '
-                             '"And" or "Or"')
-
-        params = {
-            'table_name': table_name,
-        }
-        if view_name:
-            params['view_name'] = view_name
-
-        json_data = {
-            'filters': filters,
-            'filter_conjunction': filter_conjunction,
-        }
-
-        url = self._filtered_rows_server_url()
-        response = requests.get(
-            url, json=json_data, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('rows')
+        return self._send(self._filter_rows_request(table_name, filters, view_name, filter_conjunction))
 
 
     def add_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
@@ -405,21 +195,8 @@ class APIGateway(object):
         :param row_id: str
         :param other_row_id: str
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': {row_id: [other_row_id, ]}
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
-    
+        return self._send(self._add_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
 
     def batch_add_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
         """
@@ -428,20 +205,7 @@ class APIGateway(object):
         :param other_table_name: str
         :param other_rows_ids_map: dict
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_add_links_request(link_id, table_name, other_table_name, other_rows_ids_map))
 
 
     def remove_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
@@ -452,20 +216,8 @@ class APIGateway(object):
         :param row_id: str
         :param other_row_id: str
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': {row_id: [other_row_id, ]}
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
-    
+        return self._send(self._remove_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
 
     def batch_remove_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
         """
@@ -474,20 +226,7 @@ class APIGateway(object):
         :param other_table_name: str
         :param other_rows_ids_map: dict
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_remove_links_request(link_id, table_name, other_table_name, other_rows_ids_map))
 
 
     def update_link(self, link_id, table_name, other_table_name, row_id, other_rows_ids):
@@ -498,23 +237,7 @@ class APIGateway(object):
         :param row_id: str
         :param other_rows_ids: list
         """
-        if not isinstance(other_rows_ids, list):
-            raise ValueError('params other_rows_ids requires type list')
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'row_id_list': [row_id, ],
-            'other_rows_ids_map': {row_id: other_rows_ids}
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._update_link_request(link_id, table_name, other_table_name, row_id, other_rows_ids))
 
 
     def batch_update_links(self, link_id, table_name, other_table_name, row_id_list, other_rows_ids_map):
@@ -525,20 +248,8 @@ class APIGateway(object):
         :param row_id_list: []
         :param other_rows_ids_map: dict
         """
-        url = self._batch_update_row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'row_id_list': row_id_list,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_update_links_request(link_id, table_name, other_table_name, row_id_list,
+                                                           other_rows_ids_map))
 
 
     def get_linked_records(self, table_id, link_column_key, rows):
@@ -547,14 +258,7 @@ class APIGateway(object):
         :param link_column_key: str
         :param rows: list
         """
-        url = self._query_links_server_url()
-        json_data = {
-            'table_id': table_id,
-            'link_column_key': link_column_key,
-            'rows': rows,
-        }
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._linked_records_request(table_id, link_column_key, rows))
 
 
     def list_columns(self, table_name, view_name=None):
@@ -563,20 +267,18 @@ class APIGateway(object):
         :param view_name: str
         :return: list
         """
-        url = self._column_server_url()
-        params = {
-            'table_name': table_name,
-        }
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        if view_name:
-            params['view_name'] = view_name
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('columns')
+        if self.metadata_cache is not None and not view_name:
+            table = self.metadata_cache.get_table(self._get_metadata, table_name)
+            if table:
+                return table.get('columns')
+        return self._send(self._list_columns_request(table_name, view_name))
 
 
     def get_column_link_id(self, table_name, column_name):
+        if self.metadata_cache is not None:
+            column = self.metadata_cache.get_column(self._get_metadata, table_name, column_name)
+            if column and column.get('type') == 'link':
+                return column.get('data', {}).get('link_id')
         columns = self.list_columns(table_name)
         for column in columns:
             if column.get('name') == column_name and column.get('type') == 'link':
@@ -585,6 +287,10 @@ class APIGateway(object):
 
 
     def get_column_by_name(self, table_name, column_name):
+        if self.metadata_cache is not None:
+            column = self.metadata_cache.get_column(self._get_metadata, table_name, column_name)
+            if column and column.get('name') == column_name:
+                return column
         columns = self.list_columns(table_name)
         for col in columns:
             if col.get('name') == column_name:
@@ -608,23 +314,7 @@ class APIGateway(object):
         :param column_data: dict, config information of column
         :return: dict
         """
-        if column_type not in ColumnTypes:
-            raise ValueError("type %s invalid!" % (column_type,))
-        url = self._column_server_url()
-        json_data = {
-            'table_name': table_name,
-            'column_name': column_name,
-            'column_type': column_type.value
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if column_key:
-            json_data['anchor_column'] = column_key
-        if column_data:
-            json_data['column_data'] = column_data
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._insert_column_request(table_name, column_name, column_type, column_key, column_data))
 
 
     def rename_column(self, table_name, column_key, new_column_name):
@@ -634,18 +324,7 @@ class APIGateway(object):
         :param new_column_name: str
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': RENAME_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_name': new_column_name
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._rename_column_request(table_name, column_key, new_column_name))
 
 
     def resize_column(self, table_name, column_key, new_column_width):
@@ -656,18 +335,7 @@ class APIGateway(object):
         :param new_column_width: int
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': RESIZE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_width': new_column_width
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._resize_column_request(table_name, column_key, new_column_width))
 
 
     def freeze_column(self, table_name, column_key, frozen):
@@ -677,18 +345,7 @@ class APIGateway(object):
         :param frozen: bool
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': FREEZE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'frozen': frozen
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._freeze_column_request(table_name, column_key, frozen))
 
 
     def move_column(self, table_name, column_key, target_column_key):
@@ -698,18 +355,7 @@ class APIGateway(object):
         :param target_column_key: bool
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': MOVE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'target_column': target_column_key
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._move_column_request(table_name, column_key, target_column_key))
 
 
     def modify_column_type(self, table_name, column_key, new_column_type):
@@ -719,22 +365,7 @@ class APIGateway(object):
         :param new_column_type: str
         :return: dict
         """
-        if new_column_type not in ColumnTypes:
-            raise ValueError("type %s invalid!" % (new_column_type,))
-        if new_column_type == ColumnTypes.LINK:
-            raise ValueError("Switching to link column type is not allowed!")
-        url = self._column_server_url()
-        json_data = {
-            'op_type': MODIFY_COLUMN_TYPE,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_type': new_column_type.value
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._modify_column_type_request(table_name, column_key, new_column_type))
 
 
     def add_column_options(self, table_name, column, options):
@@ -743,17 +374,7 @@ class APIGateway(object):
         :param column: str
         :param options: list
         """
-        url = self._column_options_server_url()
-        json_data = {
-            "table_name": table_name,
-            "column": column,
-            "options": options
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._add_column_options_request(table_name, column, options))
 
 
     def add_column_cascade_settings(self, table_name, child_column, parent_column, cascade_settings):
@@ -765,18 +386,8 @@ class APIGateway(object):
         :param cascade_settings: dict
         :return:
         """
-        url = self._column_cascade_setting_server_url()
-        json_data = {
-            "table_name": table_name,
-            "child_column": child_column,
-            "parent_column": parent_column,
-            "cascade_settings": cascade_settings
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._add_column_cascade_settings_request(table_name, child_column, parent_column,
+                                                                    cascade_settings))
 
 
     def delete_column(self, table_name, column_key):
@@ -785,56 +396,21 @@ class APIGateway(object):
         :param column_key: str
         :return: None
         """
-        url = self._column_server_url()
-        json_data = {
-            'table_name': table_name,
-            'column': column_key
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._delete_column_request(table_name, column_key))
 
 
-    def query(self, sql, convert=True):
+    def query(self, sql, convert=True, format='rows'):
         """
         :param sql: str
         :param convert: bool
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_db_columns
         :return: list
         """
-        if not sql:
-            raise ValueError('sql can not be empty.')
-        url = self._dtable_db_query_url()
-        json_data = {'sql': sql}
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        if not data.get('success'):
-            raise Exception(data.get('error_message'))
-        metadata = data.get('metadata')
-        results = data.get('results')
-        if convert:
-            converted_results = convert_db_rows(metadata, results)
-            return converted_results
-        else:
-            return results
+        return query_result(self._send(self._query_request(sql)), convert, format)
 
     def send_toast_notification(self, username, msg, toast_type='success'):
-        url = self._send_toast_notification_url()
-        requests.post(url, json={
-            'to_user': username,
-            'toast_type': toast_type,
-            'detail': {
-                'msg': str(msg)
-            }
-        }, headers=self.headers)
+        send_request(self, self._toast_notification_request(username, msg, toast_type))
 
 
     def big_data_insert_rows(self, table_name, rows_data):
-        url = self._dtable_db_insert_rows_url()
-        json_data = {
-            'table_name': table_name,
-            'rows': rows_data,
-        }
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._big_data_insert_rows_request(table_name, rows_data))
@@ -0,0 +1,364 @@
+from .constants import ColumnTypes
+from .columnar import convert_rows_columns
+from .request_builder import APIGatewayRequestBuilder, query_result
+from .session import gen_async_session, gen_retry_policy, send_request_async, DEFAULT_MAX_RETRIES
+
+
+class AsyncAPIGateway(APIGatewayRequestBuilder):
+    """SeaTable API Gateway, asyncio version
+    """
+
+    def __init__(
+            self,
+            token,
+            api_gateway_url,
+            server_url,
+            headers,
+            dtable_uuid,
+            session=None,
+            max_retries=DEFAULT_MAX_RETRIES,
+            compress_requests=None
+    ):
+
+        self.api_gateway_url = api_gateway_url
+        self.server_url = server_url
+        self.headers = headers
+        self.dtable_uuid = dtable_uuid
+        self.token = token
+        self.timeout = 30
+        self.session = session or gen_async_session(max_retries=max_retries)
+        self.max_retries = gen_retry_policy(max_retries)
+        self.compress_requests = compress_requests
+
+    async def _send(self, request):
+        return request.result(await send_request_async(self, request))
+
+    async def get_metadata(self):
+        """
+        :return: dict
+        """
+        return await self._send(self._metadata_request())
+
+    async def list_tables(self):
+        meta = await self.get_metadata()
+        return meta.get('tables') or []
+
+    async def get_table_by_name(self, table_name):
+        tables = await self.list_tables()
+        for t in tables:
+            if t.get('name') == table_name:
+                return t
+
+    async def add_table(self, table_name, lang='en', columns=[]):
+        """
+        :param table_name: str
+        :param lang: str, currently 'en' for English, and 'zh-cn' for Chinese
+        :param columns: list
+        """
+        return await self._send(self._add_table_request(table_name, lang, columns))
+
+    async def rename_table(self, table_name, new_table_name):
+        return await self._send(self._rename_table_request(table_name, new_table_name))
+
+    async def delete_table(self, table_name):
+        return await self._send(self._delete_table_request(table_name))
+
+    async def list_views(self, table_name):
+        return await self._send(self._list_views_request(table_name))
+
+    async def get_view_by_name(self, table_name, view_name):
+        return await self._send(self._get_view_by_name_request(table_name, view_name))
+
+    async def add_view(self, table_name, view_name):
+        return await self._send(self._add_view_request(table_name, view_name))
+
+    async def rename_view(self, table_name, view_name, new_view_name):
+        return await self._send(self._rename_view_request(table_name, view_name, new_view_name))
+
+    async def delete_view(self, table_name, view_name):
+        return await self._send(self._delete_view_request(table_name, view_name))
+
+    async def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None,
+                        format='rows'):
+        """
+        :param table_name: str
+        :param view_name: str
+        :param order_by: str
+        :param desc: boolean
+        :param start: int
+        :param limit: int
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_rows_columns
+        :return: list
+        """
+        rows = await self._send(self._list_rows_request(table_name, view_name, order_by, desc, start, limit))
+        if format != 'rows':
+            return convert_rows_columns(await self.list_columns(table_name, view_name), rows or [], format)
+        return rows
+
+    async def get_row(self, table_name, row_id):
+        """
+        :param table_name: str
+        :param row_id: str
+        :return: dict
+        """
+        return await self._send(self._get_row_request(table_name, row_id))
+
+    async def append_row(self, table_name, row_data, apply_default=None):
+        """
+        :param table_name: str
+        :param row_data: dict
+        """
+        return await self._send(self._append_row_request(table_name, row_data, apply_default))
+
+    async def batch_append_rows(self, table_name, rows_data, apply_default=None):
+        """
+        :param table_name: str
+        :param rows_data: dict
+        """
+        return await self._send(self._batch_append_rows_request(table_name, rows_data, apply_default))
+
+    async def insert_row(self, table_name, row_data, anchor_row_id, apply_default=None):
+        """
+        :param table_name: str
+        :param row_data: dict
+        :param anchor_row_id: str
+        """
+        return await self._send(self._insert_row_request(table_name, row_data, anchor_row_id, apply_default))
+
+    async def update_row(self, table_name, row_id, row_data):
+        """
+        :param table_name: str
+        :param row_id: str
+        :param row_data: dict
+        """
+        return await self._send(self._update_row_request(table_name, row_id, row_data))
+
+    async def batch_update_rows(self, table_name, rows_data):
+        """
+        :param table_name: str
+        :param rows_data: list
+        :return:
+        """
+        return await self._send(self._batch_update_rows_request(table_name, rows_data))
+
+    async def delete_row(self, table_name, row_id):
+        """
+        :param table_name: str
+        :param row_id: str
+        """
+        return await self._send(self._delete_row_request(table_name, row_id))
+
+    async def batch_delete_rows(self, table_name, row_ids):
+        """
+        :param table_name: str
+        :param row_ids: list
+        """
+        return await self._send(self._batch_delete_rows_request(table_name, row_ids))
+
+    async def filter_rows(self, table_name, filters, view_name=None, filter_conjunction='And'):
+        """
+        :param table_name: str
+        :param view_name: str
+        :param filters: list
+        :param filter_conjunction: str, 'And' or 'Or'
+        :return: list
+        """
+        return await self._send(self._filter_rows_request(table_name, filters, view_name, filter_conjunction))
+
+    async def add_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_row_id: str
+        """
+        return await self._send(self._add_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
+    async def batch_add_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param other_rows_ids_map: dict
+        """
+        return await self._send(self._batch_add_links_request(link_id, table_name, other_table_name,
+                                                              other_rows_ids_map))
+
+    async def remove_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_row_id: str
+        """
+        return await self._send(self._remove_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
+    async def batch_remove_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param other_rows_ids_map: dict
+        """
+        return await self._send(self._batch_remove_links_request(link_id, table_name, other_table_name,
+                                                                 other_rows_ids_map))
+
+    async def update_link(self, link_id, table_name, other_table_name, row_id, other_rows_ids):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_rows_ids: list
+        """
+        return await self._send(self._update_link_request(link_id, table_name, other_table_name, row_id,
+                                                          other_rows_ids))
+
+    async def batch_update_links(self, link_id, table_name, other_table_name, row_id_list, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id_list: []
+        :param other_rows_ids_map: dict
+        """
+        return await self._send(self._batch_update_links_request(link_id, table_name, other_table_name, row_id_list,
+                                                           other_rows_ids_map))
+
+    async def get_linked_records(self, table_id, link_column_key, rows):
+        """
+        :param table_id:  str
+        :param link_column_key: str
+        :param rows: list
+        """
+        return await self._send(self._linked_records_request(table_id, link_column_key, rows))
+
+    async def list_columns(self, table_name, view_name=None):
+        """
+        :param table_name: str
+        :param view_name: str
+        :return: list
+        """
+        return await self._send(self._list_columns_request(table_name, view_name))
+
+    async def get_column_link_id(self, table_name, column_name):
+        columns = await self.list_columns(table_name)
+        for column in columns:
+            if column.get('name') == column_name and column.get('type') == 'link':
+                return column.get('data', {}).get('link_id')
+        raise ValueError('link type column "%s" does not exist in current table' % column_name)
+
+    async def get_column_by_name(self, table_name, column_name):
+        columns = await self.list_columns(table_name)
+        for col in columns:
+            if col.get('name') == column_name:
+                return col
+
+    async def get_columns_by_type(self, table_name, column_type: ColumnTypes):
+        if column_type not in ColumnTypes:
+            raise ValueError("type %s invalid!" % (column_type,))
+        columns = await self.list_columns(table_name)
+        cols_results = [col for col in columns if col.get('type') == column_type.value]
+        return cols_results
+
+    async def insert_column(self, table_name, column_name, column_type, column_key=None, column_data=None):
+        """
+        :param table_name: str
+        :param column_name: str
+        :param column_type: ColumnType enum
+        :param column_key: str, which you want to insert after
+        :param column_data: dict, config information of column
+        :return: dict
+        """
+        return await self._send(self._insert_column_request(table_name, column_name, column_type, column_key,
+                                                            column_data))
+
+    async def rename_column(self, table_name, column_key, new_column_name):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param new_column_name: str
+        :return: dict
+        """
+        return await self._send(self._rename_column_request(table_name, column_key, new_column_name))
+
+    async def resize_column(self, table_name, column_key, new_column_width):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param new_column_width: int
+        :return: dict
+        """
+        return await self._send(self._resize_column_request(table_name, column_key, new_column_width))
+
+    async def freeze_column(self, table_name, column_key, frozen):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param frozen: bool
+        :return: dict
+        """
+        return await self._send(self._freeze_column_request(table_name, column_key, frozen))
+
+    async def move_column(self, table_name, column_key, target_column_key):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param target_column_key: bool
+        :return: dict
+        """
+        return await self._send(self._move_column_request(table_name, column_key, target_column_key))
+
+    async def modify_column_type(self, table_name, column_key, new_column_type):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param new_column_type: str
+        :return: dict
+        """
+        return await self._send(self._modify_column_type_request(table_name, column_key, new_column_type))
+
+    async def add_column_options(self, table_name, column, options):
+        """
+        :param table_name: str
+        :param column: str
+        :param options: list
+        """
+        return await self._send(self._add_column_options_request(table_name, column, options))
+
+    async def add_column_cascade_settings(self, table_name, child_column, parent_column, cascade_settings):
+        """
+
+        :param table_name:  str
+        :param child_column: str
+        :param parent_column: str
+        :param cascade_settings: dict
+        :return:
+        """
+        return await self._send(self._add_column_cascade_settings_request(table_name, child_column, parent_column,
+                                                                    cascade_settings))
+
+    async def delete_column(self, table_name, column_key):
+        """
+        :param table_name: str
+        :param column_key: str
+        :return: None
+        """
+        return await self._send(self._delete_column_request(table_name, column_key))
+
+    async def query(self, sql, convert=True, format='rows'):
+        """
+        :param sql: str
+        :param convert: bool
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_db_columns
+        :return: list
+        """
+        return query_result(await self._send(self._query_request(sql)), convert, format)
+
+    async def send_toast_notification(self, username, msg, toast_type='success'):
+        await send_request_async(self, self._toast_notification_request(username, msg, toast_type))
+
+    async def big_data_insert_rows(self, table_name, rows_data):
+        return await self._send(self._big_data_insert_rows_request(table_name, rows_data))
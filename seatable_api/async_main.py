@@ -0,0 +1,769 @@
+import asyncio
+import functools
+import inspect
+import io
+from urllib import parse
+from uuid import UUID
+
+from .async_api_gateway import AsyncAPIGateway
+from .auth import AccessToken
+from .exception import AuthExpiredError, BaseUnauthError
+from .constants import BATCH_CHUNK_SIZE, ColumnTypes
+from .columnar import convert_rows_columns
+from .download import stream_download_async
+from .request_builder import BaseRequestBuilder, query_result
+from .session import gen_async_session, gen_retry_policy, send_request_async, DEFAULT_ASYNC_POOL_SIZE, \
+    DEFAULT_MAX_RETRIES
+from .utils import parse_server_url, parse_headers, send_in_chunks_async, chunk_arguments
+
+
+async def call_with_auth_refresh(obj, func, *args, **kwargs):
+    """Refresh the access token of obj before it expires, and once more
+    when the server still rejects it as expired
+    """
+    if obj.access_token.expires_soon():
+        await obj.refresh_auth()
+    jwt_token = obj.jwt_token
+    try:
+        return await func(*args, **kwargs)
+    except AuthExpiredError:
+        await obj.refresh_auth(expired_token=jwt_token)
+        return await func(*args, **kwargs)
+
+def check_auth(func):
+
+    @functools.wraps(func)
+    async def wrapper(obj, *args, **kwargs):
+        if not obj.is_authed:
+            raise BaseUnauthError
+        return await call_with_auth_refresh(obj, func, obj, *args, **kwargs)
+    return wrapper
+
+def api_gateway_wrapper(func):
+    @functools.wraps(func)
+    async def wrapper(obj, *args, **kwargs):
+        if obj.use_api_gateway:
+            new_obj = obj.api_gateway
+            return await getattr(new_obj, func.__name__)(*args, **kwargs)
+        return await func(obj, *args, **kwargs)
+    return wrapper
+
+def batch_chunked(items_arg, items_map_arg=None):
+    """Send the `items_arg` list of a batch method in server-sized chunks,
+    see main.batch_chunked, `workers` chunks are in flight at a time
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(obj, *args, chunk_size=None, workers=None, **kwargs):
+            bound = signature.bind(obj, *args, **kwargs)
+            items = bound.arguments[items_arg] or []
+
+            async def send_chunk(chunk):
+                chunk_args, chunk_kwargs = chunk_arguments(signature, bound, items_arg, items_map_arg, chunk)
+                return await call_with_auth_refresh(obj, func, *chunk_args, **chunk_kwargs)
+
+            return await send_in_chunks_async(items, send_chunk, chunk_size or obj.batch_chunk_size,
+                                              workers or obj.batch_workers)
+        return wrapper
+    return decorator
+
+
+class AsyncSeaTableAPI(BaseRequestBuilder):
+    """SeaTable API, asyncio version
+
+    Mirrors SeaTableAPI, every request method is a coroutine and all of
+    them share one httpx connection pool, e.g.
+
+        async with AsyncSeaTableAPI(token, server_url) as base:
+            await base.auth()
+            rows = await base.list_rows('Table1')
+
+    The requests are built by the same code as SeaTableAPI's. Rate
+    limiters and metadata caches are not supported.
+    """
+
+    def __init__(self, token, server_url, session=None, pool_size=DEFAULT_ASYNC_POOL_SIZE, keep_alive=True,
+                 max_retries=DEFAULT_MAX_RETRIES, compress_requests=None):
+        """
+        :param token: str
+        :param server_url: str
+        :param session: httpx.AsyncClient, shared connection pool, created if not given
+        :param pool_size: int, max connections kept open in total
+        :param keep_alive: bool
+        :param max_retries: int or RetryPolicy, retries of rate limited or failed requests
+        :param compress_requests: str, 'gzip' or 'deflate' to compress large batch request bodies,
+            only if the server accepts compressed bodies
+        """
+        self.token = token
+        self.server_url = parse_server_url(server_url)
+        self.dtable_server_url = None
+        self.dtable_db_url = None
+        self.access_token = AccessToken()
+        self.refresh_lock = asyncio.Lock()
+        self.headers = None
+        self.workspace_id = None
+        self.dtable_uuid = None
+        self.dtable_name = None
+        self.timeout = 30
+        self.is_authed = False
+        self.session = session or gen_async_session(pool_size=pool_size, keep_alive=keep_alive,
+                                                    max_retries=max_retries)
+        self.max_retries = gen_retry_policy(max_retries)
+        self.compress_requests = compress_requests
+        self.batch_chunk_size = BATCH_CHUNK_SIZE
+        self.batch_workers = 1
+
+        self.use_api_gateway = False
+        self.api_gateway = None
+
+    def __str__(self):
+        return '<SeaTable Async Base [ %s ]>' % self.dtable_name
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Close the connection pool, shared with all clones
+        """
+        await self.session.aclose()
+
+    def _clone(self):
+        clone = self.__class__(self.token, self.server_url, session=self.session, max_retries=self.max_retries,
+                               compress_requests=self.compress_requests)
+        clone.dtable_server_url = self.dtable_server_url
+        clone.dtable_db_url = self.dtable_db_url
+        clone.access_token = self.access_token
+        clone.refresh_lock = self.refresh_lock
+        clone.headers = self.headers
+        clone.workspace_id = self.workspace_id
+        clone.dtable_uuid = self.dtable_uuid
+        clone.dtable_name = self.dtable_name
+        clone.timeout = self.timeout
+        clone.is_authed = self.is_authed
+        clone.batch_chunk_size = self.batch_chunk_size
+        clone.batch_workers = self.batch_workers
+
+        clone.use_api_gateway = self.use_api_gateway
+        clone.api_gateway = self.api_gateway
+        return clone
+
+    @property
+    def jwt_token(self):
+        return self.access_token.jwt_token
+
+    @jwt_token.setter
+    def jwt_token(self, jwt_token):
+        self._set_access_token(jwt_token)
+
+    @property
+    def jwt_exp(self):
+        return self.access_token.jwt_exp
+
+    @jwt_exp.setter
+    def jwt_exp(self, jwt_exp):
+        self.access_token.jwt_exp = jwt_exp
+
+    async def _send(self, request):
+        return request.result(await send_request_async(self, request))
+
+    async def _get_app_access_token(self):
+        return await self._send(self._app_access_token_request())
+
+    def _set_access_token(self, jwt_token):
+        # updates the headers shared with the clones and api gateway in place
+        self.access_token.set(jwt_token, parse_headers(jwt_token))
+        self.headers = self.access_token.headers
+
+    async def auth(self):
+        """Auth to SeaTable
+        """
+        data = await self._get_app_access_token()
+
+        self.dtable_server_url = parse_server_url(data.get('dtable_server'))
+        self.dtable_db_url = parse_server_url(data.get('dtable_db', ''))
+        self._set_access_token(data.get('access_token'))
+        self.workspace_id = data.get('workspace_id')
+        self.dtable_uuid = data.get('dtable_uuid')
+        self.dtable_name = data.get('dtable_name')
+
+        # api gateway entry, same routing decision as SeaTableAPI.auth
+        self.use_api_gateway = data.get('use_api_gateway')
+        if self.use_api_gateway:
+            self.api_gateway = AsyncAPIGateway(
+                token = self.token,
+                api_gateway_url=self.server_url + '/api-gateway',
+                server_url=self.server_url,
+                headers=self.headers,
+                dtable_uuid=self.dtable_uuid,
+                session=self.session,
+                max_retries=self.max_retries,
+                compress_requests=self.compress_requests
+            )
+
+        self.is_authed = True
+
+    async def refresh_auth(self, expired_token=None):
+        """Fetch a new access token for this base, its clones and api gateway,
+        see SeaTableAPI.refresh_auth
+
+        :param expired_token: str, the token a request was rejected with
+        """
+        async with self.refresh_lock:
+            if expired_token is None:
+                if not self.access_token.expires_soon():
+                    return
+            elif expired_token != self.access_token.jwt_token:
+                return
+            data = await self._get_app_access_token()
+            self._set_access_token(data.get('access_token'))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_metadata(self):
+        """
+        :return: dict
+        """
+        return await self._send(self._metadata_request())
+
+
+    @check_auth
+    @api_gateway_wrapper
+    async def list_tables(self):
+        meta = await self.get_metadata()
+        return meta.get('tables') or []
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_table_by_name(self, table_name):
+        tables = await self.list_tables()
+        for t in tables:
+            if t.get('name') == table_name:
+                return t
+
+    @check_auth
+    @api_gateway_wrapper
+    async def add_table(self, table_name, lang='en', columns=[]):
+        """
+        :param table_name: str
+        :param lang: str, currently 'en' for English, and 'zh-cn' for Chinese
+        :param columns: list
+        """
+        return await self._send(self._add_table_request(table_name, lang, columns))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def rename_table(self, table_name, new_table_name):
+        return await self._send(self._rename_table_request(table_name, new_table_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def delete_table(self, table_name):
+        return await self._send(self._delete_table_request(table_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def list_views(self, table_name):
+        return await self._send(self._list_views_request(table_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_view_by_name(self, table_name, view_name):
+        return await self._send(self._get_view_by_name_request(table_name, view_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def add_view(self, table_name, view_name):
+        return await self._send(self._add_view_request(table_name, view_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def rename_view(self, table_name, view_name, new_view_name):
+        return await self._send(self._rename_view_request(table_name, view_name, new_view_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def delete_view(self, table_name, view_name):
+        return await self._send(self._delete_view_request(table_name, view_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None,
+                        format='rows'):
+        """
+        :param table_name: str
+        :param view_name: str
+        :param order_by: str
+        :param desc: boolean
+        :param start: int
+        :param limit: int
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_rows_columns
+        :return: list
+        """
+        rows = await self._send(self._list_rows_request(table_name, view_name, order_by, desc, start, limit))
+        if format != 'rows':
+            return convert_rows_columns(await self.list_columns(table_name, view_name), rows or [], format)
+        return rows
+
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_row(self, table_name, row_id):
+        """
+        :param table_name: str
+        :param row_id: str
+        :return: dict
+        """
+        return await self._send(self._get_row_request(table_name, row_id))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def append_row(self, table_name, row_data, apply_default=None):
+        """
+        :param table_name: str
+        :param row_data: dict
+        """
+        return await self._send(self._append_row_request(table_name, row_data, apply_default))
+
+    @check_auth
+    @batch_chunked('rows_data')
+    @api_gateway_wrapper
+    async def batch_append_rows(self, table_name, rows_data, apply_default=None):
+        """
+        :param table_name: str
+        :param rows_data: list or iterable of dict, sent in chunks of chunk_size rows
+        :return: dict, merged responses, per-chunk results under 'chunks'
+        """
+        return await self._send(self._batch_append_rows_request(table_name, rows_data, apply_default))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def insert_row(self, table_name, row_data, anchor_row_id, apply_default=None):
+        """
+        :param table_name: str
+        :param row_data: dict
+        :param anchor_row_id: str
+        """
+        return await self._send(self._insert_row_request(table_name, row_data, anchor_row_id, apply_default))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def update_row(self, table_name, row_id, row_data):
+        """
+        :param table_name: str
+        :param row_id: str
+        :param row_data: dict
+        """
+        return await self._send(self._update_row_request(table_name, row_id, row_data))
+
+    @check_auth
+    @batch_chunked('rows_data')
+    @api_gateway_wrapper
+    async def batch_update_rows(self, table_name, rows_data):
+        """
+        :param table_name: str
+        :param rows_data: list or iterable of dict, sent in chunks of chunk_size rows
+        :return: dict, merged responses, per-chunk results under 'chunks'
+        """
+        return await self._send(self._batch_update_rows_request(table_name, rows_data))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def delete_row(self, table_name, row_id):
+        """
+        :param table_name: str
+        :param row_id: str
+        """
+        return await self._send(self._delete_row_request(table_name, row_id))
+
+    @check_auth
+    @batch_chunked('row_ids')
+    @api_gateway_wrapper
+    async def batch_delete_rows(self, table_name, row_ids):
+        """
+        :param table_name: str
+        :param row_ids: list or iterable of str, sent in chunks of chunk_size ids
+        :return: dict, merged responses, per-chunk results under 'chunks'
+        """
+        return await self._send(self._batch_delete_rows_request(table_name, row_ids))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def filter_rows(self, table_name, filters, view_name=None, filter_conjunction='And'):
+        """
+        :param table_name: str
+        :param view_name: str
+        :param filters: list
+        :param filter_conjunction: str, 'And' or 'Or'
+        :return: list
+        """
+        return await self._send(self._filter_rows_request(table_name, filters, view_name, filter_conjunction))
+
+    @check_auth
+    async def get_file_download_link(self, path):
+        """
+        :param path: str
+        :return: str
+        """
+        return await self._send(self._file_download_link_request(path))
+
+    @check_auth
+    async def get_file_upload_link(self):
+        """
+        :return: dict
+        """
+        return await self._send(self._file_upload_link_request())
+
+    @check_auth
+    @api_gateway_wrapper
+    async def add_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_row_id: str
+        """
+        return await self._send(self._add_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def batch_add_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param other_rows_ids_map: dict
+        """
+        return await self._send(self._batch_add_links_request(link_id, table_name, other_table_name,
+                                                              other_rows_ids_map))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def remove_link(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_row_id: str
+        """
+        return await self._send(self._remove_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def batch_remove_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param other_rows_ids_map: dict
+        """
+        return await self._send(self._batch_remove_links_request(link_id, table_name, other_table_name,
+                                                                 other_rows_ids_map))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def update_link(self, link_id, table_name, other_table_name, row_id, other_rows_ids):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id: str
+        :param other_rows_ids: list
+        """
+        return await self._send(self._update_link_request(link_id, table_name, other_table_name, row_id,
+                                                          other_rows_ids))
+
+    @check_auth
+    @batch_chunked('row_id_list', 'other_rows_ids_map')
+    @api_gateway_wrapper
+    async def batch_update_links(self, link_id, table_name, other_table_name, row_id_list, other_rows_ids_map):
+        """
+        :param link_id: str
+        :param table_name: str
+        :param other_table_name: str
+        :param row_id_list: list or iterable of str, sent in chunks of chunk_size ids
+        :param other_rows_ids_map: dict
+        :return: dict, merged responses, per-chunk results under 'chunks'
+        """
+        return await self._send(self._batch_update_links_request(link_id, table_name, other_table_name, row_id_list,
+                                                           other_rows_ids_map))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_linked_records(self, table_id, link_column_key, rows):
+        """
+        :param table_id:  str
+        :param link_column_key: str
+        :param rows: list
+        """
+        return await self._send(self._linked_records_request(table_id, link_column_key, rows))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def list_columns(self, table_name, view_name=None):
+        """
+        :param table_name: str
+        :param view_name: str
+        :return: list
+        """
+        return await self._send(self._list_columns_request(table_name, view_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_column_link_id(self, table_name, column_name):
+        columns = await self.list_columns(table_name)
+        for column in columns:
+            if column.get('name') == column_name and column.get('type') == 'link':
+                return column.get('data', {}).get('link_id')
+        raise ValueError('link type column "%s" does not exist in current table' % column_name)
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_column_by_name(self, table_name, column_name):
+        columns = await self.list_columns(table_name)
+        for col in columns:
+            if col.get('name') == column_name:
+                return col
+
+    @check_auth
+    @api_gateway_wrapper
+    async def get_columns_by_type(self, table_name, column_type:ColumnTypes):
+        if column_type not in ColumnTypes:
+            raise ValueError("type %s invalid!" % (column_type,))
+        columns = await self.list_columns(table_name)
+        cols_results = [col for col in columns if col.get('type') == column_type.value]
+        return cols_results
+
+
+    @check_auth
+    @api_gateway_wrapper
+    async def insert_column(self, table_name, column_name, column_type, column_key=None, column_data=None):
+        """
+        :param table_name: str
+        :param column_name: str
+        :param column_type: ColumnType enum
+        :param column_key: str, which you want to insert after
+        :param column_data: dict, config information of column
+        :return: dict
+        """
+        return await self._send(self._insert_column_request(table_name, column_name, column_type, column_key,
+                                                            column_data))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def rename_column(self, table_name, column_key, new_column_name):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param new_column_name: str
+        :return: dict
+        """
+        return await self._send(self._rename_column_request(table_name, column_key, new_column_name))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def resize_column(self, table_name, column_key, new_column_width):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param old_column_width: int
+        :param new_column_width: int
+        :return: dict
+        """
+        return await self._send(self._resize_column_request(table_name, column_key, new_column_width))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def freeze_column(self, table_name, column_key, frozen):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param frozen: bool
+        :return: dict
+        """
+        return await self._send(self._freeze_column_request(table_name, column_key, frozen))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def move_column(self, table_name, column_key, target_column_key):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param target_column_key: bool
+        :return: dict
+        """
+        return await self._send(self._move_column_request(table_name, column_key, target_column_key))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def modify_column_type(self, table_name, column_key, new_column_type):
+        """
+        :param table_name: str
+        :param column_key: str
+        :param new_column_type: str
+        :return: dict
+        """
+        return await self._send(self._modify_column_type_request(table_name, column_key, new_column_type))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def add_column_options(self, table_name, column, options):
+        """
+        :param table_name: str
+        :param column: str
+        :param options: list
+        """
+        return await self._send(self._add_column_options_request(table_name, column, options))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def add_column_cascade_settings(self, table_name, child_column, parent_column, cascade_settings):
+        """
+
+        :param table_name:  str
+        :param child_column: str
+        :param parent_column: str
+        :param cascade_settings: dict
+        :return:
+        """
+        return await self._send(self._add_column_cascade_settings_request(table_name, child_column, parent_column,
+                                                                    cascade_settings))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def delete_column(self, table_name, column_key):
+        """
+        :param table_name: str
+        :param column_key: str
+        :return: None
+        """
+        return await self._send(self._delete_column_request(table_name, column_key))
+
+    @check_auth
+    async def download_file(self, url, save_path):
+        if not str(UUID(self.dtable_uuid)) in url:
+            raise Exception('url invalid.')
+        path = url.split(str(UUID(self.dtable_uuid)))[-1].strip('/')
+        path = parse.unquote(path)
+        await stream_download_async(self.session, lambda: self.get_file_download_link(path), save_path,
+                                    timeout=self.timeout, key=self.dtable_uuid + '/' + path)
+
+    async def _upload_file(self, upload_link_dict, name, stream, file_type='file', replace=False):
+        """Post one file, streamed from stream, to an upload link of get_file_upload_link
+
+        :return: info dict of uploaded file
+        """
+        relative_path = self._upload_relative_path(upload_link_dict, file_type)
+        d = (await self._send(self._upload_request(upload_link_dict, name, stream, relative_path, replace)))[0]
+        return self._uploaded_file_info(relative_path, name, d, file_type)
+
+    @check_auth
+    async def upload_bytes_file(self, name, content: bytes, relative_path=None, file_type='file', replace=False):
+        """
+        file_type: if relative is None, file type must in ['image', 'file'], default 'file'
+        return: info dict of uploaded file
+        """
+        if file_type not in ['image', 'file']:
+            raise Exception('relative or file_type invalid.')
+        upload_link_dict = await self.get_file_upload_link()
+        return await self._upload_file(upload_link_dict, name, io.BytesIO(content), file_type, replace)
+
+    @check_auth
+    async def upload_local_file(self, file_path, name=None, relative_path=None, file_type='file', replace=False):
+        """
+        file_type: if relative is None, file type must in ['image', 'file'], default 'file'
+        return: info dict of uploaded file
+        """
+        if file_type not in ['image', 'file']:
+            raise Exception('file_type invalid.')
+        if not name:
+            name = file_path.strip('/').split('/')[-1]
+        upload_link_dict = await self.get_file_upload_link()
+        with open(file_path, 'rb') as f:
+            return await self._upload_file(upload_link_dict, name, f, file_type, replace)
+
+    @check_auth
+    @api_gateway_wrapper
+    async def query(self, sql, convert=True, format='rows'):
+        """
+        :param sql: str
+        :param convert: bool
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_db_columns
+        :return: list
+        """
+        return query_result(await self._send(self._query_request(sql)), convert, format)
+
+    @check_auth
+    async def get_related_users(self):
+        return await self._send(self._related_users_request())
+
+    @check_auth
+    @api_gateway_wrapper
+    async def send_toast_notification(self, username, msg, toast_type='success'):
+        await send_request_async(self, self._toast_notification_request(username, msg, toast_type))
+
+    @check_auth
+    async def add_workflow_task(self, workflow_token, row_data, initiator=None, link_rows=None, new_linked_rows=None):
+        return await self._send(self._add_workflow_task_request(workflow_token, row_data, initiator, link_rows,
+                                                                new_linked_rows))
+
+    @check_auth
+    async def add_workflow_task_with_existed_row(self, workflow_token, row_id, initiator=None):
+        return await self._send(self._add_workflow_task_with_existed_row_request(workflow_token, row_id, initiator))
+
+    @check_auth
+    @api_gateway_wrapper
+    async def big_data_insert_rows(self, table_name, rows_data):
+        return await self._send(self._big_data_insert_rows_request(table_name, rows_data))
+
+
+    ####   custom assets ######
+    @check_auth
+    async def get_custom_file_download_link(self, path):
+        """
+        :param path: str
+        :return: str
+        """
+        return await self._send(self._custom_file_download_link_request(path))
+
+    @check_auth
+    async def get_custom_file_upload_link(self, path):
+        return await self._send(self._custom_file_upload_link_request(path))
+
+    @check_auth
+    async def download_custom_file(self, path, save_path):
+        path = parse.unquote(path)
+        await stream_download_async(self.session, lambda: self.get_custom_file_download_link(path), save_path,
+                                    timeout=self.timeout, key=self.dtable_uuid + '/custom/' + path.lstrip('/'))
+
+    @check_auth
+    async def upload_local_file_to_custom_folder(self, local_path, custom_folder_path=None, name=None, replace=False):
+        if not name:
+            name = local_path.strip('/').split('/')[-1]
+        if not custom_folder_path:
+            custom_folder_path = '/'
+
+        upload_link_dict = await self.get_custom_file_upload_link(parse.unquote(custom_folder_path))
+        relative_path = upload_link_dict.get('relative_path')
+        with open(local_path, 'rb') as f:
+            request = self._upload_request(upload_link_dict, name, f, relative_path, replace)
+            d = (await self._send(request))[0]
+        return await self.get_custom_file_info(custom_folder_path, d.get('name'))
+
+    @check_auth
+    async def get_custom_file_info(self, path, name):
+        return self._custom_file_info(await self._send(self._custom_file_info_request(path, name)))
+
+    @check_auth
+    async def list_custom_assets(self, path):
+        return await self._send(self._list_custom_assets_request(path))
+
+    @check_auth
+    async def get_user_info(self, username):
+        return await self._send(self._user_info_request(username))
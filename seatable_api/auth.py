@@ -0,0 +1,49 @@
+import base64
+import json
+import threading
+from datetime import datetime, timedelta
+
+
+DEFAULT_JWT_LIFETIME = timedelta(days=3)
+JWT_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def parse_jwt_exp(jwt_token):
+    """Read the expiry from a jwt payload, None if it has none
+
+    :param jwt_token: str
+    :return: datetime or None
+    """
+    try:
+        payload = jwt_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return datetime.fromtimestamp(exp) if exp else None
+    except Exception:
+        return None
+
+
+class AccessToken(object):
+    """The jwt access token of a base, shared by its clones and api gateway
+
+    headers is the dict every request of the base, its clones and api
+    gateway sends, a refresh updates it in place so all of them pick up
+    the new token at once. lock serialises refreshes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jwt_token = None
+        self.jwt_exp = None
+        self.headers = None
+
+    def set(self, jwt_token, headers):
+        self.jwt_token = jwt_token
+        self.jwt_exp = parse_jwt_exp(jwt_token) or datetime.now() + DEFAULT_JWT_LIFETIME
+        if self.headers is None:
+            self.headers = headers
+        else:
+            self.headers.update(headers)
+
+    def expires_soon(self):
+        return self.jwt_exp is not None and datetime.now() >= self.jwt_exp - JWT_REFRESH_MARGIN
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_METADATA_TTL = 60
+DEFAULT_FILE_CACHE_SIZE = 1024 * 1024 * 1024
+
+
+class MetadataCache(object):
+    """Base metadata kept for `ttl` seconds, shared by a base, its clones and api gateway
+
+    Tables are indexed by name and id, columns by name and key, so lookups
+    are dict hits. The cache is dropped after schema changes made through
+    the base, and on every update-dtable socket event when
+    invalidate_on_update is set. The returned metadata is shared, do not
+    modify it.
+
+    Usage:
+        base = Base(api_token, server_url, metadata_cache=MetadataCache(ttl=300))
+    """
+
+    def __init__(self, ttl=DEFAULT_METADATA_TTL, invalidate_on_update=False):
+        """
+        :param ttl: int, seconds before the metadata is fetched again
+        :param invalidate_on_update: bool, drop the cache on update-dtable socket events
+        """
+        self.ttl = ttl
+        self.invalidate_on_update = invalidate_on_update
+        self.lock = threading.Lock()
+        self._reset()
+
+    def invalidate(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.metadata = None
+        self.fetched_at = None
+        self.tables = {}
+        self.columns = {}
+
+    @property
+    def is_valid(self):
+        return self.metadata is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    def _index(self, metadata):
+        tables, columns = {}, {}
+        for table in metadata.get('tables') or []:
+            tables[table['_id']] = table
+            tables[table['name']] = table
+            column_map = {}
+            for column in table.get('columns') or []:
+                column_map[column['key']] = column
+                column_map[column['name']] = column
+            columns[table['_id']] = column_map
+        self.tables, self.columns = tables, columns
+
+    def _refresh(self, fetch):
+        if not self.is_valid:
+            metadata = fetch()
+            self._index(metadata)
+            self.metadata = metadata
+            self.fetched_at = time.monotonic()
+
+    def get(self, fetch):
+        """
+        :param fetch: callable returning fresh metadata
+        :return: dict
+        """
+        with self.lock:
+            self._refresh(fetch)
+            return self.metadata
+
+    def get_table(self, fetch, table_name):
+        """
+        :param table_name: str, name or id
+        :return: dict or None
+        """
+        with self.lock:
+            self._refresh(fetch)
+            return self.tables.get(table_name)
+
+    def get_column(self, fetch, table_name, column_name):
+        """
+        :param table_name: str, name or id
+        :param column_name: str, name or key
+        :return: dict or None
+        """
+        with self.lock:
+            self._refresh(fetch)
+            table = self.tables.get(table_name)
+            if not table:
+                return None
+            return self.columns[table['_id']].get(column_name)
+
+
+class FileCache(object):
+    """Downloaded files kept in a folder, at most max_size bytes in total
+
+    Files are keyed by base and asset path, the least recently used ones
+    are evicted first. Several bases may share a cache. A file replaced on
+    the server under the same path is not noticed, invalidate its key.
+
+    Usage:
+        cache = FileCache('/var/cache/seatable', max_size=10 * 1024 ** 3)
+        base = Base(api_token, server_url, file_cache=cache)
+    """
+
+    def __init__(self, path, max_size=DEFAULT_FILE_CACHE_SIZE):
+        """
+        :param path: str, folder of the cache, created if needed
+        :param max_size: int, bytes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        # file name -> size, least recently used first
+        self.files = OrderedDict()
+        self.size = 0
+        entries = [entry for entry in os.scandir(path) if entry.is_file() and not entry.name.endswith('.tmp')]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            self.files[entry.name] = entry.stat().st_size
+            self.size += entry.stat().st_size
+
+    def _file_name(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _forget(self, name):
+        # callers hold self.lock
+        self.size -= self.files.pop(name, 0)
+
+    def _evict(self):
+        # callers hold self.lock
+        while self.size > self.max_size and self.files:
+            name, size = self.files.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, save_path):
+        """Copy the cached file of key to save_path
+
+        :return: bool, False if it is not cached
+        """
+        name = self._file_name(key)
+        with self.lock:
+            if name not in self.files:
+                return False
+            self.files.move_to_end(name)
+        file_path = os.path.join(self.path, name)
+        try:
+            shutil.copyfile(file_path, save_path)
+            os.utime(file_path)
+        except FileNotFoundError:
+            # evicted by another process sharing the folder
+            with self.lock:
+                self._forget(name)
+            return False
+        return True
+
+    def put(self, key, file_path):
+        """Keep a copy of file_path for key
+
+        :return: bool, False if the file is larger than the whole cache
+        """
+        size = os.path.getsize(file_path)
+        if size > self.max_size:
+            return False
+        name = self._file_name(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        with self.lock:
+            self._forget(name)
+            self.files[name] = size
+            self.size += size
+            self._evict()
+        return True
+
+    def invalidate(self, key):
+        name = self._file_name(key)
+        with self.lock:
+            self._forget(name)
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,201 @@
+from datetime import datetime, timezone
+
+from .constants import ColumnTypes
+from .utils import get_column_converters, is_single_multiple_structure
+
+try:
+    # https://numpy.org
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    # https://arrow.apache.org/docs/python
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+COLUMN_FORMATS = ('columns', 'numpy', 'arrow')
+
+
+class Columns(dict):
+    """Column name -> values of every row, in row order
+
+    With format 'numpy' single-select columns hold int32 codes into
+    categories[column name], -1 for an empty or unknown option, so
+    pandas.Categorical.from_codes(columns[name], columns.categories[name])
+    rebuilds them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Columns, self).__init__(*args, **kwargs)
+        self.categories = {}
+
+
+def _check_format(format):
+    if format not in COLUMN_FORMATS:
+        raise ValueError('format must be one of %s' % (', '.join(COLUMN_FORMATS),))
+    if format == 'numpy' and numpy is None:
+        raise ImportError('format "numpy" requires numpy, install it with "pip install seatable-api[numpy]"')
+    if format == 'arrow' and pyarrow is None:
+        raise ImportError('format "arrow" requires pyarrow, install it with "pip install seatable-api[arrow]"')
+
+
+def _parse_datetime(value, utc=False):
+    """A naive datetime, the wall-clock time of value like format 'rows'
+    and 'columns' show it, or converted to UTC if utc is True. A value
+    without offset, as list_rows returns dates, is kept as it is.
+    """
+    if not value:
+        return None
+    try:
+        # fromisoformat accepts a trailing Z only from python 3.11
+        date_value = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if date_value.tzinfo is not None:
+        if utc:
+            date_value = date_value.astimezone(timezone.utc)
+        date_value = date_value.replace(tzinfo=None)
+    return date_value
+
+
+def _to_number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _typed_column(column_type, values, categories, codes_map, format, utc):
+    if column_type == ColumnTypes.NUMBER.value:
+        values = [_to_number(value) for value in values]
+        if format == 'numpy':
+            return numpy.array([numpy.nan if value is None else value for value in values], dtype='float64')
+        return pyarrow.array(values, type=pyarrow.float64())
+
+    if column_type == ColumnTypes.CHECKBOX.value:
+        values = [bool(value) for value in values]
+        if format == 'numpy':
+            return numpy.array(values, dtype='bool')
+        return pyarrow.array(values, type=pyarrow.bool_())
+
+    if column_type in (ColumnTypes.DATE.value, ColumnTypes.CTIME.value, ColumnTypes.MTIME.value):
+        values = [_parse_datetime(value, utc) for value in values]
+        if format == 'numpy':
+            return numpy.array(values, dtype='datetime64[us]')
+        return pyarrow.array(values, type=pyarrow.timestamp('us'))
+
+    if codes_map is not None:
+        codes = [codes_map.get(value, -1) if value else -1 for value in values]
+        if format == 'numpy':
+            return numpy.array(codes, dtype='int32')
+        indices = pyarrow.array([code if code >= 0 else None for code in codes], type=pyarrow.int32())
+        return pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(categories, type=pyarrow.string()))
+
+    if format == 'numpy':
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+    try:
+        return pyarrow.array(values)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # mixed cell types, keep them as text
+        return pyarrow.array([None if value is None else str(value) for value in values], type=pyarrow.string())
+
+
+def _gen_columns(fields, format, utc):
+    """
+    :param fields: list of (name, column type, values, option names, value -> option index or None)
+    :param format: str
+    :param utc: bool, see _parse_datetime
+    """
+    if format == 'columns':
+        return Columns((name, values) for name, _, values, _, _ in fields)
+    columns = Columns()
+    for name, column_type, values, categories, codes_map in fields:
+        columns[name] = _typed_column(column_type, values, categories, codes_map, format, utc)
+        if codes_map is not None and format == 'numpy':
+            columns.categories[name] = categories
+    if format == 'numpy':
+        return columns
+    return pyarrow.RecordBatch.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+
+def _extra_keys(rows, known_keys):
+    extra_keys = {}
+    for row in rows:
+        for key in row.keys() - known_keys:
+            extra_keys.setdefault(key, None)
+    return list(extra_keys)
+
+
+def _single_select_options(column):
+    if column['type'] != ColumnTypes.SINGLE_SELECT.value:
+        return None
+    return is_single_multiple_structure(column)[1]
+
+
+def convert_db_columns(metadata, results, format='columns', utc=False):
+    """Convert dtable-db results into columns instead of rows
+
+    format 'columns' gives lists of the values convert_db_rows returns,
+    'numpy' numpy arrays and 'arrow' a pyarrow.RecordBatch, see Columns.
+    Dates are naive datetime64 / timestamp values holding the wall-clock
+    time, the same time the other formats show, unless utc is True.
+
+    :param metadata: list
+    :param results: list
+    :param format: str, 'columns', 'numpy' or 'arrow'
+    :param utc: bool, convert dates with an utc offset to UTC, for 'numpy' and 'arrow'
+    :return: Columns or pyarrow.RecordBatch
+    """
+    _check_format(format)
+    results = results or []
+    converters = get_column_converters(metadata)
+    fields = []
+    for column in metadata:
+        key = column['key']
+        name, convert = converters[key]
+        values = [result.get(key) for result in results]
+        options = _single_select_options(column)
+        if format == 'columns' or options is None:
+            if convert and (format == 'columns' or column['type'] != ColumnTypes.DATE.value):
+                values = [convert(value) for value in values]
+            fields.append((name, column['type'], values, None, None))
+        else:
+            categories = [option['name'] for option in options]
+            codes_map = {option['id']: index for index, option in enumerate(options)}
+            fields.append((name, column['type'], values, categories, codes_map))
+    for key in _extra_keys(results, set(converters)):
+        fields.append((key, None, [result.get(key) for result in results], None, None))
+    return _gen_columns(fields, format, utc)
+
+
+def convert_rows_columns(columns, rows, format='columns', utc=False):
+    """Convert rows as list_rows returns them into columns, see convert_db_columns
+
+    :param columns: list, the table columns as list_columns returns them
+    :param rows: list
+    :param format: str, 'columns', 'numpy' or 'arrow'
+    :param utc: bool, convert dates with an utc offset to UTC, for 'numpy' and 'arrow'
+    :return: Columns or pyarrow.RecordBatch
+    """
+    _check_format(format)
+    fields = []
+    for column in columns:
+        name = column['name']
+        values = [row.get(name) for row in rows]
+        options = _single_select_options(column)
+        if format == 'columns' or options is None:
+            fields.append((name, column['type'], values, None, None))
+        else:
+            categories = [option['name'] for option in options]
+            codes_map = {option['name']: index for index, option in enumerate(options)}
+            fields.append((name, column['type'], values, categories, codes_map))
+    for key in _extra_keys(rows, {column['name'] for column in columns}):
+        fields.append((key, None, [row.get(key) for row in rows], None, None))
+    return _gen_columns(fields, format, utc)
@@ -5,6 +5,8 @@ ROW_FILTER_KEYS = ['column_name', 'filter_predicate', 'filter_term', 'filter_ter
 JOIN_ROOM = 'join-room'
 UPDATE_DTABLE = 'update-dtable'
 NEW_NOTIFICATION = 'new-notification'
+BATCH_CHUNK_SIZE = 1000  # max rows the server accepts in one batch request
+LIST_ROWS_LIMIT = 1000  # max rows the server returns for one list rows request
 
 
 ##### column operations #####
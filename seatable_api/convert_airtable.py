@@ -1,14 +1,20 @@
+import hashlib
 import json
 import logging
 import re
 import sys
+import tempfile
+import threading
 import time
 import random
 import requests
 import urllib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from .constants import ColumnTypes
+from .download import DOWNLOAD_CHUNK_SIZE
+from .upload import UploadLink
 
 
 HREF_REG = r'\[.+\]\(\S+\)|<img src=\S+.+\/>|!\[\]\(\S+\)|<\S+>'
@@ -26,6 +32,11 @@ AIRTABLE_API_URL = 'https://api.airtable.com/v0/'
 ColumnTypes.BARCODE = 'barcode'
 FILE = 'file'
 IMAGE = 'image'
+ATTACHMENT_WORKERS = 8
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+TABLE_WORKERS = 4
+AIRTABLE_RATE_LIMIT_WAIT = 30
+AIRTABLE_RATE_LIMIT_RETRIES = 3
 
 logging.basicConfig(format='[%(asctime)s] [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S', stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger()
@@ -60,55 +71,141 @@ class LinksConvertor(object):
 
 
 class FilesConvertor(object):
+    """Moves Airtable attachments into the assets of the base
+
+    Attachments are handed to a pool of workers with add_cell while the
+    rows are converted, so row conversion never waits on a download. Each
+    attachment is moved once, by its Airtable id, however many cells hold
+    it. A file is downloaded into a spooled temporary file, in memory up
+    to SPOOL_MAX_SIZE and on disk beyond, and streamed from there to the
+    upload link shared by all workers. pop_cells waits for the attachments
+    of a table and returns the updates that fill its file and image cells.
+    """
 
-    def __init__(self, airtable_api_key, base):
+    def __init__(self, airtable_api_key, base, workers=ATTACHMENT_WORKERS):
+        """
+        :param airtable_api_key: str
+        :param base: SeaTable Base
+        :param workers: int, attachments migrated at the same time
+        """
         self.airtable_api_headers = {
             'Authorization': 'Bearer ' + airtable_api_key}
         self.base = base
+        self.workers = workers
+        self.session = requests.Session()
+        self.upload_link = UploadLink(base.get_file_upload_link)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.attachments = {}
+        self.cells = {}
 
     def upload_file(self, item, file_type):
         """file_type must in ['image', 'file']
         """
         try:
-            # download from airtable
             name = item['filename']
-            url = item['url']
-            response = requests.get(
-                url=url, headers=self.airtable_api_headers, timeout=60)
-            content = response.content
-            # upload to seatable
-            file_info = self.base.upload_bytes_file(
-                name=name, content=content, file_type=file_type)
-            return file_info
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as f:
+                # download from airtable
+                digest = hashlib.sha256()
+                with self.session.get(item['url'], headers=self.airtable_api_headers,
+                                      stream=True, timeout=60) as response:
+                    if response.status_code >= 400:
+                        raise ConnectionError(response.status_code, response.text)
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                size = f.tell()
+
+                # upload to seatable
+                def upload_to(upload_link_dict):
+                    f.seek(0)
+                    return self.base._upload_file(upload_link_dict, name, f, file_type)
+
+                def send():
+                    return self.upload_link.send(upload_to)
+
+                if self.base.upload_index is None:
+                    return send()
+                return self.base._deduplicated_upload(
+                    self.base._asset_scope(file_type), digest.hexdigest(), size, send)
         except Exception as e:
             logger.exception('Could not upload file')
             return None
 
+    def submit(self, item, file_type):
+        """
+        :return: Future of the info dict of the uploaded file, None if it failed
+        """
+        key = (item.get('id') or item['url'], file_type)
+        with self.lock:
+            future = self.attachments.get(key)
+            if future is None:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=max(1, self.workers))
+                future = self.executor.submit(self.upload_file, item, file_type)
+                self.attachments[key] = future
+            return future
+
+    def add_cell(self, table_name, row_id, column_name, file_type, value):
+        """Start migrating the attachments of a cell, to be filled in by pop_cells
+        """
+        futures = [self.submit(item, file_type) for item in value]
+        with self.lock:
+            self.cells.setdefault(table_name, []).append((row_id, column_name, file_type, futures))
+
+    def pop_cells(self, table_name):
+        """Wait for the attachments of the cells added for a table
+
+        :return: list, {'row_id': str, 'row': dict} updates filling the cells
+        """
+        with self.lock:
+            cells = self.cells.pop(table_name, [])
+        updates = {}
+        for row_id, column_name, file_type, futures in cells:
+            file_list = [info for info in (future.result() for future in futures) if info is not None]
+            if file_type == IMAGE:
+                cell_data = [file_info['url'] for file_info in file_list]
+            else:
+                cell_data = file_list
+            updates.setdefault(row_id, {})[column_name] = cell_data
+        return [{'row_id': row_id, 'row': row} for row_id, row in updates.items()]
+
     def batch_upload_files(self, value):
+        futures = [self.submit(item, FILE) for item in value]
         file_list = []
-        for item in value:
-            file_info = self.upload_file(item, file_type=FILE)
+        for future in futures:
+            file_info = future.result()
             if file_info is not None:
                 file_list.append(file_info)
         return file_list
 
     def batch_upload_images(self, value):
+        futures = [self.submit(item, IMAGE) for item in value]
         image_list = []
-        for item in value:
-            file_info = self.upload_file(item, file_type=IMAGE)
+        for future in futures:
+            file_info = future.result()
             if file_info is not None:
                 image_url = file_info['url']
                 image_list.append(image_url)
         return image_list
 
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
 
 class RowsConvertor(object):
 
     def __init__(self, files_convertor):
         self.files_convertor = files_convertor
 
-    def convert(self, columns, airtable_rows):
-        rows = self.gen_rows(columns, airtable_rows)
+    def convert(self, columns, airtable_rows, table_name=None):
+        """With a table_name, file and image cells are left out of the rows
+        and migrated by the files convertor, see FilesConvertor.pop_cells
+        """
+        rows = self.gen_rows(columns, airtable_rows, table_name)
         return rows
 
     def parse_date(self, value):
@@ -225,7 +322,14 @@ class RowsConvertor(object):
             cell_data = str(value)
         return cell_data
 
-    def gen_rows(self, columns, airtable_rows):
+    def defer_files(self, table_name, row_id, column_name, column_type, value):
+        file_type = IMAGE if column_type == ColumnTypes.IMAGE else FILE
+        try:
+            self.files_convertor.add_cell(table_name, row_id, column_name, file_type, value)
+        except Exception as e:
+            logger.exception('Could not migrate attachments')
+
+    def gen_rows(self, columns, airtable_rows, table_name=None):
         rows = []
         for row in airtable_rows:
             row_data = {'_id': row['_id']}
@@ -236,6 +340,9 @@ class RowsConvertor(object):
                 value = row.get(column_name)
                 if value is None:
                     continue
+                if table_name is not None and column_type in (ColumnTypes.FILE, ColumnTypes.IMAGE):
+                    self.defer_files(table_name, row['_id'], column_name, column_type, value)
+                    continue
                 cell_data = self.gen_cell_data(column_type, value)
                 row_data[column_name] = cell_data
             if row_data:
@@ -457,7 +564,13 @@ class AirtableAPI(object):
         url = AIRTABLE_API_URL + self.airtable_base_id + '/' + urllib.parse.quote(table_name, safe='')
         if offset:
             url = url + '?offset=' + offset
-        response = requests.get(url, headers=headers, timeout=60)
+        for _ in range(AIRTABLE_RATE_LIMIT_RETRIES):
+            response = requests.get(url, headers=headers, timeout=60)
+            if response.status_code != 429:
+                break
+            # Airtable asks clients over 5 requests per second to wait 30 seconds
+            logger.warning('Airtable rate limit reached, waiting %d seconds', AIRTABLE_RATE_LIMIT_WAIT)
+            time.sleep(AIRTABLE_RATE_LIMIT_WAIT)
         if response.status_code >= 400:
             raise ConnectionError(response.status_code, response.text)
         response_dict = response.json()
@@ -482,6 +595,19 @@ class AirtableAPI(object):
             # time.sleep(0.5)
         return all_rows
 
+    def iter_pages(self, table_name):
+        """Yield the rows of a table page by page. The next page is requested
+        in a background thread while the caller handles the current one
+
+        :return: generator of list
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.list_rows, table_name)
+            while future is not None:
+                rows, offset = future.result()
+                future = executor.submit(self.list_rows, table_name, offset) if offset else None
+                yield rows
+
     def get_schema(self):
         url = f'{AIRTABLE_API_URL}meta/bases/{self.airtable_base_id}/tables'
         headers = {'Authorization': 'Bearer ' + self.airtable_api_key}
@@ -495,7 +621,7 @@ class AirtableAPI(object):
 
 class AirtableConvertor(object):
 
-    def __init__(self, airtable_api_key, airtable_base_id, base, table_names, first_columns=[], links=[], excluded_column_types=[], excluded_columns=[]):
+    def __init__(self, airtable_api_key, airtable_base_id, base, table_names, first_columns=[], links=[], excluded_column_types=[], excluded_columns=[], attachment_workers=ATTACHMENT_WORKERS):
         """
         airtable_api_key: str
         airtable_base_id: str
@@ -504,6 +630,7 @@ class AirtableConvertor(object):
         links: list[tuple], eg: [('table_name', 'column_name', 'other_table_name')]
         excluded_column_types: list[ColumnTypes], e.g. [ColumnTypes.FORMULA, ColumnTypes.LINK_FORMULA]
         excluded_columns: list[tuple[str, str]], e.g. [('Table1', 'Column1'), ('Table2', 'Column5')]
+        attachment_workers: int, attachments migrated at the same time
         """
         self.airtable_api = AirtableAPI(airtable_api_key, airtable_base_id)
         self.base = base
@@ -514,7 +641,7 @@ class AirtableConvertor(object):
         self.excluded_columns = excluded_columns
         self.manually_migrated_columns = []
         self.columns_parser = ColumnsParser()
-        self.files_convertor = FilesConvertor(airtable_api_key, base)
+        self.files_convertor = FilesConvertor(airtable_api_key, base, attachment_workers)
         self.rows_convertor = RowsConvertor(self.files_convertor)
         self.links_convertor = LinksConvertor()
         self.get_first_column_map()
@@ -532,12 +659,23 @@ class AirtableConvertor(object):
         self.convert_columns()
         self.convert_rows(is_demo=True)
         self.convert_links(is_demo=True)
+        self.convert_files()
 
-    def convert_data(self):
+    def convert_data(self, pipelined=False, table_workers=TABLE_WORKERS):
+        """
+        pipelined: bool, convert and append every Airtable page as soon as it is
+            retrieved, see convert_rows_pipelined, instead of retrieving all
+            tables first
+        table_workers: int, tables converted at the same time when pipelined
+        """
         self.delete_demo_rows()
-        self.get_airtable_row_map()
-        self.convert_rows()
+        if pipelined:
+            self.convert_rows_pipelined(table_workers)
+        else:
+            self.get_airtable_row_map()
+            self.convert_rows()
         self.convert_links()
+        self.convert_files()
 
     def parse_airtable_schema(self, schema):
         self.airtable_column_map = {}
@@ -744,22 +882,59 @@ class AirtableConvertor(object):
             airtable_rows = self.airtable_row_map[table_name]
             if is_demo:
                 airtable_rows = airtable_rows[:10]
-            columns = self.column_map[table_name]
-
-            # Remove excluded column types
-            columns = [c for c in columns if ColumnTypes(c['type']) not in self.excluded_column_types]
+            columns = self.get_row_columns(table_name)
+            rows = self.rows_convertor.convert(columns, airtable_rows, table_name)
+            self.batch_append_rows(table_name, rows)
+        logger.info('Rows appended in SeaTable base')
+        time.sleep(1)
 
-            # Remove excluded columns
-            columns = [
-                column for column in columns
-                if (table_name, column['name']) not in self.excluded_columns
-            ]
+    def convert_rows_pipelined(self, table_workers=TABLE_WORKERS):
+        """Retrieve, convert and append the rows of `table_workers` tables at a time
 
-            rows = self.rows_convertor.convert(columns, airtable_rows)
-            self.batch_append_rows(table_name, rows)
+        Each table is read page by page, the next Airtable page downloading
+        while the current one is converted and appended in chunks of LIMIT
+        rows, so about LIMIT rows and a page per table are held in memory.
+        Only the link cells of the rows are kept, for convert_links.
+        """
+        logger.info('Start migrating rows from Airtable to SeaTable base')
+        self.get_table_map()
+        self.airtable_row_map = {}
+        with ThreadPoolExecutor(max_workers=max(1, table_workers)) as executor:
+            list(executor.map(self.convert_table_rows, self.table_names))
         logger.info('Rows appended in SeaTable base')
         time.sleep(1)
 
+    def convert_table_rows(self, table_name):
+        columns = self.get_row_columns(table_name)
+        link_fields = ['_id'] + list(self.link_map.get(table_name, {}))
+        link_rows = []
+        rows = []
+        count = 0
+        for airtable_rows in self.airtable_api.iter_pages(table_name):
+            rows.extend(self.rows_convertor.convert(columns, airtable_rows, table_name))
+            link_rows.extend({name: row[name] for name in link_fields if name in row} for row in airtable_rows)
+            count += len(airtable_rows)
+            logger.info('Retrieved %d rows from table "%s"', count, table_name)
+            if len(rows) >= LIMIT:
+                self.batch_append_rows(table_name, rows)
+                rows = []
+        if rows:
+            self.batch_append_rows(table_name, rows)
+        self.airtable_row_map[table_name] = link_rows
+
+    def get_row_columns(self, table_name):
+        columns = self.column_map[table_name]
+
+        # Remove excluded column types
+        columns = [c for c in columns if ColumnTypes(c['type']) not in self.excluded_column_types]
+
+        # Remove excluded columns
+        columns = [
+            column for column in columns
+            if (table_name, column['name']) not in self.excluded_columns
+        ]
+        return columns
+
     def convert_links(self, is_demo=False):
         if not self.link_map:
             return
@@ -778,6 +953,16 @@ class AirtableConvertor(object):
         logger.info('Links added between records in SeaTable base')
         time.sleep(1)
 
+    def convert_files(self):
+        # the attachments were queued by convert_rows and migrated meanwhile
+        logger.info('Start filling attachment cells in SeaTable base')
+        for table_name in self.table_names:
+            updates = self.files_convertor.pop_cells(table_name)
+            if updates:
+                self.batch_update_rows(table_name, updates)
+        self.files_convertor.close()
+        logger.info('Attachment cells filled in SeaTable base')
+
     def delete_demo_rows(self):
         logger.info('Start deleting demo rows')
         for table_name in self.table_names:
@@ -840,63 +1025,59 @@ class AirtableConvertor(object):
             for column in table['columns']:
                 column_name = column['name']
                 self.table_map[table_name][column_name] = column
-        time.sleep(0.1)
         return self.table_map
 
     def add_table(self, table_name, columns):
         table = self.base.add_table(table_name, columns=columns)
-        time.sleep(0.1)
         return table
 
     def add_column(self, table_name, column_name, column_type, column_data):
         try:
             column = self.base.insert_column(
                 table_name, column_name, column_type, None, column_data)
-            time.sleep(0.1)
             return column
         except Exception as e:
             print(e)
 
     def add_column_options(self, table_name, column_name, options):
         column = self.base.add_column_options(table_name, column_name, options)
-        time.sleep(0.1)
         return column
 
     def list_columns(self, table_name):
         columns = self.base.list_columns(table_name)
-        time.sleep(0.1)
         return columns
 
     def list_rows(self, table_name):
         rows = self.base.list_rows(table_name)
-        time.sleep(0.1)
         return rows
 
-    def batch_delete_rows(self, table_name, row_ids):
-        self.base.batch_delete_rows(table_name, row_ids)
-        time.sleep(0.1)
+    def log_batch_result(self, result, message, table_name):
+        """Log every chunk of a batch result, and raise once all are logged
+        if any of them failed, so the migration stops as it did before
+        batches were sent in chunks
+        """
+        failed = []
+        for chunk in result['chunks']:
+            if chunk['success']:
+                logger.info(message, chunk['count'], table_name)
+            else:
+                logger.error(message + ' failed: %s', chunk['count'], table_name, chunk['error'])
+                failed.append(chunk)
+        if failed:
+            raise Exception('%d of %d chunks failed in table "%s": %s' % (
+                len(failed), len(result['chunks']), table_name, failed[0]['error']))
 
     def batch_append_rows(self, table_name, rows):
-        offset = 0
-        while True:
-            row_split = rows[offset: offset + LIMIT]
-            offset = offset + LIMIT
-            if not row_split:
-                break
-            self.base.batch_append_rows(table_name, row_split)
-            logger.info('Appended %d rows to table "%s"', len(row_split), table_name)
-            time.sleep(0.5)
+        result = self.base.batch_append_rows(table_name, rows, chunk_size=LIMIT)
+        self.log_batch_result(result, 'Appended %d rows to table "%s"', table_name)
+
+    def batch_update_rows(self, table_name, updates):
+        result = self.base.batch_update_rows(table_name, updates, chunk_size=LIMIT)
+        self.log_batch_result(result, 'Filled attachments of %d rows in table "%s"', table_name)
 
     def batch_delete_rows(self, table_name, row_ids):
-        offset = 0
-        while True:
-            row_id_split = row_ids[offset: offset + LIMIT]
-            offset = offset + LIMIT
-            if not row_id_split:
-                break
-            self.base.batch_delete_rows(table_name, row_id_split)
-            logger.info('Deleted %d rows from table "%s"', len(row_id_split), table_name)
-            time.sleep(0.5)
+        result = self.base.batch_delete_rows(table_name, row_ids, chunk_size=LIMIT)
+        self.log_batch_result(result, 'Deleted %d rows from table "%s"', table_name)
 
     def batch_append_links(self, table_name, links):
         link_id = links['link_id']
@@ -904,15 +1085,6 @@ class AirtableConvertor(object):
         other_table_id = links['other_table_id']
         row_id_list = links['row_id_list']
         other_rows_ids_map = links['other_rows_ids_map']
-        offset = 0
-        while True:
-            row_id_split = row_id_list[offset: offset + LIMIT]
-            offset = offset + LIMIT
-            if not row_id_split:
-                break
-            other_rows_ids_map_split = {
-                row_id: other_rows_ids_map[row_id] for row_id in row_id_split}
-            self.base.batch_update_links(
-                link_id, table_id, other_table_id, row_id_split, other_rows_ids_map_split)
-            logger.info('Added %d links to table "%s"', len(row_id_split), table_name)
-            # time.sleep(0.5)
+        result = self.base.batch_update_links(
+            link_id, table_id, other_table_id, row_id_list, other_rows_ids_map, chunk_size=LIMIT)
+        self.log_batch_result(result, 'Added %d links to table "%s"', table_name)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+DIGEST_CHUNK_SIZE = 1024 * 1024
+LOCK_STRIPES = 64
+
+
+def bytes_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(file_path):
+    """
+    :return: tuple, (sha256 hex digest, size) of the file
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class UploadIndex(object):
+    """Uploaded assets by content hash, kept in a sqlite file
+
+    The upload methods of a base given an index look the content up first
+    and return the info of the earlier upload instead of sending the same
+    bytes again. Entries are scoped by base and asset folder. An asset
+    deleted on the server is not noticed, remove its entry or clear the
+    scope. The index also remembers which content each custom folder file
+    was uploaded with, for sync_custom_folder.
+
+    Usage:
+        base = Base(api_token, server_url, upload_index=UploadIndex('uploads.sqlite3'))
+    """
+
+    def __init__(self, path):
+        """
+        :param path: str, sqlite database file, created if needed, ':memory:' for none
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # uploads of the same content wait for each other, other uploads do not
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS assets ('
+                'scope TEXT, digest TEXT, size INTEGER, info TEXT, PRIMARY KEY (scope, digest))'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS folder_files ('
+                'scope TEXT, name TEXT, digest TEXT, size INTEGER, PRIMARY KEY (scope, name))'
+            )
+
+    def lock_for(self, scope, digest):
+        return self.locks[hash((scope, digest)) % LOCK_STRIPES]
+
+    def get(self, scope, digest):
+        """
+        :return: dict, info of the uploaded asset, or None
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT info FROM assets WHERE scope = ? AND digest = ?', (scope, digest)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, scope, digest, size, info):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO assets (scope, digest, size, info) VALUES (?, ?, ?, ?)',
+                (scope, digest, size, json.dumps(info)))
+
+    def remove(self, scope, digest):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM assets WHERE scope = ? AND digest = ?', (scope, digest))
+
+    def clear(self, scope=None):
+        with self.lock, self.connection:
+            if scope is None:
+                self.connection.execute('DELETE FROM assets')
+                self.connection.execute('DELETE FROM folder_files')
+            else:
+                self.connection.execute('DELETE FROM assets WHERE scope = ?', (scope,))
+                self.connection.execute('DELETE FROM folder_files WHERE scope = ?', (scope,))
+
+    def get_folder_file(self, scope, name):
+        """
+        :return: tuple, (digest, size) the file was last uploaded with, or None
+        """
+        with self.lock:
+            return self.connection.execute(
+                'SELECT digest, size FROM folder_files WHERE scope = ? AND name = ?', (scope, name)).fetchone()
+
+    def put_folder_file(self, scope, name, digest, size):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO folder_files (scope, name, digest, size) VALUES (?, ?, ?, ?)',
+                (scope, name, digest, size))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
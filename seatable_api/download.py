@@ -0,0 +1,205 @@
+import json
+import os
+import re
+
+# https://requests.readthedocs.io
+import requests
+
+try:
+    # https://www.python-httpx.org
+    import httpx
+except ImportError:
+    httpx = None
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RESUMES = 3
+
+CONTENT_RANGE_REG = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+TRANSFER_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+ASYNC_TRANSFER_ERRORS = (httpx.TransportError,) if httpx is not None else ()
+
+
+def _parse_content_range(response):
+    """
+    :return: tuple, (first byte or None, total size or None)
+    """
+    match = CONTENT_RANGE_REG.match(response.headers.get('Content-Range') or '')
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start else None), (int(total) if total != '*' else None)
+
+
+def _resume_mode(response, offset, link_is_fresh):
+    """ What to do with the answer to a download request, resumed from
+    offset when it is not 0
+
+    :param response: requests or httpx response
+    :return: tuple, (mode, total size or None), mode is 'wb' or 'ab' to
+        write the body to the part file, 'complete' when the part file is
+        the whole file, 'restart' when the file changed since the part file
+        was written, 'new_link' to retry with a new download link
+    """
+    start, total = _parse_content_range(response)
+    if response.status_code == 416 and offset:
+        return ('complete' if total == offset else 'restart'), total
+    if response.status_code == 206 and offset and start == offset:
+        return 'ab', total
+    if response.status_code == 200:
+        length = response.headers.get('Content-Length')
+        return 'wb', (int(length) if length and length.isdigit() else None)
+    if offset and not link_is_fresh:
+        return 'new_link', total
+    raise Exception('download file error')
+
+
+def _part_info_path(part_path):
+    return part_path + '.json'
+
+
+def _remove_part(part_path):
+    for path in (part_path, _part_info_path(part_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _write_part_info(part_path, key, response):
+    """Remember next to a new part file which file it holds, with the
+    validator of the response to send as If-Range when it is resumed
+    """
+    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    with open(_part_info_path(part_path), 'w') as f:
+        json.dump({'key': key, 'validator': validator}, f)
+
+
+def _resume_headers(part_path, key):
+    """ The request headers to download to part_path, resuming it if it
+    was written for key. A part file of another file, or one without
+    info, is removed
+
+    :return: tuple, (headers, offset)
+    """
+    # a plain body, byte ranges of a compressed one do not line up with the file
+    headers = {'Accept-Encoding': 'identity'}
+    if not os.path.exists(part_path):
+        return headers, 0
+    try:
+        with open(_part_info_path(part_path)) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        info = None
+    if not isinstance(info, dict) or info.get('key') != key:
+        _remove_part(part_path)
+        return headers, 0
+    offset = os.path.getsize(part_path)
+    if offset:
+        headers['Range'] = 'bytes=%d-' % offset
+        if info.get('validator'):
+            # the server sends the whole file instead if it changed since
+            headers['If-Range'] = info['validator']
+    return headers, offset
+
+
+def stream_download(session, get_link, save_path, timeout=None, resumes=DOWNLOAD_RESUMES, key=None):
+    """ Stream a file to save_path in chunks, resuming a broken transfer
+    with an http Range request
+
+    The file is written to save_path + '.part' and renamed once complete,
+    so a .part left behind by an interrupted call for the same key is
+    resumed as well. Which key a part file holds, and its ETag or
+    Last-Modified, are kept in save_path + '.part.json', any other part
+    file is downloaded again from the start. A resume the download link
+    is rejected for asks get_link for a new one.
+
+    :param session: requests.Session
+    :param get_link: callable returning the download link
+    :param save_path: str
+    :param timeout: int, seconds to wait for the server, per chunk
+    :param resumes: int, broken transfers resumed before giving up
+    :param key: str, identifies the file downloaded, a part file is only resumed for the same key
+    :return: int, size of the file
+    """
+    part_path = save_path + '.part'
+    download_link = get_link()
+    link_is_fresh = True
+    failures = 0
+    while True:
+        headers, offset = _resume_headers(part_path, key)
+        try:
+            with session.get(download_link, headers=headers, stream=True, timeout=timeout) as response:
+                mode, total = _resume_mode(response, offset, link_is_fresh)
+                if mode == 'new_link':
+                    download_link = get_link()
+                    link_is_fresh = True
+                    continue
+                if mode == 'restart':
+                    _remove_part(part_path)
+                    continue
+                if mode == 'complete':
+                    break
+                if mode == 'wb':
+                    _write_part_info(part_path, key, response)
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                    size = f.tell()
+            if total is None or size >= total:
+                break
+        except TRANSFER_ERRORS:
+            pass
+        failures += 1
+        link_is_fresh = False
+        if failures > resumes:
+            raise Exception('download file error, the transfer broke off %d times' % failures)
+    os.replace(part_path, save_path)
+    _remove_part(part_path)
+    return os.path.getsize(save_path)
+
+
+async def stream_download_async(session, get_link, save_path, timeout=None, resumes=DOWNLOAD_RESUMES, key=None):
+    """ stream_download for an httpx.AsyncClient, get_link is a coroutine function
+
+    :return: int, size of the file
+    """
+    part_path = save_path + '.part'
+    download_link = await get_link()
+    link_is_fresh = True
+    failures = 0
+    while True:
+        headers, offset = _resume_headers(part_path, key)
+        try:
+            async with session.stream('GET', download_link, headers=headers, timeout=timeout) as response:
+                mode, total = _resume_mode(response, offset, link_is_fresh)
+                if mode == 'new_link':
+                    download_link = await get_link()
+                    link_is_fresh = True
+                    continue
+                if mode == 'restart':
+                    _remove_part(part_path)
+                    continue
+                if mode == 'complete':
+                    break
+                if mode == 'wb':
+                    _write_part_info(part_path, key, response)
+                with open(part_path, mode) as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                    size = f.tell()
+            if total is None or size >= total:
+                break
+        except ASYNC_TRANSFER_ERRORS:
+            pass
+        failures += 1
+        link_is_fresh = False
+        if failures > resumes:
+            raise Exception('download file error, the transfer broke off %d times' % failures)
+    os.replace(part_path, save_path)
+    _remove_part(part_path)
+    return os.path.getsize(save_path)
@@ -10,3 +10,9 @@ class BaseUnauthError(ConnectionError):
 
     def __str__(self):
         return "The base has not been authorized"
+
+
+class InvalidResponseError(ConnectionError):
+
+    def __str__(self):
+        return "The server returned a malformed json response: %s" % (self.args[1:],)
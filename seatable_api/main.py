@@ -1,32 +1,56 @@
+import functools
+import inspect
 import io
-import json
+import os
 import re
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from urllib import parse
 from uuid import UUID
 
-# https://requests.readthedocs.io
-import requests
-
 from seatable_api.api_gateway import APIGateway
+from seatable_api.auth import AccessToken
 from seatable_api.exception import AuthExpiredError, BaseUnauthError
 from seatable_api.message import get_sender_by_account
-from .constants import ROW_FILTER_KEYS, ColumnTypes
-from .constants import RENAME_COLUMN, RESIZE_COLUMN, FREEZE_COLUMN, MOVE_COLUMN, MODIFY_COLUMN_TYPE, DELETE_COLUMN
+from .constants import BATCH_CHUNK_SIZE, LIST_ROWS_LIMIT, ColumnTypes
 from .socket_io import SocketIO
 from .query import QuerySet
-from .utils import convert_db_rows, parse_server_url, parse_headers, like_table_id, parse_response
-
+from .rate_limit import ThrottledSession
+from .session import gen_session, send_request, DEFAULT_POOL_SIZE, DEFAULT_MAX_RETRIES
+from .request_builder import BaseRequestBuilder, query_result
+from .columnar import convert_rows_columns
+from .snapshot import export_snapshot, SNAPSHOT_PAGE_SIZE
+from .sync import sync_rows
+from .download import stream_download
+from .upload import UploadLink
+from .dedup import bytes_digest, file_digest
+from .utils import parse_server_url, parse_headers, parse_response, add_sql_order, iter_pages, split_sql_limit, \
+    send_in_chunks, chunk_arguments
+
+
+def call_with_auth_refresh(obj, func, *args, **kwargs):
+    """Refresh the access token of obj before it expires, and once more
+    when the server still rejects it as expired
+    """
+    if obj.access_token.expires_soon():
+        obj.refresh_auth()
+    jwt_token = obj.jwt_token
+    try:
+        return func(*args, **kwargs)
+    except AuthExpiredError:
+        obj.refresh_auth(expired_token=jwt_token)
+        return func(*args, **kwargs)
 
 def check_auth(func):
 
+    @functools.wraps(func)
     def wrapper(obj, *args, **kwargs):
         if not obj.is_authed:
             raise BaseUnauthError
-        return func(obj, *args, **kwargs)
+        return call_with_auth_refresh(obj, func, obj, *args, **kwargs)
     return wrapper
 
 def api_gateway_wrapper(func):
+    @functools.wraps(func)
     def wrapper(obj, *args, **kwargs):
         if obj.use_api_gateway:
             new_obj = obj.api_gateway
@@ -34,22 +58,69 @@ def api_gateway_wrapper(func):
         return func(obj, *args, **kwargs)
     return wrapper
 
+def invalidate_metadata(func):
+    """Drop the metadata cache after a call that changes the schema
+    """
+    @functools.wraps(func)
+    def wrapper(obj, *args, **kwargs):
+        try:
+            return func(obj, *args, **kwargs)
+        finally:
+            if obj.metadata_cache is not None:
+                obj.metadata_cache.invalidate()
+    return wrapper
+
+def batch_chunked(items_arg, items_map_arg=None):
+    """Send the `items_arg` list of a batch method in server-sized chunks
+
+    The decorated method takes any iterable for items_arg and two extra
+    keyword arguments, chunk_size and workers, defaulting to the base's
+    batch_chunk_size and batch_workers. items_map_arg names a dict keyed
+    by the items, each chunk only carries its own keys.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(obj, *args, chunk_size=None, workers=None, **kwargs):
+            bound = signature.bind(obj, *args, **kwargs)
+            items = bound.arguments[items_arg] or []
+
+            def send_chunk(chunk):
+                chunk_args, chunk_kwargs = chunk_arguments(signature, bound, items_arg, items_map_arg, chunk)
+                return call_with_auth_refresh(obj, func, *chunk_args, **chunk_kwargs)
+
+            return send_in_chunks(items, send_chunk, chunk_size or obj.batch_chunk_size, workers or obj.batch_workers)
+        return wrapper
+    return decorator
 
-class SeaTableAPI(object):
+
+class SeaTableAPI(BaseRequestBuilder):
     """SeaTable API
     """
 
-    def __init__(self, token, server_url):
+    def __init__(self, token, server_url, session=None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                 max_retries=DEFAULT_MAX_RETRIES, rate_limiter=None, metadata_cache=None, compress_requests=None,
+                 file_cache=None, upload_index=None):
         """
         :param token: str
         :param server_url: str
+        :param session: requests.Session, shared connection pool, created if not given
+        :param pool_size: int, max connections kept open per host
+        :param keep_alive: bool
+        :param max_retries: int or RetryPolicy, retries of rate limited or failed requests
+        :param rate_limiter: RateLimiter, throttles requests of this base, its clones and api gateway
+        :param metadata_cache: MetadataCache, caches the metadata for this base, its clones and api gateway
+        :param compress_requests: str, 'gzip' or 'deflate' to compress large batch request bodies,
+            only if the server accepts compressed bodies
+        :param file_cache: FileCache, keeps downloaded files for this base and its clones
+        :param upload_index: UploadIndex, uploads of content uploaded before return the earlier asset
         """
         self.token = token
         self.server_url = parse_server_url(server_url)
         self.dtable_server_url = None
         self.dtable_db_url = None
-        self.jwt_token = None
-        self.jwt_exp = None
+        self.access_token = AccessToken()
         self.headers = None
         self.workspace_id = None
         self.dtable_uuid = None
@@ -57,6 +128,16 @@ class SeaTableAPI(object):
         self.timeout = 30
         self.socketIO = None
         self.is_authed = False
+        self.session = session or gen_session(pool_size=pool_size, keep_alive=keep_alive, max_retries=max_retries)
+        if rate_limiter:
+            self.session = ThrottledSession(self.session, rate_limiter)
+        self.rate_limiter = rate_limiter
+        self.metadata_cache = metadata_cache
+        self.compress_requests = compress_requests
+        self.file_cache = file_cache
+        self.upload_index = upload_index
+        self.batch_chunk_size = BATCH_CHUNK_SIZE
+        self.batch_workers = 1
 
         self.use_api_gateway = False
         self.api_gateway = None
@@ -65,17 +146,21 @@ class SeaTableAPI(object):
         return '<SeaTable Base [ %s ]>' % self.dtable_name
 
     def _clone(self):
-        clone = self.__class__(self.token, self.server_url)
+        clone = self.__class__(self.token, self.server_url, session=self.session, metadata_cache=self.metadata_cache,
+                               compress_requests=self.compress_requests, file_cache=self.file_cache,
+                               upload_index=self.upload_index)
         clone.dtable_server_url = self.dtable_server_url
         clone.dtable_db_url = self.dtable_db_url
-        clone.jwt_token = self.jwt_token
-        clone.jwt_exp = self.jwt_exp
+        clone.access_token = self.access_token
         clone.headers = self.headers
         clone.workspace_id = self.workspace_id
         clone.dtable_uuid = self.dtable_uuid
         clone.dtable_name = self.dtable_name
         clone.timeout = self.timeout
         clone.is_authed = self.is_authed
+        clone.batch_chunk_size = self.batch_chunk_size
+        clone.batch_workers = self.batch_workers
+        clone.rate_limiter = self.rate_limiter
 
         clone.use_api_gateway = self.use_api_gateway
         clone.api_gateway = self.api_gateway
@@ -89,19 +174,41 @@ class SeaTableAPI(object):
             msg_sender = None
         return msg_sender
 
+    @property
+    def jwt_token(self):
+        return self.access_token.jwt_token
+
+    @jwt_token.setter
+    def jwt_token(self, jwt_token):
+        self._set_access_token(jwt_token)
+
+    @property
+    def jwt_exp(self):
+        return self.access_token.jwt_exp
+
+    @jwt_exp.setter
+    def jwt_exp(self, jwt_exp):
+        self.access_token.jwt_exp = jwt_exp
+
+    def _send(self, request):
+        return request.result(send_request(self, request))
+
+    def _get_app_access_token(self):
+        return self._send(self._app_access_token_request())
+
+    def _set_access_token(self, jwt_token):
+        # updates the headers shared with the clones and api gateway in place
+        self.access_token.set(jwt_token, parse_headers(jwt_token))
+        self.headers = self.access_token.headers
+
     def auth(self, with_socket_io=False):
         """Auth to SeaTable
         """
-        self.jwt_exp = datetime.now() + timedelta(days=3)
-        url = self.server_url + '/api/v2.1/dtable/app-access-token/'
-        headers = parse_headers(self.token)
-        response = requests.get(url, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
+        data = self._get_app_access_token()
 
         self.dtable_server_url = parse_server_url(data.get('dtable_server'))
         self.dtable_db_url = parse_server_url(data.get('dtable_db', ''))
-        self.jwt_token = data.get('access_token')
-        self.headers = parse_headers(self.jwt_token)
+        self._set_access_token(data.get('access_token'))
         self.workspace_id = data.get('workspace_id')
         self.dtable_uuid = data.get('dtable_uuid')
         self.dtable_name = data.get('dtable_name')
@@ -114,7 +221,10 @@ class SeaTableAPI(object):
                 api_gateway_url=self.server_url + '/api-gateway',
                 server_url=self.server_url,
                 headers=self.headers,
-                dtable_uuid=self.dtable_uuid
+                dtable_uuid=self.dtable_uuid,
+                session=self.session,
+                metadata_cache=self.metadata_cache,
+                compress_requests=self.compress_requests
             )
 
         if with_socket_io is True:
@@ -124,106 +234,26 @@ class SeaTableAPI(object):
 
         self.is_authed = True
 
-    def _metadata_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/metadata/'
-
-    def _table_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/tables/'
-
-    def _view_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/views/'
-
-    def _row_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/rows/'
+    def refresh_auth(self, expired_token=None):
+        """Fetch a new access token for this base, its clones and api gateway
 
-    def _batch_row_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-append-rows/'
+        Without expired_token the token is only refreshed when it expires
+        soon, with it only when it is still the current one. Threads that
+        race here wait for the first refresh instead of each fetching a token.
 
-    def _batch_update_row_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-update-rows/'
-
-    def _batch_delete_row_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-delete-rows/'
-
-    def _filtered_rows_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/filtered-rows/'
-
-    def _row_link_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/links/'
-
-    def _batch_update_row_link_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-update-links/'
-
-    def _app_download_link_url(self):
-        return self.server_url + '/api/v2.1/dtable/app-download-link/'
-
-    def _app_custom_download_link_url(self):
-        return self.server_url + '/api/v2.1/dtable/custom/app-download-link/'
-
-    def _app_custom_asset_file_url(self):
-        return self.server_url + '/api/v2.1/dtable/custom/app-asset-file/'
-
-    def _app_custom_asset_dir_url(self):
-        return self.server_url + '/api/v2.1/dtable/custom/app-asset-dir/'
-
-    def _app_custom_upload_link_url(self):
-        return self.server_url + '/api/v2.1/dtable/custom/app-upload-link/'
-
-    def _app_upload_link_url(self):
-        return self.server_url + '/api/v2.1/dtable/app-upload-link/'
-
-    def _app_user_info_url(self):
-        return self.server_url + '/api/v2.1/dtable/app-user-info/'
-
-    def _column_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/columns/'
-
-    def _column_options_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/column-options/'
-
-    def _column_cascade_setting_server_url(self):
-        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/column-cascade-settings/'
-
-    def _third_party_accounts_url(self):
-        return self.server_url + '/api/v2.1/dtable/third-party-account/'
-
-    def _dtable_db_query_url(self):
-        return self.dtable_db_url + '/api/v1/query/' + self.dtable_uuid + '/'
-
-    def _dtable_db_linked_records_url(self):
-        return self.dtable_db_url + '/api/v1/linked-records/' + self.dtable_uuid + '/'
-
-    def _dtable_db_insert_rows_url(self):
-        return self.dtable_db_url + '/api/v1/insert-rows/' + self.dtable_uuid + '/'
-
-    def _get_related_users_url(self):
-        return '%(server_url)s/api/v2.1/dtables/%(dtable_uuid)s/related-users/' % {
-            'server_url': self.server_url,
-            'dtable_uuid': self.dtable_uuid
-        }
-
-    def _send_toast_notification_url(self):
-        return '%(dtable_server_url)s/api/v1/dtables/%(dtable_uuid)s/ui-toasts/' % {
-            'dtable_server_url': self.dtable_server_url,
-            'dtable_uuid': self.dtable_uuid
-        }
-
-    def _add_workflow_task_url(self, token):
-        return '%(server_url)s/api/v2.1/workflows/%(token)s/external-task-submit/' % {
-            'server_url': self.server_url,
-            'token': token
-        }
+        :param expired_token: str, the token a request was rejected with
+        """
+        with self.access_token.lock:
+            if expired_token is None:
+                if not self.access_token.expires_soon():
+                    return
+            elif expired_token != self.access_token.jwt_token:
+                return
+            data = self._get_app_access_token()
+            self._set_access_token(data.get('access_token'))
 
     def _get_account_detail(self, account_name):
-        url = self._third_party_accounts_url()
-        params = {
-            'account_name': account_name
-        }
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-
-        data = parse_response(response)
-        return data.get('account')
+        return self._send(self._account_detail_request(account_name))
 
     @check_auth
     def send_email(self, account_name, msg,  **kwargs):
@@ -239,16 +269,18 @@ class SeaTableAPI(object):
             raise ValueError('Wechat message sender does not configered.')
         msg_sender.send_msg(msg)
 
+    def _get_metadata(self):
+        return self._send(self._metadata_request())
+
     @check_auth
     @api_gateway_wrapper
     def get_metadata(self):
         """
         :return: dict
         """
-        url = self._metadata_server_url()
-        response = requests.get(url, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('metadata')
+        if self.metadata_cache is not None:
+            return self.metadata_cache.get(self._get_metadata)
+        return self._get_metadata()
 
 
     @check_auth
@@ -260,12 +292,15 @@ class SeaTableAPI(object):
     @check_auth
     @api_gateway_wrapper
     def get_table_by_name(self, table_name):
+        if self.metadata_cache is not None:
+            return self.metadata_cache.get_table(self._get_metadata, table_name)
         tables = self.list_tables()
         for t in tables:
             if t.get('name') == table_name:
                 return t
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def add_table(self, table_name, lang='en', columns=[]):
         """
@@ -273,103 +308,51 @@ class SeaTableAPI(object):
         :param lang: str, currently 'en' for English, and 'zh-cn' for Chinese
         :param columns: list
         """
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-            'lang': lang,
-        }
-        if columns:
-            json_data['columns'] = columns
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._add_table_request(table_name, lang, columns))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def rename_table(self, table_name, new_table_name):
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-            'new_table_name': new_table_name
-        }
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._rename_table_request(table_name, new_table_name))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def delete_table(self, table_name):
-        url = self._table_server_url()
-        json_data = {
-            'table_name': table_name,
-        }
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_table_request(table_name))
 
     @check_auth
     @api_gateway_wrapper
     def list_views(self, table_name):
-        url = self._view_server_url()
-        params = {
-            'table_name': table_name
-        }
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._list_views_request(table_name))
 
     @check_auth
     @api_gateway_wrapper
     def get_view_by_name(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        response = requests.get(view_url, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._get_view_by_name_request(table_name, view_name))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def add_view(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'table_name': table_name
-        })
-        json_data = {
-            'name': view_name
-        }
-        response = requests.post(view_url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._add_view_request(table_name, view_name))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def rename_view(self, table_name, view_name, new_view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        json_data = {
-            'name': new_view_name
-        }
-        response = requests.put(view_url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._rename_view_request(table_name, view_name, new_view_name))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def delete_view(self, table_name, view_name):
-        url = self._view_server_url()
-        view_url = '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
-            "url": url.rstrip('/'),
-            'view_name': view_name,
-            'table_name': table_name
-        })
-        response = requests.delete(view_url, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_view_request(table_name, view_name))
 
     @check_auth
     @api_gateway_wrapper
-    def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None):
+    def list_rows(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None, format='rows'):
         """
         :param table_name: str
         :param view_name: str
@@ -377,28 +360,41 @@ class SeaTableAPI(object):
         :param desc: boolean
         :param start: int
         :param limit: int
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_rows_columns
         :return: list
         """
-        url = self._row_server_url()
-        params = {
-            'table_name': table_name
-        }
+        rows = self._send(self._list_rows_request(table_name, view_name, order_by, desc, start, limit))
+        if format != 'rows':
+            return convert_rows_columns(self.list_columns(table_name, view_name), rows or [], format)
+        return rows
 
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        if view_name:
-            params['view_name'] = view_name
-        if order_by:
-            params['order_by'] = order_by
-            params['direction'] = 'desc' if desc else 'asc'
-        if start:
-            params['start'] = start
-        if limit:
-            params['limit'] = limit
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('rows')
+    @check_auth
+    def iter_rows(self, table_name, view_name=None, order_by=None, desc=False, page_size=1000, prefetch=1,
+                  format='rows'):
+        """Iterate over all rows of a table, page by page
+
+        :param table_name: str
+        :param view_name: str
+        :param order_by: str
+        :param desc: boolean
+        :param page_size: int, rows per request, larger values are lowered to the server's limit of 1000
+        :param prefetch: int, pages fetched in background while the current one is consumed
+        :param format: str, 'rows' yields each row, 'columns', 'numpy' or 'arrow' each page as columns
+        :return: generator of dict
+        """
+        # the server answers a larger page with 1000 rows, which would read as the last page
+        page_size = min(page_size, LIST_ROWS_LIMIT)
+
+        def fetch_page(start, limit):
+            return self.list_rows(table_name, view_name, order_by=order_by, desc=desc, start=start, limit=limit)
 
+        columns = self.list_columns(table_name, view_name) if format != 'rows' else None
+        for rows in iter_pages(fetch_page, page_size, prefetch=prefetch):
+            if columns is not None:
+                yield convert_rows_columns(columns, rows, format)
+                continue
+            for row in rows:
+                yield row
 
     @check_auth
     @api_gateway_wrapper
@@ -408,16 +404,7 @@ class SeaTableAPI(object):
         :param row_id: str
         :return: dict
         """
-        url = self._row_server_url() + row_id + '/'
-        params = {
-            'table_name': table_name
-        }
-
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._get_row_request(table_name, row_id))
 
     @check_auth
     @api_gateway_wrapper
@@ -426,36 +413,18 @@ class SeaTableAPI(object):
         :param table_name: str
         :param row_data: dict
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row': row_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if apply_default is not None:
-            json_data['apply_default'] = apply_default
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._append_row_request(table_name, row_data, apply_default))
 
     @check_auth
+    @batch_chunked('rows_data')
     @api_gateway_wrapper
     def batch_append_rows(self, table_name, rows_data, apply_default=None):
         """
         :param table_name: str
-        :param rows_data: dict
+        :param rows_data: list or iterable of dict, sent in chunks of chunk_size rows
+        :return: dict, merged responses, per-chunk results under 'chunks'
         """
-        url = self._batch_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'rows': rows_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if apply_default is not None:
-            json_data['apply_default'] = apply_default
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_append_rows_request(table_name, rows_data, apply_default))
 
     @check_auth
     @api_gateway_wrapper
@@ -465,18 +434,7 @@ class SeaTableAPI(object):
         :param row_data: dict
         :param anchor_row_id: str
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row': row_data,
-            'anchor_row_id': anchor_row_id,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if apply_default is not None:
-            json_data['apply_default'] = apply_default
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._insert_row_request(table_name, row_data, anchor_row_id, apply_default))
 
     @check_auth
     @api_gateway_wrapper
@@ -486,34 +444,18 @@ class SeaTableAPI(object):
         :param row_id: str
         :param row_data: dict
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row_id': row_id,
-            'row': row_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._update_row_request(table_name, row_id, row_data))
 
     @check_auth
+    @batch_chunked('rows_data')
     @api_gateway_wrapper
     def batch_update_rows(self, table_name, rows_data):
         """
         :param table_name: str
-        :param rows_data: list
-        :return:
+        :param rows_data: list or iterable of dict, sent in chunks of chunk_size rows
+        :return: dict, merged responses, per-chunk results under 'chunks'
         """
-        url = self._batch_update_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'updates': rows_data,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_update_rows_request(table_name, rows_data))
 
     @check_auth
     @api_gateway_wrapper
@@ -522,32 +464,18 @@ class SeaTableAPI(object):
         :param table_name: str
         :param row_id: str
         """
-        url = self._row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row_id': row_id,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._delete_row_request(table_name, row_id))
 
     @check_auth
+    @batch_chunked('row_ids')
     @api_gateway_wrapper
     def batch_delete_rows(self, table_name, row_ids):
         """
         :param table_name: str
-        :param row_ids: list
+        :param row_ids: list or iterable of str, sent in chunks of chunk_size ids
+        :return: dict, merged responses, per-chunk results under 'chunks'
         """
-        url = self._batch_delete_row_server_url()
-        json_data = {
-            'table_name': table_name,
-            'row_ids': row_ids,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_delete_rows_request(table_name, row_ids))
 
     @check_auth
     @api_gateway_wrapper
@@ -559,39 +487,7 @@ class SeaTableAPI(object):
         :param filter_conjunction: str, 'And' or 'Or'
         :return: list
         """
-        # params check
-        if not filters:
-            raise ValueError('filters can not be empty.')
-        if not isinstance(filters, list):
-            raise ValueError('filters invalid.')
-        if len(filters) != len([f for f in filters if isinstance(f, dict)]):
-            raise ValueError('filters invalid.')
-
-        for f in filters:
-            for key in f.keys():
-                if key not in ROW_FILTER_KEYS:
-                    raise ValueError('filters invalid.')
-
-        if filter_conjunction not in ['And', 'Or']:
-            raise ValueError('filter_conjunction invalid, filter_conjunction must be '
-                             '"And" or "Or"')
-
-        params = {
-            'table_name': table_name,
-        }
-        if view_name:
-            params['view_name'] = view_name
-
-        json_data = {
-            'filters': filters,
-            'filter_conjunction': filter_conjunction,
-        }
-
-        url = self._filtered_rows_server_url()
-        response = requests.get(
-            url, json=json_data, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('rows')
+        return self._send(self._filter_rows_request(table_name, filters, view_name, filter_conjunction))
 
     @check_auth
     def get_file_download_link(self, path):
@@ -599,23 +495,14 @@ class SeaTableAPI(object):
         :param path: str
         :return: str
         """
-        url = self._app_download_link_url()
-        params = {'path': path}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('download_link')
+        return self._send(self._file_download_link_request(path))
 
     @check_auth
     def get_file_upload_link(self):
         """
         :return: dict
         """
-        url = self._app_upload_link_url()
-        headers = parse_headers(self.token)
-        response = requests.get(url, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._file_upload_link_request())
 
     @check_auth
     @api_gateway_wrapper
@@ -627,21 +514,8 @@ class SeaTableAPI(object):
         :param row_id: str
         :param other_row_id: str
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'table_row_id': row_id,
-            'other_table_row_id': other_row_id,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
-    
+        return self._send(self._add_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
     @check_auth
     @api_gateway_wrapper
     def batch_add_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
@@ -651,20 +525,7 @@ class SeaTableAPI(object):
         :param other_table_name: str
         :param other_rows_ids_map: dict
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_add_links_request(link_id, table_name, other_table_name, other_rows_ids_map))
 
     @check_auth
     @api_gateway_wrapper
@@ -676,21 +537,8 @@ class SeaTableAPI(object):
         :param row_id: str
         :param other_row_id: str
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'table_row_id': row_id,
-            'other_table_row_id': other_row_id,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
-    
+        return self._send(self._remove_link_request(link_id, table_name, other_table_name, row_id, other_row_id))
+
     @check_auth
     @api_gateway_wrapper
     def batch_remove_links(self, link_id, table_name, other_table_name, other_rows_ids_map):
@@ -700,20 +548,7 @@ class SeaTableAPI(object):
         :param other_table_name: str
         :param other_rows_ids_map: dict
         """
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_remove_links_request(link_id, table_name, other_table_name, other_rows_ids_map))
 
     @check_auth
     @api_gateway_wrapper
@@ -725,49 +560,22 @@ class SeaTableAPI(object):
         :param row_id: str
         :param other_rows_ids: list
         """
-        if not isinstance(other_rows_ids, list):
-            raise ValueError('params other_rows_ids requires type list')
-        url = self._row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-            'row_id': row_id,
-            'other_rows_ids': other_rows_ids,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._update_link_request(link_id, table_name, other_table_name, row_id, other_rows_ids))
 
     @check_auth
+    @batch_chunked('row_id_list', 'other_rows_ids_map')
     @api_gateway_wrapper
     def batch_update_links(self, link_id, table_name, other_table_name, row_id_list, other_rows_ids_map):
         """
         :param link_id: str
         :param table_name: str
         :param other_table_name: str
-        :param row_id_list: []
+        :param row_id_list: list or iterable of str, sent in chunks of chunk_size ids
         :param other_rows_ids_map: dict
+        :return: dict, merged responses, per-chunk results under 'chunks'
         """
-        url = self._batch_update_row_link_server_url()
-        json_data = {
-            'link_id': link_id,
-            'table_name': table_name,
-            'other_table_name': other_table_name,
-
-            'row_id_list': row_id_list,
-            'other_rows_ids_map': other_rows_ids_map,
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if like_table_id(other_table_name):
-            json_data['other_table_id'] = other_table_name
-
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._batch_update_links_request(link_id, table_name, other_table_name, row_id_list,
+                                                           other_rows_ids_map))
 
     @check_auth
     @api_gateway_wrapper
@@ -777,14 +585,7 @@ class SeaTableAPI(object):
         :param link_column_key: str
         :param rows: list
         """
-        url = self._dtable_db_linked_records_url()
-        json_data = {
-            'table_id': table_id,
-            'link_column': link_column_key,
-            'rows': rows,
-        }
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._linked_records_request(table_id, link_column_key, rows))
 
     @check_auth
     @api_gateway_wrapper
@@ -794,21 +595,19 @@ class SeaTableAPI(object):
         :param view_name: str
         :return: list
         """
-        url = self._column_server_url()
-        params = {
-            'table_name': table_name,
-        }
-        if like_table_id(table_name):
-            params['table_id'] = table_name
-        if view_name:
-            params['view_name'] = view_name
-        response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('columns')
+        if self.metadata_cache is not None and not view_name:
+            table = self.metadata_cache.get_table(self._get_metadata, table_name)
+            if table:
+                return table.get('columns')
+        return self._send(self._list_columns_request(table_name, view_name))
 
     @check_auth
     @api_gateway_wrapper
     def get_column_link_id(self, table_name, column_name):
+        if self.metadata_cache is not None:
+            column = self.metadata_cache.get_column(self._get_metadata, table_name, column_name)
+            if column and column.get('type') == 'link':
+                return column.get('data', {}).get('link_id')
         columns = self.list_columns(table_name)
         for column in columns:
             if column.get('name') == column_name and column.get('type') == 'link':
@@ -818,6 +617,10 @@ class SeaTableAPI(object):
     @check_auth
     @api_gateway_wrapper
     def get_column_by_name(self, table_name, column_name):
+        if self.metadata_cache is not None:
+            column = self.metadata_cache.get_column(self._get_metadata, table_name, column_name)
+            if column and column.get('name') == column_name:
+                return column
         columns = self.list_columns(table_name)
         for col in columns:
             if col.get('name') == column_name:
@@ -834,6 +637,7 @@ class SeaTableAPI(object):
 
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def insert_column(self, table_name, column_name, column_type, column_key=None, column_data=None):
         """
@@ -844,25 +648,10 @@ class SeaTableAPI(object):
         :param column_data: dict, config information of column
         :return: dict
         """
-        if column_type not in ColumnTypes:
-            raise ValueError("type %s invalid!" % (column_type,))
-        url = self._column_server_url()
-        json_data = {
-            'table_name': table_name,
-            'column_name': column_name,
-            'column_type': column_type.value
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        if column_key:
-            json_data['anchor_column'] = column_key
-        if column_data:
-            json_data['column_data'] = column_data
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._insert_column_request(table_name, column_name, column_type, column_key, column_data))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def rename_column(self, table_name, column_key, new_column_name):
         """
@@ -871,20 +660,10 @@ class SeaTableAPI(object):
         :param new_column_name: str
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': RENAME_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_name': new_column_name
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._rename_column_request(table_name, column_key, new_column_name))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def resize_column(self, table_name, column_key, new_column_width):
         """
@@ -894,20 +673,10 @@ class SeaTableAPI(object):
         :param new_column_width: int
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': RESIZE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_width': new_column_width
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._resize_column_request(table_name, column_key, new_column_width))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def freeze_column(self, table_name, column_key, frozen):
         """
@@ -916,20 +685,10 @@ class SeaTableAPI(object):
         :param frozen: bool
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': FREEZE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'frozen': frozen
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._freeze_column_request(table_name, column_key, frozen))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def move_column(self, table_name, column_key, target_column_key):
         """
@@ -938,20 +697,10 @@ class SeaTableAPI(object):
         :param target_column_key: bool
         :return: dict
         """
-        url = self._column_server_url()
-        json_data = {
-            'op_type': MOVE_COLUMN,
-            'table_name': table_name,
-            'column': column_key,
-            'target_column': target_column_key
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._move_column_request(table_name, column_key, target_column_key))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def modify_column_type(self, table_name, column_key, new_column_type):
         """
@@ -960,24 +709,10 @@ class SeaTableAPI(object):
         :param new_column_type: str
         :return: dict
         """
-        if new_column_type not in ColumnTypes:
-            raise ValueError("type %s invalid!" % (new_column_type,))
-        if new_column_type == ColumnTypes.LINK:
-            raise ValueError("Switching to link column type is not allowed!")
-        url = self._column_server_url()
-        json_data = {
-            'op_type': MODIFY_COLUMN_TYPE,
-            'table_name': table_name,
-            'column': column_key,
-            'new_column_type': new_column_type.value
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.put(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._modify_column_type_request(table_name, column_key, new_column_type))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def add_column_options(self, table_name, column, options):
         """
@@ -985,19 +720,10 @@ class SeaTableAPI(object):
         :param column: str
         :param options: list
         """
-        url = self._column_options_server_url()
-        json_data = {
-            "table_name": table_name,
-            "column": column,
-            "options": options
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._add_column_options_request(table_name, column, options))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def add_column_cascade_settings(self, table_name, child_column, parent_column, cascade_settings):
         """
@@ -1008,20 +734,11 @@ class SeaTableAPI(object):
         :param cascade_settings: dict
         :return:
         """
-        url = self._column_cascade_setting_server_url()
-        json_data = {
-            "table_name": table_name,
-            "child_column": child_column,
-            "parent_column": parent_column,
-            "cascade_settings": cascade_settings
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._add_column_cascade_settings_request(table_name, child_column, parent_column,
+                                                                    cascade_settings))
 
     @check_auth
+    @invalidate_metadata
     @api_gateway_wrapper
     def delete_column(self, table_name, column_key):
         """
@@ -1029,28 +746,44 @@ class SeaTableAPI(object):
         :param column_key: str
         :return: None
         """
-        url = self._column_server_url()
-        json_data = {
-            'table_name': table_name,
-            'column': column_key
-        }
-        if like_table_id(table_name):
-            json_data['table_id'] = table_name
-        response = requests.delete(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._delete_column_request(table_name, column_key))
 
     @check_auth
     def download_file(self, url, save_path):
         if not str(UUID(self.dtable_uuid)) in url:
             raise Exception('url invalid.')
         path = url.split(str(UUID(self.dtable_uuid)))[-1].strip('/')
-        download_link = self.get_file_download_link(parse.unquote(path))
-        response = requests.get(download_link, timeout=self.timeout)
-        if response.status_code != 200:
-            raise Exception('download file error')
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        path = parse.unquote(path)
+        self._download_to_file(self.dtable_uuid + '/' + path, lambda: self.get_file_download_link(path), save_path)
+
+    def _download_to_file(self, cache_key, get_link, save_path):
+        if self.file_cache is not None and self.file_cache.get(cache_key, save_path):
+            return
+        stream_download(self.session, get_link, save_path, timeout=self.timeout, key=cache_key)
+        if self.file_cache is not None:
+            self.file_cache.put(cache_key, save_path)
+
+    def _upload_file(self, upload_link_dict, name, stream, file_type='file', replace=False):
+        """Post one file, streamed from stream, to an upload link of get_file_upload_link
+
+        :return: info dict of uploaded file
+        """
+        relative_path = self._upload_relative_path(upload_link_dict, file_type)
+        d = self._send(self._upload_request(upload_link_dict, name, stream, relative_path, replace))[0]
+        return self._uploaded_file_info(relative_path, name, d, file_type)
+
+    def _asset_scope(self, file_type):
+        return '%s/%s' % (self.dtable_uuid, file_type)
+
+    def _deduplicated_upload(self, scope, digest, size, upload):
+        """Return the info of an earlier upload of the same content, else upload() it and remember it
+        """
+        with self.upload_index.lock_for(scope, digest):
+            info = self.upload_index.get(scope, digest)
+            if info is None:
+                info = upload()
+                self.upload_index.put(scope, digest, size, info)
+            return info
 
     @check_auth
     def upload_bytes_file(self, name, content: bytes, relative_path=None, file_type='file', replace=False):
@@ -1060,37 +793,14 @@ class SeaTableAPI(object):
         """
         if file_type not in ['image', 'file']:
             raise Exception('relative or file_type invalid.')
-        
-        upload_link_dict = self.get_file_upload_link()
-        if file_type == 'image':
-            relative_path = upload_link_dict['img_relative_path']
-        else:
-            relative_path = upload_link_dict['file_relative_path']
-        
-        parent_dir = upload_link_dict['parent_path']
-        upload_link = upload_link_dict['upload_link'] + '?ret-json=1'
-        response = requests.post(upload_link, data={
-            'parent_dir': parent_dir,
-            'relative_path': relative_path,
-            'replace': 1 if replace else 0
-        }, files={
-            'file': (name, io.BytesIO(content))
-        }, timeout=self.timeout)
-        d = response.json()[0]
-        url = '%(server)s/workspace/%(workspace_id)s/asset/%(dtable_uuid)s/%(relative_path)s/%(filename)s' % {
-            'server': self.server_url.strip('/'),
-            'workspace_id': self.workspace_id,
-            'dtable_uuid': str(UUID(self.dtable_uuid)),
-            'file_type': file_type,
-            'relative_path': parse.quote(relative_path.strip('/')),
-            'filename': parse.quote(d.get('name', name))
-        }
-        return {
-            'type': file_type,
-            'size': d.get('size'),
-            'name': d.get('name'),
-            'url': url
-        }
+
+        def upload():
+            upload_link_dict = self.get_file_upload_link()
+            return self._upload_file(upload_link_dict, name, io.BytesIO(content), file_type, replace)
+
+        if self.upload_index is None or replace:
+            return upload()
+        return self._deduplicated_upload(self._asset_scope(file_type), bytes_digest(content), len(content), upload)
 
     @check_auth
     def upload_local_file(self, file_path, name=None, relative_path=None, file_type='file', replace=False):
@@ -1102,124 +812,200 @@ class SeaTableAPI(object):
             raise Exception('file_type invalid.')
         if not name:
             name = file_path.strip('/').split('/')[-1]
+        def upload():
+            upload_link_dict = self.get_file_upload_link()
+            with open(file_path, 'rb') as f:
+                return self._upload_file(upload_link_dict, name, f, file_type, replace)
+
+        if self.upload_index is None or replace:
+            return upload()
+        digest, size = file_digest(file_path)
+        return self._deduplicated_upload(self._asset_scope(file_type), digest, size, upload)
+
+    @check_auth
+    def upload_files(self, files, file_type='file', replace=False, workers=4):
+        """Upload many files through one upload link, `workers` at a time
+
+        The upload link is fetched once for the batch, and again only when
+        the file server rejects it. File bodies are streamed, not read whole.
+        With an upload index, content uploaded before is not sent again,
+        unless replace is set.
+
+        :param files: iterable of local file paths, or of (name, local file path or bytes) tuples
+        :param file_type: str, 'image' or 'file'
+        :param replace: bool
+        :param workers: int, files uploaded at the same time
+        :return: list, info dict of each uploaded file in the order given,
+            a file that failed has an 'error' and no url
+        """
         if file_type not in ['image', 'file']:
-            raise Exception('relative or file_type invalid.')
-        upload_link_dict = self.get_file_upload_link()
-        if file_type == 'image':
-            relative_path = upload_link_dict['img_relative_path']
-        else:
-            relative_path = upload_link_dict['file_relative_path']
-            
-        parent_dir = upload_link_dict['parent_path']
-        upload_link = upload_link_dict['upload_link'] + '?ret-json=1'
-        response = requests.post(upload_link, data={
-            'parent_dir': parent_dir,
-            'relative_path': relative_path,
-            'replace': 1 if replace else 0
-        }, files={
-            'file': (name, open(file_path, 'rb'))
-        }, timeout=self.timeout)
-        d = response.json()[0]
-        url = '%(server)s/workspace/%(workspace_id)s/asset/%(dtable_uuid)s/%(relative_path)s/%(filename)s' % {
-            'server': self.server_url.strip('/'),
-            'workspace_id': self.workspace_id,
-            'dtable_uuid': str(UUID(self.dtable_uuid)),
-            'file_type': file_type,
-            'relative_path': parse.quote(relative_path.strip('/')),
-            'filename': parse.quote(d.get('name', name))
-        }
-        return {
-            'type': file_type,
-            'size': d.get('size'),
-            'name': d.get('name'),
-            'url': url
-        }
+            raise Exception('file_type invalid.')
+        upload_link = UploadLink(self.get_file_upload_link)
+
+        def send(name, source):
+            def upload_to(upload_link_dict):
+                stream = io.BytesIO(source) if isinstance(source, bytes) else open(source, 'rb')
+                with stream:
+                    return self._upload_file(upload_link_dict, name, stream, file_type, replace)
+            return upload_link.send(upload_to)
+
+        def upload(item):
+            name, source = (item.strip('/').split('/')[-1], item) if isinstance(item, str) else item
+            try:
+                if self.upload_index is None or replace:
+                    return send(name, source)
+                if isinstance(source, bytes):
+                    digest, size = bytes_digest(source), len(source)
+                else:
+                    digest, size = file_digest(source)
+                return self._deduplicated_upload(self._asset_scope(file_type), digest, size,
+                                                 lambda: send(name, source))
+            except Exception as e:
+                return {'type': file_type, 'size': None, 'name': name, 'url': None, 'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(upload, files))
+
+    @check_auth
+    def download_files(self, urls, dest, workers=4):
+        """Download asset files into the folder dest, `workers` at a time
+
+        :param urls: iterable of asset urls, as download_file takes them
+        :param dest: str, folder, created if needed. Files keep their names,
+            a name repeated in urls gets a ' (n)' suffix
+        :param workers: int, files downloaded at the same time
+        :return: list, {'url': str, 'path': str[, 'error': str]} for each url in the order given
+        """
+        os.makedirs(dest, exist_ok=True)
+        jobs = []
+        names = set()
+        for url in urls:
+            name = os.path.basename(parse.unquote(url.rstrip('/').split('/')[-1]))
+            stem, ext = os.path.splitext(name)
+            count = 0
+            while name in names:
+                count += 1
+                name = '%s (%d)%s' % (stem, count, ext)
+            names.add(name)
+            jobs.append((url, os.path.join(dest, name)))
+
+        def download(job):
+            url, save_path = job
+            result = {'url': url, 'path': save_path}
+            try:
+                self.download_file(url, save_path)
+            except Exception as e:
+                result['error'] = str(e)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(download, jobs))
 
     @check_auth
     def filter(self, table_name, conditions='', view_name=None):
-        """
+        """Rows are requested when the queryset is used, see QuerySet
+
         :param table_name: str
         :param conditions: str
+        :param view_name: str
         :return: queryset
         """
         base = self._clone()
-        queryset = QuerySet(base, table_name)
-        queryset.raw_rows = self.list_rows(table_name, view_name)
+        queryset = QuerySet(base, table_name, view_name)
         queryset.raw_columns = self.list_columns(table_name, view_name)
-        queryset.conditions = conditions
-        queryset._execute_conditions()
-        return queryset
+        return queryset.filter(conditions)
+
+    @check_auth
+    def export_snapshot(self, path, tables=None, workers=4, format='jsonl', page_size=SNAPSHOT_PAGE_SIZE):
+        """Export the rows of the base into a folder, resuming an earlier export into it
+
+        :param path: str, folder of the snapshot, created if needed
+        :param tables: list of table names or ids, None for all tables
+        :param workers: int, tables exported at the same time
+        :param format: str, 'jsonl' or 'parquet', see SnapshotExport
+        :param page_size: int, rows per request and per checkpoint
+        :return: dict, the manifest, tables that failed carry an 'error'
+        """
+        return export_snapshot(self, path, tables=tables, workers=workers, format=format, page_size=page_size)
+
+    @check_auth
+    def sync_rows(self, table_name, source_rows, key, state_path, columns=None, delete_missing=False, full=False):
+        """Bring a table in line with source_rows, reading and writing only what changed since the last run
+
+        :param table_name: str
+        :param source_rows: iterable of dict, the wanted rows, column name -> value
+        :param key: str, name of the column that identifies a row
+        :param state_path: str, json file keeping the _mtime watermark and row index between runs
+        :param columns: list of column names to sync, defaults to the keys of source_rows
+        :param delete_missing: bool, delete rows whose key is not in source_rows
+        :param full: bool, read the whole table again, to notice rows deleted in seatable
+        :return: dict, see sync_rows
+        """
+        return sync_rows(self, table_name, source_rows, key, state_path, columns=columns,
+                         delete_missing=delete_missing, full=full)
 
     @check_auth
     @api_gateway_wrapper
-    def query(self, sql, convert=True):
+    def query(self, sql, convert=True, format='rows'):
         """
         :param sql: str
         :param convert: bool
+        :param format: str, 'rows' for a list of dict, or 'columns', 'numpy', 'arrow', see convert_db_columns
         :return: list
         """
+        return query_result(self._send(self._query_request(sql)), convert, format)
+
+    @check_auth
+    def iter_query(self, sql, convert=True, page_size=10000, prefetch=1):
+        """Iterate over the results of a sql query, page by page
+
+        A trailing LIMIT / OFFSET clause in sql bounds the whole iteration,
+        the pages are requested with their own LIMIT / OFFSET. Without an
+        ORDER BY clause the rows are ordered by _id so that no row is
+        skipped or repeated across pages. A query with GROUP BY or
+        DISTINCT is left as is, give it an ORDER BY clause of its own.
+
+        :param sql: str
+        :param convert: bool
+        :param page_size: int, rows per request, dtable-db allows at most 10000
+        :param prefetch: int, pages fetched in background while the current one is consumed
+        :return: generator of dict
+        """
         if not sql:
             raise ValueError('sql can not be empty.')
-        url = self._dtable_db_query_url()
-        json_data = {'sql': sql}
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        data = parse_response(response)
-        if not data.get('success'):
-            raise Exception(data.get('error_message'))
-        metadata = data.get('metadata')
-        results = data.get('results')
-        if convert:
-            converted_results = convert_db_rows(metadata, results)
-            return converted_results
-        else:
-            return results
+        base_sql, base_offset, total = split_sql_limit(sql)
+        base_sql = add_sql_order(base_sql)
+
+        def fetch_page(offset, limit):
+            page_sql = '%s LIMIT %d OFFSET %d' % (base_sql, limit, base_offset + offset)
+            return self.query(page_sql, convert=convert)
+
+        for results in iter_pages(fetch_page, page_size, prefetch=prefetch, total=total):
+            for result in results:
+                yield result
 
     @check_auth
     def get_related_users(self):
-        response = requests.get(self._get_related_users_url(), headers=self.headers)
-        return parse_response(response)['user_list']
+        return self._send(self._related_users_request())
 
     @check_auth
     @api_gateway_wrapper
     def send_toast_notification(self, username, msg, toast_type='success'):
-        url = self._send_toast_notification_url()
-        requests.post(url, json={
-            'to_user': username,
-            'toast_type': toast_type,
-            'detail': {
-                'msg': str(msg)
-            }
-        }, headers=self.headers)
+        send_request(self, self._toast_notification_request(username, msg, toast_type))
 
     @check_auth
     def add_workflow_task(self, workflow_token, row_data, initiator=None, link_rows=None, new_linked_rows=None):
-        url = self._add_workflow_task_url(workflow_token)
-        headers = {'Authorization': 'Token ' + self.jwt_token}
-        response = requests.post(url, data={
-            'row_data': json.dumps(row_data),
-            'initiator': initiator,
-            'link_rows': json.dumps(link_rows or []),
-            'new_linked_rows': json.dumps(new_linked_rows or [])
-        }, headers=headers)
-        return parse_response(response)['task']
+        return self._send(self._add_workflow_task_request(workflow_token, row_data, initiator, link_rows,
+                                                          new_linked_rows))
 
     @check_auth
     def add_workflow_task_with_existed_row(self, workflow_token, row_id, initiator=None):
-        url = self._add_workflow_task_url(workflow_token)
-        headers = {'Authorization': 'Token ' + self.jwt_token}
-        response = requests.post(url, data={'row_id': row_id, 'initiator': initiator}, headers=headers)
-        return parse_response(response)['task']
+        return self._send(self._add_workflow_task_with_existed_row_request(workflow_token, row_id, initiator))
 
     @check_auth
     @api_gateway_wrapper
     def big_data_insert_rows(self, table_name, rows_data):
-        url = self._dtable_db_insert_rows_url()
-        json_data = {
-            'table_name': table_name,
-            'rows': rows_data,
-        }
-        response = requests.post(url, json=json_data, headers=self.headers, timeout=self.timeout)
-        return parse_response(response)
+        return self._send(self._big_data_insert_rows_request(table_name, rows_data))
 
 
     ####   custom assets ######
@@ -1229,102 +1015,137 @@ class SeaTableAPI(object):
         :param path: str
         :return: str
         """
-        url = self._app_custom_download_link_url()
-        params = {'path': path}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data.get('download_link')
+        return self._send(self._custom_file_download_link_request(path))
 
     @check_auth
     def get_custom_file_upload_link(self, path):
-        url = self._app_custom_upload_link_url()
-        params = {'path': path}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._custom_file_upload_link_request(path))
 
     @check_auth
     def download_custom_file(self, path, save_path):
-        download_link = self.get_custom_file_download_link(parse.unquote(path))
-        response = requests.get(download_link, timeout=self.timeout)
-        if response.status_code != 200:
-            raise Exception('download file error')
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        path = parse.unquote(path)
+        self._download_to_file(self.dtable_uuid + '/custom/' + path.lstrip('/'),
+                               lambda: self.get_custom_file_download_link(path), save_path)
+
+    def _custom_folder_scope(self, custom_folder_path):
+        return '%s/custom/%s' % (self.dtable_uuid, custom_folder_path.strip('/'))
+
+    def _upload_custom_file(self, upload_link_dict, custom_folder_path, name, stream, replace=False):
+        relative_path = upload_link_dict.get('relative_path')
+        d = self._send(self._upload_request(upload_link_dict, name, stream, relative_path, replace))[0]
+        return self.get_custom_file_info(custom_folder_path, d.get('name'))
 
     @check_auth
-    def upload_local_file_to_custom_folder(self, local_path, custom_folder_path = None, name=None, ):
+    def upload_local_file_to_custom_folder(self, local_path, custom_folder_path = None, name=None, replace=False):
         if not name:
             name = local_path.strip('/').split('/')[-1]
         if not custom_folder_path:
             custom_folder_path = '/'
 
-        upload_link_dict = self.get_custom_file_upload_link(parse.unquote(custom_folder_path))
-        upload_link = upload_link_dict.get('upload_link') + '?ret-json=1'
-        parent_path = upload_link_dict.get('parent_path')
-        relative_path = upload_link_dict.get('relative_path')
+        def upload():
+            upload_link_dict = self.get_custom_file_upload_link(parse.unquote(custom_folder_path))
+            with open(local_path, 'rb') as f:
+                return self._upload_custom_file(upload_link_dict, custom_folder_path, name, f, replace)
 
-        response = requests.post(upload_link, data={
-            'parent_dir': parent_path,
-            'relative_path': relative_path,
-            'replace': 0
-        }, files={
-            'file': (name, open(local_path, 'rb'))
-        }, timeout=self.timeout)
-        d = response.json()[0]
+        if self.upload_index is None or replace:
+            return upload()
+        digest, size = file_digest(local_path)
+        return self._deduplicated_upload(self._custom_folder_scope(custom_folder_path), digest, size, upload)
 
-        file_name = d.get('name')
-        return self.get_custom_file_info(custom_folder_path, file_name)
+    @check_auth
+    def sync_custom_folder(self, local_dir, custom_folder_path='/', workers=4):
+        """Upload the files of local_dir that are new or changed to a custom asset folder
+
+        A file is unchanged when the upload index holds the content hash it
+        was last uploaded with and it still matches, or, without a record,
+        when the remote file has the same size. Changed files replace the
+        remote ones. Sub folders are not synced.
+
+        :param local_dir: str
+        :param custom_folder_path: str
+        :param workers: int, files uploaded at the same time
+        :return: dict, {'uploaded': [info dict], 'unchanged': [name], 'failed': [{'name': str, 'error': str}]}
+        """
+        try:
+            remote_list = self.list_custom_assets(custom_folder_path).get('file_list') or []
+        except ConnectionError:
+            # the folder does not exist yet
+            remote_list = []
+        remote_files = {item.get('name'): item for item in remote_list}
+        scope = self._custom_folder_scope(custom_folder_path)
+        upload_link = UploadLink(lambda: self.get_custom_file_upload_link(parse.unquote(custom_folder_path)))
+
+        def sync(entry):
+            digest, size = file_digest(entry.path)
+            remote_file = remote_files.get(entry.name)
+            if remote_file is not None:
+                record = self.upload_index.get_folder_file(scope, entry.name) if self.upload_index else None
+                if record is not None:
+                    unchanged = record[0] == digest
+                else:
+                    remote_size = remote_file.get('size')
+                    if remote_size is None:
+                        remote_size = self.get_custom_file_info(custom_folder_path, entry.name).get('size')
+                    unchanged = remote_size == size
+                if unchanged:
+                    if self.upload_index is not None and record is None:
+                        self.upload_index.put_folder_file(scope, entry.name, digest, size)
+                    return None
+
+            def upload_to(upload_link_dict):
+                with open(entry.path, 'rb') as f:
+                    return self._upload_custom_file(upload_link_dict, custom_folder_path, entry.name, f,
+                                                    replace=remote_file is not None)
+            info = upload_link.send(upload_to)
+            if self.upload_index is not None:
+                self.upload_index.put_folder_file(scope, entry.name, digest, size)
+            return info
+
+        def sync_entry(entry):
+            try:
+                return entry, sync(entry), None
+            except Exception as e:
+                return entry, None, e
+
+        entries = sorted((entry for entry in os.scandir(local_dir) if entry.is_file()), key=lambda entry: entry.name)
+        result = {'uploaded': [], 'unchanged': [], 'failed': []}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for entry, info, error in executor.map(sync_entry, entries):
+                if error is not None:
+                    result['failed'].append({'name': entry.name, 'error': str(error)})
+                elif info is None:
+                    result['unchanged'].append(entry.name)
+                else:
+                    result['uploaded'].append(info)
+        return result
 
     @check_auth
     def get_custom_file_info(self, path, name):
-        url = self._app_custom_asset_file_url()
-        params = {'path': path, 'name': name}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        d = data['dirent']
-        file_name = d.get('obj_name')
-        file_name_ext = file_name.split('.')[-1]
-        asset_uuid = d.get('uuid')
-
-        return {
-            'type': 'file',
-            'size': d.get('file_size'),
-            'name': d.get('obj_name'),
-            'url': 'custom-asset://%s.%s' % (asset_uuid, file_name_ext)
-        }
+        return self._custom_file_info(self._send(self._custom_file_info_request(path, name)))
 
     @check_auth
     def list_custom_assets(self, path):
-        url = self._app_custom_asset_dir_url()
-        params = {'path': path}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._list_custom_assets_request(path))
 
     @check_auth
     def get_user_info(self, username):
-        url = self._app_user_info_url()
-        params = {'username': username}
-        headers = parse_headers(self.token)
-        response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
-        data = parse_response(response)
-        return data
+        return self._send(self._user_info_request(username))
 
 
 
 class Account(object):
-    def __init__(self, login_name, password, server_url):
+    def __init__(self, login_name, password, server_url, session=None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                 max_retries=DEFAULT_MAX_RETRIES, rate_limiter=None):
         self.login_name = login_name
         self.username = None
         self.password = password
         self.server_url = server_url.strip().strip('/')
         self.token = None
         self.timeout = 30
+        self.session = session or gen_session(pool_size=pool_size, keep_alive=keep_alive, max_retries=max_retries)
+        if rate_limiter:
+            self.session = ThrottledSession(self.session, rate_limiter)
+        self.rate_limiter = rate_limiter
 
     def __str__(self):
         return '<SeaTable Account [ %s ]>' % (self.login_name)
@@ -1358,7 +1179,7 @@ class Account(object):
         }
 
     def auth(self):
-        response = requests.post(self._get_api_token_url(), data={
+        response = self.session.post(self._get_api_token_url(), data={
             'username': self.login_name,
             'password': self.password
         }, timeout=self.timeout)
@@ -1366,11 +1187,11 @@ class Account(object):
         self.token = data.get('token')
 
     def load_account_info(self):
-        response = requests.get(self._get_account_info_url(), headers=self.token_headers, timeout=self.timeout)
+        response = self.session.get(self._get_account_info_url(), headers=self.token_headers, timeout=self.timeout)
         self.username = parse_response(response).get('email')
 
     def list_workspaces(self):
-        response = requests.get(self._list_workspaces_url(), headers=self.token_headers, timeout=self.timeout)
+        response = self.session.get(self._list_workspaces_url(), headers=self.token_headers, timeout=self.timeout)
         return parse_response(response)
 
     def add_base(self, name, workspace_id=None):
@@ -1392,14 +1213,14 @@ class Account(object):
                     break
         if not owner:
             raise Exception('workspace_id invalid.')
-        response = requests.post(self._add_base_url(), data={
+        response = self.session.post(self._add_base_url(), data={
             'name': name,
             'owner': owner
         }, headers=self.token_headers, timeout=self.timeout)
         return parse_response(response).get('table')
 
     def copy_base(self, src_workspace_id, base_name, dst_workspace_id):
-        response = requests.post(self._get_copy_dtable_url(), data={
+        response = self.session.post(self._get_copy_dtable_url(), data={
             'src_workspace_id': src_workspace_id,
             'name': base_name,
             'dst_workspace_id': dst_workspace_id
@@ -1407,9 +1228,10 @@ class Account(object):
         return parse_response(response).get('dtable')
 
     def get_base(self, workspace_id, base_name, with_socket_io=False):
-        response = requests.get(self._get_temp_api_token_url(workspace_id, base_name),
+        response = self.session.get(self._get_temp_api_token_url(workspace_id, base_name),
             headers=self.token_headers, timeout=self.timeout)
         api_token = parse_response(response).get('api_token')
-        base = SeaTableAPI(api_token, self.server_url)
+        base = SeaTableAPI(api_token, self.server_url, session=self.session)
+        base.rate_limiter = self.rate_limiter
         base.auth(with_socket_io=with_socket_io)
         return base
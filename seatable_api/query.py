@@ -1,9 +1,14 @@
-import copy
+import functools
+import threading
+from datetime import datetime, timezone
+from itertools import islice
 
 # https://ply.readthedocs.io
 from ply import lex, yacc
 
 from .column import get_column_by_type
+from .constants import ColumnTypes
+from .utils import _format_date
 
 
 class Lexer(object):
@@ -59,108 +64,203 @@ class Lexer(object):
         raise ValueError('Illegal character!', t.value[0])
 
 
+CONDITIONS_CACHE_SIZE = 256
+
+CONDITION_METHODS = {
+    '=': 'equal',
+    '!=': 'unequal',
+    '<>': 'unequal',
+    '>=': 'greater_equal_than',
+    '>': 'greater_than',
+    '<=': 'less_equal_than',
+    '<': 'less_than',
+    'like': 'like',
+}
+
+
+# column types whose comparisons dtable-db sql evaluates exactly like match()
+# does. Text comparisons may differ in case handling, dates in time zone, so
+# they are left to the client
+SQL_COLUMN_TYPES = (
+    ColumnTypes.NUMBER.value,
+    ColumnTypes.CHECKBOX.value,
+)
+
+SQL_OPERATORS = {
+    '=': '=',
+    '!=': '!=',
+    '<>': '!=',
+    '>=': '>=',
+    '>': '>',
+    '<=': '<=',
+    '<': '<',
+}
+
+
+class Filter(object):
+    """A single `column condition value` comparison, bound to the column type
+    """
+
+    def __init__(self, column, column_type, condition, value):
+        self.column = column
+        self.column_type = column_type
+        self.column_obj = get_column_by_type(column_type)
+        self.condition = condition
+        self.method = CONDITION_METHODS[condition]
+        self.raw_value = value
+        self.value = self.column_obj.parse_input_value(value)
+
+    def match(self, row):
+        return getattr(self.column_obj.parse_table_value(row.get(self.column)), self.method)(self.value)
+
+    def to_sql(self):
+        """The comparison as a dtable-db WHERE condition, None if sql can not express it exactly
+        """
+        if self.column_type not in SQL_COLUMN_TYPES or '`' in self.column or self.raw_value == '' \
+                or self.condition not in SQL_OPERATORS:
+            return None
+        column = '`%s`' % self.column
+
+        if self.column_type == ColumnTypes.CHECKBOX.value:
+            if self.method not in ('equal', 'unequal'):
+                return None
+            if (self.method == 'equal') == self.value:
+                return '%s = true' % column
+            # unchecked cells may be empty
+            return '(%s = false OR %s IS NULL)' % (column, column)
+
+        sql = '%s %s %r' % (column, SQL_OPERATORS[self.condition], self.value)
+        if self.method == 'unequal':
+            # empty cells are unequal to any value
+            sql = '(%s OR %s IS NULL)' % (sql, column)
+        return sql
+
+
+class Merge(object):
+    """Two conditions joined by `and` / `or`, the right one is only checked when needed
+    """
+
+    def __init__(self, left, conjunction, right):
+        self.left = left
+        self.conjunction = conjunction.lower()
+        self.right = right
+
+    def match(self, row):
+        if self.conjunction == 'and':
+            return self.left.match(row) and self.right.match(row)
+        return self.left.match(row) or self.right.match(row)
+
+    def to_sql(self):
+        left, right = self.left.to_sql(), self.right.to_sql()
+        if left is None or right is None:
+            return None
+        return '(%s %s %s)' % (left, self.conjunction.upper(), right)
+
+
+def split_sql_conditions(conditions):
+    """Split compiled conditions into the part dtable-db can evaluate and the rest
+
+    Conditions joined by `and` are split apart, so a comparison sql can not
+    express only keeps that one comparison on the client.
+
+    :param conditions: Filter or Merge
+    :return: tuple, (sql WHERE condition or None, Filter / Merge left to match or None)
+    """
+    sql = conditions.to_sql()
+    if sql is not None:
+        return sql, None
+    if isinstance(conditions, Merge) and conditions.conjunction == 'and':
+        left_sql, left_rest = split_sql_conditions(conditions.left)
+        right_sql, right_rest = split_sql_conditions(conditions.right)
+        sql = ' AND '.join(item for item in (left_sql, right_sql) if item) or None
+        if left_rest and right_rest:
+            return sql, Merge(left_rest, 'and', right_rest)
+        return sql, left_rest or right_rest
+    return None, conditions
+
+
+def _list_rows_time(value):
+    """A dtable-db ctime / mtime as list_rows gives it, UTC with milliseconds
+    """
+    try:
+        date_value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        return value
+    if date_value.tzinfo is not None:
+        date_value = date_value.astimezone(timezone.utc)
+    return date_value.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+00:00'
+
+
+def _list_rows_date(value):
+    # convert_db_rows formats dates of columns with a date format, not the others
+    if isinstance(value, str) and 'T' in value:
+        try:
+            return _format_date(value, False)
+        except ValueError:
+            return value
+    return value
+
+
+LIST_ROWS_CONVERTERS = {
+    ColumnTypes.CTIME.value: _list_rows_time,
+    ColumnTypes.MTIME.value: _list_rows_time,
+    ColumnTypes.DATE.value: _list_rows_date,
+}
+
+
+def convert_list_rows_shape(columns, rows):
+    """Give rows query() returns the cell formats of list_rows, which the
+    column.py comparisons parse
+
+    :param columns: list, the table columns as list_columns returns them
+    :param rows: iterable of dict, changed in place
+    :return: generator of dict
+    """
+    converters = [(column['name'], LIST_ROWS_CONVERTERS[column.get('type')]) for column in columns
+                  if column.get('type') in LIST_ROWS_CONVERTERS]
+    for row in rows:
+        for name, convert in converters:
+            if row.get(name):
+                row[name] = convert(row[name])
+        yield row
+
+
 class ConditionsParser(object):
+    """Parses a conditions string into a tree of ('filter', column, condition, value)
+    and ('merge', left, conjunction, right) tuples
+
+    `and` and `or` have the same precedence and group from the left, so
+    `a or b and c` means `(a or b) and c`, use parentheses to group otherwise.
+
+    Building the LALR tables is slow, use get_conditions_parser() to share one
+    instance. parse() holds a lock, the lexer keeps state between tokens.
+    """
 
     def __init__(self):
         self.yaccer = yacc.yacc(module=self, debug=False)
         self.lexer = Lexer().lexer
+        self.lock = threading.Lock()
 
     # Parse
-    def parse(self, raw_rows, raw_columns, conditions):
-        self.raw_rows = raw_rows
-        self.raw_columns = raw_columns
-        self.raw_columns_map = {column['name']: column for column in raw_columns}
-        # main
-        rows = self.yaccer.parse(conditions, lexer=self.lexer)
-        return rows
-
-    def _check_column_exists(self, column):
-        if column not in self.raw_columns_map:
-            raise ValueError('Column not found!', column)
-
-    def _merge(self, left_rows, condition, right_rows):
-        merged_rows = []
-        left_rows_id_list = [row['_id'] for row in left_rows]
-
-        if condition.lower() == 'and':
-            for row in right_rows:
-                if row['_id'] in left_rows_id_list:
-                    merged_rows.append(row)
-
-        elif condition.lower() == 'or':
-            merged_rows = left_rows
-            for row in right_rows:
-                if row['_id'] not in left_rows_id_list:
-                    merged_rows.append(row)
-        return merged_rows
-
-    def _filter(self, column, condition, value):
-        self._check_column_exists(column)
-        filtered_rows = []
-        column_type = self.raw_columns_map[column].get('type')
-        column_obj = get_column_by_type(column_type)
-        value = column_obj.parse_input_value(value)
-
-        if condition == '=':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).equal(value):
-                    filtered_rows.append(row)
-
-        elif condition in ('!=', '<>'):
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).unequal(value):
-                    filtered_rows.append(row)
-
-        elif condition == '>=':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).greater_equal_than(value):
-                    filtered_rows.append(row)
-
-        elif condition == '>':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).greater_than(value):
-                    filtered_rows.append(row)
-
-        elif condition == '<=':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).less_equal_than(value):
-                    filtered_rows.append(row)
-
-        elif condition == '<':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).less_than(value):
-                    filtered_rows.append(row)
-
-        elif condition == 'like':
-            for row in self.raw_rows:
-                cell_value = row.get(column)
-                if column_obj.parse_table_value(cell_value).like(value):
-                    filtered_rows.append(row)
-
-        return filtered_rows
+    def parse(self, conditions):
+        with self.lock:
+            return self.yaccer.parse(conditions, lexer=self.lexer)
 
     # List of token names. This is always required
     tokens = (
+        'LBORDER', 'RBORDER',
         'AND', 'OR',
         'EQUAL', 'NOT_EQUAL', 'GTE', 'GT', 'LTE', 'LT', 'LIKE',
         'QUOTE_STRING', 'STRING',
     )
 
     def p_merge(self, p):
-        """merge : filter AND filter
-                 | filter OR filter
-                 | merge AND filter
+        """merge : merge AND filter
                  | merge OR filter
                  | filter
         """
         if len(p.slice) > 2:
-            p[0] = self._merge(p[1], p[2], p[3])
+            p[0] = ('merge', p[1], p[2], p[3])
         else:
             p[0] = p[1]
 
@@ -173,7 +273,12 @@ class ConditionsParser(object):
                   | factor LT factor
                   | factor LIKE factor
         """
-        p[0] = self._filter(p[1], p[2], p[3])
+        p[0] = ('filter', p[1], p[2], p[3])
+
+    def p_filter_group(self, p):
+        """filter : LBORDER merge RBORDER
+        """
+        p[0] = p[2]
 
     def p_factor(self, p):
         """factor : QUOTE_STRING
@@ -183,18 +288,70 @@ class ConditionsParser(object):
 
     # Error rule for syntax errors
     def p_error(self, p):
-        raise ValueError('Syntax error in input!', p.value)
+        raise ValueError('Syntax error in input!', p.value if p else 'end of input')
 
 
-class QuerySet(object):
+_conditions_parser = None
+_conditions_parser_lock = threading.Lock()
 
-    def __init__(self, base, table_name):
+
+def get_conditions_parser():
+    global _conditions_parser
+    with _conditions_parser_lock:
+        if _conditions_parser is None:
+            _conditions_parser = ConditionsParser()
+        return _conditions_parser
+
+
+def _build_conditions(node, columns_map):
+    if node[0] == 'merge':
+        _, left, conjunction, right = node
+        return Merge(_build_conditions(left, columns_map), conjunction, _build_conditions(right, columns_map))
+    _, column, condition, value = node
+    if column not in columns_map:
+        raise ValueError('Column not found!', column)
+    return Filter(column, columns_map[column], condition, value)
+
+
+@functools.lru_cache(maxsize=CONDITIONS_CACHE_SIZE)
+def compile_conditions(conditions, schema):
+    """Compile a conditions string against a table schema, the result is cached
+
+    :param conditions: str
+    :param schema: tuple, (column name, column type) pairs
+    :return: Filter or Merge
+    """
+    tree = get_conditions_parser().parse(conditions)
+    return _build_conditions(tree, dict(schema))
+
+
+class QuerySet(object):
+    """Rows of a table narrowed down by conditions
+
+    A queryset made by base.filter is lazy: filter / get / all only combine
+    conditions, the rows are requested when they are first used. Conditions
+    dtable-db sql evaluates exactly like the client are sent as a WHERE
+    clause, the rest is matched on the client over the sql results, whose
+    cells are converted to the list_rows formats. Querysets on a view, and
+    conditions sql can not express at all, read the rows with iter_rows.
+    first / get / exists ask for one row and count for COUNT(*) when the
+    whole condition is sql.
+
+    Once its rows are loaded, querysets chained from it filter those rows
+    and share the row dicts instead of copying them, update replaces the
+    rows it changes with new dicts so other querysets keep their values.
+    Changing a returned row in place is visible in every queryset sharing it.
+    """
+
+    def __init__(self, base, table_name, view_name=None):
         self.base = base
         self.table_name = table_name
-        self.raw_rows = []
+        self.view_name = view_name
+        # None for the whole table on the server
+        self.raw_rows = None
         self.raw_columns = []
         self.conditions = ''
-        self.rows = []
+        self._rows = None
 
     def __str__(self):
         return '<SeaTable Queryset [ %s ]>' % self.table_name
@@ -211,86 +368,163 @@ class QuerySet(object):
     def __bool__(self):
         return len(self.rows) > 0
 
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = self._fetch_rows()
+        return self._rows
+
+    @rows.setter
+    def rows(self, rows):
+        self._rows = rows
+
     def _clone(self):
-        clone = self.__class__(self.base, self.table_name)
+        clone = self.__class__(self.base, self.table_name, self.view_name)
         return clone
 
+    def _compile_conditions(self):
+        if not self.conditions or not self.raw_columns:
+            return None
+        schema = tuple((column['name'], column.get('type')) for column in self.raw_columns)
+        return compile_conditions(self.conditions, schema)
+
+    def _sql_plan(self):
+        """
+        :return: tuple, (sql WHERE condition or None, conditions left to match or None)
+        """
+        conditions = self._compile_conditions()
+        if conditions is None:
+            return None, None
+        if self.view_name:
+            return None, conditions
+        return split_sql_conditions(conditions)
+
+    def _select_sql(self, columns, where, limit=None):
+        sql = 'SELECT %s FROM `%s`' % (columns, self.table_name)
+        if where:
+            sql += ' WHERE %s' % where
+        if limit:
+            sql += ' LIMIT %d' % limit
+        return sql
+
+    def _fetch_rows(self, limit=None):
+        if self.raw_rows is not None:
+            conditions = self._compile_conditions()
+            rows = self.raw_rows
+        else:
+            where, conditions = self._sql_plan()
+            if where:
+                if conditions is None and limit:
+                    rows = self.base.query(self._select_sql('*', where, limit))
+                else:
+                    rows = self.base.iter_query(self._select_sql('*', where))
+                rows = convert_list_rows_shape(self.raw_columns, rows)
+            else:
+                rows = self.base.iter_rows(self.table_name, self.view_name)
+        if conditions is not None:
+            rows = (row for row in rows if conditions.match(row))
+        return list(islice(rows, limit))
+
     def _execute_conditions(self):
-        if self.conditions and self.raw_rows and self.raw_columns:
-            # main
-            conditions_parser = ConditionsParser()
-            rows = conditions_parser.parse(
-                copy.deepcopy(self.raw_rows),
-                copy.deepcopy(self.raw_columns),
-                copy.copy(self.conditions),
-            )
-            self.rows = rows
+        self.rows = self._fetch_rows()
+
+    def _chain(self, conditions):
+        clone = self._clone()
+        clone.raw_columns = self.raw_columns
+        if self._rows is None:
+            clone.raw_rows = self.raw_rows
+            if self.conditions and conditions:
+                conditions = '(%s) and (%s)' % (self.conditions, conditions)
+            clone.conditions = conditions or self.conditions
         else:
-            self.rows = self.raw_rows
+            clone.raw_rows = self._rows
+            clone.conditions = conditions
+        # raise syntax and unknown column errors here rather than on first use
+        clone._compile_conditions()
+        return clone
 
     def filter(self, conditions=''):
-        """Performs the query and returns a new QuerySet instance.
+        """Returns a new QuerySet narrowed down by conditions.
         :param conditions: str
         :return: queryset
         """
-        clone = self._clone()
-        clone.raw_rows = copy.deepcopy(self.rows)
-        clone.raw_columns = copy.deepcopy(self.raw_columns)
-        clone.conditions = conditions
-        clone._execute_conditions()
-        return clone
+        return self._chain(conditions)
 
     def get(self, conditions=''):
         """Performs the query and returns a single row matching the given keyword arguments.
         :param conditions: str
         :return row: dict
         """
-        clone = self._clone()
-        clone.raw_rows = copy.deepcopy(self.rows)
-        clone.raw_columns = copy.deepcopy(self.raw_columns)
-        clone.conditions = conditions
-        clone._execute_conditions()
-        if len(clone.rows) == 0:
-            return None
-        else:
-            return clone.rows[0]
+        return self._chain(conditions).first()
 
     def all(self):
         """Returns a new QuerySet that is a copy of the current one.
         :return: queryset
         """
         clone = self._clone()
-        clone.raw_rows = copy.deepcopy(self.raw_rows)
-        clone.raw_columns = copy.deepcopy(self.raw_columns)
-        clone.conditions = copy.copy(self.conditions)
-        clone.rows = copy.deepcopy(self.rows)
+        clone.raw_rows = self.raw_rows
+        clone.raw_columns = self.raw_columns
+        clone.conditions = self.conditions
+        clone._rows = self._rows
         return clone
 
-    def update(self, row_data):
+    def update(self, row_data, chunk_size=None, workers=None):
         """Updates all elements in the current QuerySet, setting all the given fields to the appropriate values.
+
+        The rows are sent through base.batch_update_rows, only rows of chunks the
+        server acknowledged are changed in the QuerySet.
         :param row_data: dict
-        :return rows: list
+        :param chunk_size: int, rows per request, defaults to the base's batch_chunk_size
+        :param workers: int, requests sent at once, defaults to the base's batch_workers
+        :return results: list, {'_id': str, 'success': bool[, 'error': str]} for each row
         """
-        for row in self.rows:
-            response = self.base.update_row(self.table_name, row['_id'], row_data)
-            row.update(row_data)
-        return self.rows
+        rows = self.rows
+        if not rows:
+            return []
+        updates = [{'row_id': row['_id'], 'row': row_data} for row in rows]
+        result = self.base.batch_update_rows(self.table_name, updates, chunk_size=chunk_size, workers=workers)
+
+        updated_rows = list(rows)
+        results = []
+        for chunk in result['chunks']:
+            for index in range(chunk['offset'], chunk['offset'] + chunk['count']):
+                row_result = {'_id': rows[index]['_id'], 'success': chunk['success']}
+                if chunk['success']:
+                    row = dict(rows[index])
+                    row.update(row_data)
+                    updated_rows[index] = row
+                else:
+                    row_result['error'] = chunk['error']
+                results.append(row_result)
+        self.rows = updated_rows
+        return results
 
     def delete(self):
         """Deletes the rows in the current QuerySet.
-        :return: int
+
+        Rows of chunks the server did not acknowledge stay in the QuerySet.
+        :return: int, number of rows deleted
         """
-        row_ids = [row['_id'] for row in self.rows]
-        response = self.base.batch_delete_rows(self.table_name, row_ids)
-        self.rows = []
-        return len(row_ids)
+        rows = self.rows
+        if not rows:
+            return 0
+        row_ids = [row['_id'] for row in rows]
+        result = self.base.batch_delete_rows(self.table_name, row_ids)
+
+        failed_rows = []
+        for chunk in result['chunks']:
+            if not chunk['success']:
+                failed_rows.extend(rows[chunk['offset']:chunk['offset'] + chunk['count']])
+        self.rows = failed_rows
+        return len(rows) - len(failed_rows)
 
     def first(self):
         """Returns the first object of a query, returns None if no match is found.
         :return row: dict
         """
-        if self.rows:
-            return self.rows[0]
+        rows = self._rows if self._rows is not None else self._fetch_rows(limit=1)
+        if rows:
+            return rows[0]
         else:
             return None
 
@@ -307,7 +541,16 @@ class QuerySet(object):
         """Returns the number of rows as an integer.
         :return: int
         """
+        if self._rows is None and self.raw_rows is None:
+            where, conditions = self._sql_plan()
+            if conditions is None and not self.view_name:
+                results = self.base.query(self._select_sql('COUNT(*)', where))
+                return list(results[0].values())[0] if results else 0
         return len(self.rows)
 
     def exists(self):
-        return len(self.rows) > 0
+        if self._rows is None and self.raw_rows is None:
+            where, conditions = self._sql_plan()
+            if where and conditions is None:
+                return bool(self.base.query(self._select_sql('`_id`', where, 1)))
+        return self.first() is not None
@@ -0,0 +1,148 @@
+import re
+import threading
+import time
+
+
+QUERY_URL_REG = re.compile(r'/api/v1/query/[^/]+/?$|/api/v2/dtables/[^/]+/sql/?$')
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket
+
+    Tokens refill at `rate` per second up to `burst`. A caller that finds
+    the bucket empty reserves its token anyway and sleeps until it is due,
+    so concurrent callers are served in order instead of spinning.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """
+        :param rate: float, requests per second, None for no limit
+        :param burst: int, requests allowed at once, defaults to max(1, rate)
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self):
+        """Take one token, blocking until it is available
+
+        :return: float, seconds waited
+        """
+        with self.lock:
+            self.requests += 1
+            if self.rate is None:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait:
+                self.waits += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'requests': self.requests,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'max_wait': self.max_wait,
+            }
+
+
+class RateLimiter(object):
+    """Client-side throttle for a base, shared by its clones and api gateway
+
+    Requests to the dtable-db sql endpoint take a token from the query
+    bucket, every other request from the rows bucket.
+
+    Usage:
+        limiter = RateLimiter(rate=5, burst=10, query_rate=1)
+        base = Base(api_token, server_url, rate_limiter=limiter)
+        ...
+        limiter.metrics()  # {'rows': {..., 'wait_time': 1.2}, 'query': {...}}
+    """
+
+    def __init__(self, rate=None, burst=None, query_rate=None, query_burst=None):
+        """
+        :param rate: float, row API requests per second, None for no limit
+        :param burst: int, row API requests allowed at once
+        :param query_rate: float, sql query requests per second, None for no limit
+        :param query_burst: int, sql query requests allowed at once
+        """
+        self.rows = TokenBucket(rate, burst)
+        self.query = TokenBucket(query_rate, query_burst)
+
+    def bucket_for(self, url):
+        if QUERY_URL_REG.search(url.split('?', 1)[0]):
+            return self.query
+        return self.rows
+
+    def throttle(self, url):
+        """Block until a request to url may be sent
+
+        :return: float, seconds waited
+        """
+        return self.bucket_for(url).acquire()
+
+    def metrics(self):
+        return {
+            'rows': self.rows.metrics(),
+            'query': self.query.metrics(),
+        }
+
+    def reset_metrics(self):
+        for bucket in (self.rows, self.query):
+            with bucket.lock:
+                bucket.reset_metrics()
+
+
+class ThrottledSession(object):
+    """Wraps a requests session, throttling every request through a RateLimiter
+
+    The throttle runs once per call. Retries the session's HTTPAdapter
+    makes for a call, after a 429 or 5xx, are sent by urllib3 below this
+    wrapper and are not throttled, they only wait for the RetryPolicy
+    backoff or the server's Retry-After.
+    """
+
+    def __init__(self, session, rate_limiter):
+        self.session = session
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, **kwargs):
+        self.rate_limiter.throttle(url)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
@@ -0,0 +1,722 @@
+import json
+from urllib import parse
+from uuid import UUID
+
+from .constants import ROW_FILTER_KEYS, ColumnTypes
+from .constants import RENAME_COLUMN, RESIZE_COLUMN, FREEZE_COLUMN, MOVE_COLUMN, MODIFY_COLUMN_TYPE
+from .columnar import convert_db_columns
+from .session import ApiRequest
+from .upload import MultipartBody
+from .utils import convert_db_rows, like_table_id, parse_headers
+
+
+def _view_url(url, table_name, view_name=None):
+    if view_name is None:
+        return '%(url)s/?table_name=%(table_name)s' % ({
+            "url": url.rstrip('/'),
+            'table_name': table_name
+        })
+    return '%(url)s/%(view_name)s/?table_name=%(table_name)s' % ({
+        "url": url.rstrip('/'),
+        'view_name': view_name,
+        'table_name': table_name
+    })
+
+
+def _check_filters(filters, filter_conjunction):
+    if not filters:
+        raise ValueError('filters can not be empty.')
+    if not isinstance(filters, list):
+        raise ValueError('filters invalid.')
+    if len(filters) != len([f for f in filters if isinstance(f, dict)]):
+        raise ValueError('filters invalid.')
+
+    for f in filters:
+        for key in f.keys():
+            if key not in ROW_FILTER_KEYS:
+                raise ValueError('filters invalid.')
+
+    if filter_conjunction not in ['And', 'Or']:
+        raise ValueError('filter_conjunction invalid, filter_conjunction must be '
+                         '"And" or "Or"')
+
+
+def query_result(data, convert=True, format='rows'):
+    """The rows of a dtable-db query response, see query
+    """
+    if not data.get('success'):
+        raise Exception(data.get('error_message'))
+    metadata = data.get('metadata')
+    results = data.get('results')
+    if format != 'rows':
+        return convert_db_columns(metadata, results, format)
+    if convert:
+        converted_results = convert_db_rows(metadata, results)
+        return converted_results
+    else:
+        return results
+
+
+class BaseRequestBuilder(object):
+    """URLs and requests of the base api, shared by SeaTableAPI and AsyncSeaTableAPI
+
+    Every _<name>_request method builds the ApiRequest of the api method
+    <name>, the clients only send it, sync or async, and post-process the
+    result.
+    """
+
+    # api gateway rows are returned with column names instead of keys
+    convert_keys = False
+
+    def _metadata_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/metadata/'
+
+    def _table_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/tables/'
+
+    def _view_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/views/'
+
+    def _row_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/rows/'
+
+    def _batch_row_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-append-rows/'
+
+    def _batch_update_row_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-update-rows/'
+
+    def _batch_delete_row_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-delete-rows/'
+
+    def _filtered_rows_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/filtered-rows/'
+
+    def _row_link_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/links/'
+
+    def _batch_update_row_link_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/batch-update-links/'
+
+    def _app_access_token_url(self):
+        return self.server_url + '/api/v2.1/dtable/app-access-token/'
+
+    def _app_download_link_url(self):
+        return self.server_url + '/api/v2.1/dtable/app-download-link/'
+
+    def _app_custom_download_link_url(self):
+        return self.server_url + '/api/v2.1/dtable/custom/app-download-link/'
+
+    def _app_custom_asset_file_url(self):
+        return self.server_url + '/api/v2.1/dtable/custom/app-asset-file/'
+
+    def _app_custom_asset_dir_url(self):
+        return self.server_url + '/api/v2.1/dtable/custom/app-asset-dir/'
+
+    def _app_custom_upload_link_url(self):
+        return self.server_url + '/api/v2.1/dtable/custom/app-upload-link/'
+
+    def _app_upload_link_url(self):
+        return self.server_url + '/api/v2.1/dtable/app-upload-link/'
+
+    def _app_user_info_url(self):
+        return self.server_url + '/api/v2.1/dtable/app-user-info/'
+
+    def _column_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/columns/'
+
+    def _column_options_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/column-options/'
+
+    def _column_cascade_setting_server_url(self):
+        return self.dtable_server_url + '/api/v1/dtables/' + self.dtable_uuid + '/column-cascade-settings/'
+
+    def _third_party_accounts_url(self):
+        return self.server_url + '/api/v2.1/dtable/third-party-account/'
+
+    def _dtable_db_query_url(self):
+        return self.dtable_db_url + '/api/v1/query/' + self.dtable_uuid + '/'
+
+    def _dtable_db_linked_records_url(self):
+        return self.dtable_db_url + '/api/v1/linked-records/' + self.dtable_uuid + '/'
+
+    def _dtable_db_insert_rows_url(self):
+        return self.dtable_db_url + '/api/v1/insert-rows/' + self.dtable_uuid + '/'
+
+    def _get_related_users_url(self):
+        return '%(server_url)s/api/v2.1/dtables/%(dtable_uuid)s/related-users/' % {
+            'server_url': self.server_url,
+            'dtable_uuid': self.dtable_uuid
+        }
+
+    def _send_toast_notification_url(self):
+        return '%(dtable_server_url)s/api/v1/dtables/%(dtable_uuid)s/ui-toasts/' % {
+            'dtable_server_url': self.dtable_server_url,
+            'dtable_uuid': self.dtable_uuid
+        }
+
+    def _add_workflow_task_url(self, token):
+        return '%(server_url)s/api/v2.1/workflows/%(token)s/external-task-submit/' % {
+            'server_url': self.server_url,
+            'token': token
+        }
+
+    # auth and file links, with the api token
+
+    def _app_access_token_request(self):
+        return ApiRequest('GET', self._app_access_token_url(), headers=parse_headers(self.token))
+
+    def _account_detail_request(self, account_name):
+        params = {
+            'account_name': account_name
+        }
+        return ApiRequest('GET', self._third_party_accounts_url(), params=params, headers=parse_headers(self.token),
+                          key='account')
+
+    def _file_download_link_request(self, path):
+        return ApiRequest('GET', self._app_download_link_url(), params={'path': path},
+                          headers=parse_headers(self.token), key='download_link')
+
+    def _file_upload_link_request(self):
+        return ApiRequest('GET', self._app_upload_link_url(), headers=parse_headers(self.token))
+
+    def _custom_file_download_link_request(self, path):
+        return ApiRequest('GET', self._app_custom_download_link_url(), params={'path': path},
+                          headers=parse_headers(self.token), key='download_link')
+
+    def _custom_file_upload_link_request(self, path):
+        return ApiRequest('GET', self._app_custom_upload_link_url(), params={'path': path},
+                          headers=parse_headers(self.token))
+
+    def _custom_file_info_request(self, path, name):
+        return ApiRequest('GET', self._app_custom_asset_file_url(), params={'path': path, 'name': name},
+                          headers=parse_headers(self.token), key='dirent')
+
+    def _list_custom_assets_request(self, path):
+        return ApiRequest('GET', self._app_custom_asset_dir_url(), params={'path': path},
+                          headers=parse_headers(self.token))
+
+    def _user_info_request(self, username):
+        return ApiRequest('GET', self._app_user_info_url(), params={'username': username},
+                          headers=parse_headers(self.token))
+
+    def _upload_relative_path(self, upload_link_dict, file_type):
+        if file_type == 'image':
+            return upload_link_dict['img_relative_path']
+        return upload_link_dict['file_relative_path']
+
+    def _uploaded_file_info(self, relative_path, name, d, file_type):
+        """The info dict of an asset file, from the file server's answer d to its upload
+        """
+        url = '%(server)s/workspace/%(workspace_id)s/asset/%(dtable_uuid)s/%(relative_path)s/%(filename)s' % {
+            'server': self.server_url.strip('/'),
+            'workspace_id': self.workspace_id,
+            'dtable_uuid': str(UUID(self.dtable_uuid)),
+            'relative_path': parse.quote(relative_path.strip('/')),
+            'filename': parse.quote(d.get('name', name))
+        }
+        return {
+            'type': file_type,
+            'size': d.get('size'),
+            'name': d.get('name'),
+            'url': url
+        }
+
+    def _custom_file_info(self, d):
+        """The info dict of a custom asset file, from its dirent d
+        """
+        file_name = d.get('obj_name')
+        file_name_ext = file_name.split('.')[-1]
+        asset_uuid = d.get('uuid')
+
+        return {
+            'type': 'file',
+            'size': d.get('file_size'),
+            'name': d.get('obj_name'),
+            'url': 'custom-asset://%s.%s' % (asset_uuid, file_name_ext)
+        }
+
+    def _upload_request(self, upload_link_dict, name, stream, relative_path, replace=False):
+        """Post one file, streamed from stream, to an upload link
+        """
+        body = MultipartBody({
+            'parent_dir': upload_link_dict['parent_path'],
+            'relative_path': relative_path,
+            'replace': 1 if replace else 0
+        }, 'file', name, stream)
+        return ApiRequest('POST', upload_link_dict['upload_link'] + '?ret-json=1', data=body,
+                          headers={'Content-Type': body.content_type})
+
+    # tables and views
+
+    def _metadata_request(self):
+        return ApiRequest('GET', self._metadata_server_url(), key='metadata')
+
+    def _add_table_request(self, table_name, lang='en', columns=[]):
+        json_data = {
+            'table_name': table_name,
+            'lang': lang,
+        }
+        if columns:
+            json_data['columns'] = columns
+        return ApiRequest('POST', self._table_server_url(), json=json_data)
+
+    def _rename_table_request(self, table_name, new_table_name):
+        json_data = {
+            'table_name': table_name,
+            'new_table_name': new_table_name
+        }
+        return ApiRequest('PUT', self._table_server_url(), json=json_data)
+
+    def _delete_table_request(self, table_name):
+        json_data = {
+            'table_name': table_name,
+        }
+        return ApiRequest('DELETE', self._table_server_url(), json=json_data)
+
+    def _list_views_request(self, table_name):
+        params = {
+            'table_name': table_name
+        }
+        return ApiRequest('GET', self._view_server_url(), params=params)
+
+    def _get_view_by_name_request(self, table_name, view_name):
+        return ApiRequest('GET', _view_url(self._view_server_url(), table_name, view_name))
+
+    def _add_view_request(self, table_name, view_name):
+        json_data = {
+            'name': view_name
+        }
+        return ApiRequest('POST', _view_url(self._view_server_url(), table_name), json=json_data)
+
+    def _rename_view_request(self, table_name, view_name, new_view_name):
+        json_data = {
+            'name': new_view_name
+        }
+        return ApiRequest('PUT', _view_url(self._view_server_url(), table_name, view_name), json=json_data)
+
+    def _delete_view_request(self, table_name, view_name):
+        return ApiRequest('DELETE', _view_url(self._view_server_url(), table_name, view_name))
+
+    # rows
+
+    def _list_rows_request(self, table_name, view_name=None, order_by=None, desc=False, start=None, limit=None):
+        params = {
+            'table_name': table_name
+        }
+        if self.convert_keys:
+            params['convert_keys'] = True
+
+        if like_table_id(table_name):
+            params['table_id'] = table_name
+        if view_name:
+            params['view_name'] = view_name
+        if order_by:
+            params['order_by'] = order_by
+            params['direction'] = 'desc' if desc else 'asc'
+        if start:
+            params['start'] = start
+        if limit:
+            params['limit'] = limit
+        return ApiRequest('GET', self._row_server_url(), params=params, key='rows')
+
+    def _get_row_request(self, table_name, row_id):
+        params = {
+            'table_name': table_name
+        }
+        if self.convert_keys:
+            params['convert_keys'] = True
+
+        if like_table_id(table_name):
+            params['table_id'] = table_name
+        return ApiRequest('GET', self._row_server_url() + row_id + '/', params=params)
+
+    def _append_row_request(self, table_name, row_data, apply_default=None):
+        json_data = {
+            'table_name': table_name,
+            'row': row_data,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if apply_default is not None:
+            json_data['apply_default'] = apply_default
+        return ApiRequest('POST', self._row_server_url(), json=json_data)
+
+    def _batch_append_rows_request(self, table_name, rows_data, apply_default=None):
+        json_data = {
+            'table_name': table_name,
+            'rows': rows_data,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if apply_default is not None:
+            json_data['apply_default'] = apply_default
+        return ApiRequest('POST', self._batch_row_server_url(), json=json_data, compress=True)
+
+    def _insert_row_request(self, table_name, row_data, anchor_row_id, apply_default=None):
+        json_data = {
+            'table_name': table_name,
+            'row': row_data,
+            'anchor_row_id': anchor_row_id,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if apply_default is not None:
+            json_data['apply_default'] = apply_default
+        return ApiRequest('POST', self._row_server_url(), json=json_data)
+
+    def _update_row_request(self, table_name, row_id, row_data):
+        json_data = {
+            'table_name': table_name,
+            'row_id': row_id,
+            'row': row_data,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('PUT', self._row_server_url(), json=json_data)
+
+    def _batch_update_rows_request(self, table_name, rows_data):
+        json_data = {
+            'table_name': table_name,
+            'updates': rows_data,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('PUT', self._batch_update_row_server_url(), json=json_data, compress=True)
+
+    def _delete_row_request(self, table_name, row_id):
+        json_data = {
+            'table_name': table_name,
+            'row_id': row_id,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('DELETE', self._row_server_url(), json=json_data)
+
+    def _batch_delete_rows_request(self, table_name, row_ids):
+        json_data = {
+            'table_name': table_name,
+            'row_ids': row_ids,
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('DELETE', self._batch_delete_row_server_url(), json=json_data)
+
+    def _filter_rows_request(self, table_name, filters, view_name=None, filter_conjunction='And'):
+        _check_filters(filters, filter_conjunction)
+        params = {
+            'table_name': table_name,
+        }
+        if view_name:
+            params['view_name'] = view_name
+
+        json_data = {
+            'filters': filters,
+            'filter_conjunction': filter_conjunction,
+        }
+        return ApiRequest('GET', self._filtered_rows_server_url(), params=params, json=json_data, key='rows')
+
+    # links
+
+    def _link_json(self, link_id, table_name, other_table_name, **kwargs):
+        json_data = {
+            'link_id': link_id,
+            'table_name': table_name,
+            'other_table_name': other_table_name,
+        }
+        json_data.update(kwargs)
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if like_table_id(other_table_name):
+            json_data['other_table_id'] = other_table_name
+        return json_data
+
+    def _add_link_request(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    table_row_id=row_id, other_table_row_id=other_row_id)
+        return ApiRequest('POST', self._row_link_server_url(), json=json_data)
+
+    def _batch_add_links_request(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        json_data = self._link_json(link_id, table_name, other_table_name, other_rows_ids_map=other_rows_ids_map)
+        return ApiRequest('POST', self._row_link_server_url(), json=json_data)
+
+    def _remove_link_request(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    table_row_id=row_id, other_table_row_id=other_row_id)
+        return ApiRequest('DELETE', self._row_link_server_url(), json=json_data)
+
+    def _batch_remove_links_request(self, link_id, table_name, other_table_name, other_rows_ids_map):
+        json_data = self._link_json(link_id, table_name, other_table_name, other_rows_ids_map=other_rows_ids_map)
+        return ApiRequest('DELETE', self._row_link_server_url(), json=json_data)
+
+    def _update_link_request(self, link_id, table_name, other_table_name, row_id, other_rows_ids):
+        if not isinstance(other_rows_ids, list):
+            raise ValueError('params other_rows_ids requires type list')
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    row_id=row_id, other_rows_ids=other_rows_ids)
+        return ApiRequest('PUT', self._row_link_server_url(), json=json_data)
+
+    def _batch_update_links_request(self, link_id, table_name, other_table_name, row_id_list, other_rows_ids_map):
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    row_id_list=row_id_list, other_rows_ids_map=other_rows_ids_map)
+        return ApiRequest('PUT', self._batch_update_row_link_server_url(), json=json_data, compress=True)
+
+    def _linked_records_request(self, table_id, link_column_key, rows):
+        json_data = {
+            'table_id': table_id,
+            'link_column': link_column_key,
+            'rows': rows,
+        }
+        return ApiRequest('POST', self._dtable_db_linked_records_url(), json=json_data)
+
+    # columns
+
+    def _list_columns_request(self, table_name, view_name=None):
+        params = {
+            'table_name': table_name,
+        }
+        if like_table_id(table_name):
+            params['table_id'] = table_name
+        if view_name:
+            params['view_name'] = view_name
+        return ApiRequest('GET', self._column_server_url(), params=params, key='columns')
+
+    def _insert_column_request(self, table_name, column_name, column_type, column_key=None, column_data=None):
+        if column_type not in ColumnTypes:
+            raise ValueError("type %s invalid!" % (column_type,))
+        json_data = {
+            'table_name': table_name,
+            'column_name': column_name,
+            'column_type': column_type.value
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if column_key:
+            json_data['anchor_column'] = column_key
+        if column_data:
+            json_data['column_data'] = column_data
+        return ApiRequest('POST', self._column_server_url(), json=json_data)
+
+    def _column_op_request(self, op_type, table_name, column_key, **kwargs):
+        json_data = {
+            'op_type': op_type,
+            'table_name': table_name,
+            'column': column_key,
+        }
+        json_data.update(kwargs)
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('PUT', self._column_server_url(), json=json_data)
+
+    def _rename_column_request(self, table_name, column_key, new_column_name):
+        return self._column_op_request(RENAME_COLUMN, table_name, column_key, new_column_name=new_column_name)
+
+    def _resize_column_request(self, table_name, column_key, new_column_width):
+        return self._column_op_request(RESIZE_COLUMN, table_name, column_key, new_column_width=new_column_width)
+
+    def _freeze_column_request(self, table_name, column_key, frozen):
+        return self._column_op_request(FREEZE_COLUMN, table_name, column_key, frozen=frozen)
+
+    def _move_column_request(self, table_name, column_key, target_column_key):
+        return self._column_op_request(MOVE_COLUMN, table_name, column_key, target_column=target_column_key)
+
+    def _modify_column_type_request(self, table_name, column_key, new_column_type):
+        if new_column_type not in ColumnTypes:
+            raise ValueError("type %s invalid!" % (new_column_type,))
+        if new_column_type == ColumnTypes.LINK:
+            raise ValueError("Switching to link column type is not allowed!")
+        return self._column_op_request(MODIFY_COLUMN_TYPE, table_name, column_key,
+                                       new_column_type=new_column_type.value)
+
+    def _add_column_options_request(self, table_name, column, options):
+        json_data = {
+            "table_name": table_name,
+            "column": column,
+            "options": options
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('POST', self._column_options_server_url(), json=json_data)
+
+    def _add_column_cascade_settings_request(self, table_name, child_column, parent_column, cascade_settings):
+        json_data = {
+            "table_name": table_name,
+            "child_column": child_column,
+            "parent_column": parent_column,
+            "cascade_settings": cascade_settings
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('POST', self._column_cascade_setting_server_url(), json=json_data)
+
+    def _delete_column_request(self, table_name, column_key):
+        json_data = {
+            'table_name': table_name,
+            'column': column_key
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('DELETE', self._column_server_url(), json=json_data)
+
+    # query and others
+
+    def _query_request(self, sql):
+        if not sql:
+            raise ValueError('sql can not be empty.')
+        return ApiRequest('POST', self._dtable_db_query_url(), json={'sql': sql})
+
+    def _related_users_request(self):
+        return ApiRequest('GET', self._get_related_users_url(), key='user_list')
+
+    def _toast_notification_request(self, username, msg, toast_type='success'):
+        return ApiRequest('POST', self._send_toast_notification_url(), json={
+            'to_user': username,
+            'toast_type': toast_type,
+            'detail': {
+                'msg': str(msg)
+            }
+        })
+
+    def _workflow_task_request(self, workflow_token, data):
+        headers = {'Authorization': 'Token ' + self.jwt_token}
+        return ApiRequest('POST', self._add_workflow_task_url(workflow_token), data=data, headers=headers,
+                          key='task')
+
+    def _add_workflow_task_request(self, workflow_token, row_data, initiator=None, link_rows=None,
+                                   new_linked_rows=None):
+        return self._workflow_task_request(workflow_token, {
+            'row_data': json.dumps(row_data),
+            'initiator': initiator,
+            'link_rows': json.dumps(link_rows or []),
+            'new_linked_rows': json.dumps(new_linked_rows or [])
+        })
+
+    def _add_workflow_task_with_existed_row_request(self, workflow_token, row_id, initiator=None):
+        return self._workflow_task_request(workflow_token, {'row_id': row_id, 'initiator': initiator})
+
+    def _big_data_insert_rows_request(self, table_name, rows_data):
+        json_data = {
+            'table_name': table_name,
+            'rows': rows_data,
+        }
+        return ApiRequest('POST', self._dtable_db_insert_rows_url(), json=json_data, compress=True)
+
+
+class APIGatewayRequestBuilder(BaseRequestBuilder):
+    """URLs and requests of the api gateway, shared by APIGateway and AsyncAPIGateway
+    """
+
+    convert_keys = True
+
+    def _metadata_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/metadata/'
+
+    def _table_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/tables/'
+
+    def _view_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/views/'
+
+    def _row_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/rows/'
+
+    def _batch_row_server_url(self):
+        return self._row_server_url()
+
+    def _batch_update_row_server_url(self):
+        return self._row_server_url()
+
+    def _batch_delete_row_server_url(self):
+        return self._row_server_url()
+
+    def _filtered_rows_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/filtered-rows/'
+
+    def _row_link_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/links/'
+
+    def _query_links_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/query-links/'
+
+    def _batch_update_row_link_server_url(self):
+        return self._row_link_server_url()
+
+    def _column_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/columns/'
+
+    def _column_options_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/column-options/'
+
+    def _column_cascade_setting_server_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/column-cascade-settings/'
+
+    def _dtable_db_query_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/sql'
+
+    def _dtable_db_insert_rows_url(self):
+        return self.api_gateway_url + '/api/v2/dtables/' + self.dtable_uuid + '/add-archived-rows/'
+
+    def _send_toast_notification_url(self):
+        return '%(dtable_server_url)s/api/v2/dtables/%(dtable_uuid)s/ui-toasts/' % {
+            'dtable_server_url': self.api_gateway_url,
+            'dtable_uuid': self.dtable_uuid
+        }
+
+    def _append_row_request(self, table_name, row_data, apply_default=None):
+        json_data = {
+            'table_name': table_name,
+            'rows': [row_data,]
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        if apply_default is not None:
+            json_data['apply_default'] = apply_default
+        return ApiRequest('POST', self._row_server_url(), json=json_data, key='first_row')
+
+    def _insert_row_request(self, table_name, row_data, anchor_row_id, apply_default=None):
+        # the api gateway can not insert at a position, the row is appended
+        return self._append_row_request(table_name, row_data, apply_default=apply_default)
+
+    def _update_row_request(self, table_name, row_id, row_data):
+        json_data = {
+            'table_name': table_name,
+            'updates': [{
+                'row_id': row_id,
+                'row': row_data
+            }]
+        }
+        return ApiRequest('PUT', self._row_server_url(), json=json_data)
+
+    def _delete_row_request(self, table_name, row_id):
+        json_data = {
+            'table_name': table_name,
+            'row_ids' : [row_id, ]
+        }
+        if like_table_id(table_name):
+            json_data['table_id'] = table_name
+        return ApiRequest('DELETE', self._row_server_url(), json=json_data)
+
+    def _add_link_request(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    other_rows_ids_map={row_id: [other_row_id, ]})
+        return ApiRequest('POST', self._row_link_server_url(), json=json_data)
+
+    def _remove_link_request(self, link_id, table_name, other_table_name, row_id, other_row_id):
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    other_rows_ids_map={row_id: [other_row_id, ]})
+        return ApiRequest('DELETE', self._row_link_server_url(), json=json_data)
+
+    def _update_link_request(self, link_id, table_name, other_table_name, row_id, other_rows_ids):
+        if not isinstance(other_rows_ids, list):
+            raise ValueError('params other_rows_ids requires type list')
+        json_data = self._link_json(link_id, table_name, other_table_name,
+                                    row_id_list=[row_id, ], other_rows_ids_map={row_id: other_rows_ids})
+        return ApiRequest('PUT', self._row_link_server_url(), json=json_data)
+
+    def _linked_records_request(self, table_id, link_column_key, rows):
+        json_data = {
+            'table_id': table_id,
+            'link_column_key': link_column_key,
+            'rows': rows,
+        }
+        return ApiRequest('POST', self._query_links_server_url(), json=json_data)
@@ -0,0 +1,307 @@
+import asyncio
+import gzip
+import json
+import random
+import zlib
+
+# https://requests.readthedocs.io
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry, RequestHistory
+
+from .upload import MultipartBody
+from .utils import parse_response
+
+try:
+    # https://www.python-httpx.org
+    import httpx
+except ImportError:
+    httpx = None
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_SIZE = 10
+DEFAULT_ASYNC_POOL_SIZE = 100
+DEFAULT_MAX_RETRIES = 5
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+
+REQUEST_ENCODINGS = ('gzip', 'deflate')
+COMPRESS_MIN_SIZE = 16 * 1024
+COMPRESS_LEVEL = 6
+
+
+class RetryPolicy(Retry):
+    """Retry transient failures with exponential backoff and jitter
+
+    Rate limited (429) and unavailable (502, 503, 504) responses are
+    retried, waiting as long as the server's Retry-After header asks,
+    otherwise backoff_factor * 2 ** (n - 1) seconds with jitter, at most
+    MAX_BACKOFF. Idempotent methods are retried on any of these, POST
+    only on 429 and 503, which the server sends without processing the
+    request. Once the retries are used up the last response is returned
+    so parse_response reports it as usual.
+    """
+
+    MAX_BACKOFF = 30
+    RETRY_STATUS = frozenset([429, 502, 503, 504])
+    UNPROCESSED_STATUS = frozenset([429, 503])
+
+    def __init__(self, total=DEFAULT_MAX_RETRIES, backoff_factor=0.5, status_forcelist=RETRY_STATUS,
+                 raise_on_status=False, **kwargs):
+        super(RetryPolicy, self).__init__(
+            total=total,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            raise_on_status=raise_on_status,
+            **kwargs
+        )
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == 'POST' and status_code in self.UNPROCESSED_STATUS:
+            return bool(self.total)
+        return super(RetryPolicy, self).is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self):
+        errors = len([item for item in self.history if item.redirect_location is None])
+        if not errors:
+            return 0
+        backoff = min(self.MAX_BACKOFF, self.backoff_factor * (2 ** (errors - 1)))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def retry_after(self, method, url, status_code, retry_after=None):
+        """The policy for the next attempt after a response, for clients
+        that do not go through urllib3
+
+        :param retry_after: str, the Retry-After header of the response
+        :return: tuple, (RetryPolicy, seconds to wait) or None when the
+            response is not retried
+        """
+        if not self.is_retry(method, status_code, bool(retry_after)):
+            return None
+        if self.total is not None and self.total <= 0:
+            return None
+        retry = self.new(
+            total=None if self.total is None else self.total - 1,
+            history=self.history + (RequestHistory(method, url, None, status_code, None),)
+        )
+        if retry_after and self.respect_retry_after_header and status_code in self.RETRY_AFTER_STATUS_CODES:
+            return retry, retry.parse_retry_after(retry_after)
+        return retry, retry.get_backoff_time()
+
+
+def gen_retry_policy(max_retries):
+    """
+    :param max_retries: int or Retry
+    :return: Retry, None when max_retries is 0
+    """
+    if isinstance(max_retries, Retry):
+        return max_retries
+    return RetryPolicy(total=max_retries) if max_retries else None
+
+
+def gen_session(pool_size=DEFAULT_POOL_SIZE, keep_alive=True, max_retries=DEFAULT_MAX_RETRIES):
+    """ Create a requests session backed by a pooled HTTPAdapter
+
+    :param pool_size: int, max connections kept open per host
+    :param keep_alive: bool, reuse connections between requests
+    :param max_retries: int or RetryPolicy, 0 to disable retrying
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=pool_size,
+        max_retries=gen_retry_policy(max_retries) or 0,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def gen_async_session(pool_size=DEFAULT_ASYNC_POOL_SIZE, keep_alive=True, max_retries=DEFAULT_MAX_RETRIES):
+    """ Create an httpx async client with a shared connection pool
+
+    Failed connection attempts are retried by the transport, responses
+    that ask for a retry by send_request_async.
+
+    :param pool_size: int, max connections kept open in total
+    :param keep_alive: bool, reuse connections between requests
+    :param max_retries: int or RetryPolicy, connection retries, 0 to disable retrying
+    :return: httpx.AsyncClient
+    """
+    if httpx is None:
+        raise ImportError('The async client requires httpx, install it with "pip install seatable-api[async]"')
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size if keep_alive else 0,
+    )
+    if isinstance(max_retries, Retry):
+        max_retries = max_retries.total
+    transport = httpx.AsyncHTTPTransport(limits=limits, retries=max_retries or 0)
+    return httpx.AsyncClient(transport=transport)
+
+
+class ApiRequest(object):
+    """One request of the api, built once by the request builders and
+    sent by the sync or the async client
+    """
+
+    def __init__(self, method, url, params=None, json=None, data=None, headers=None, compress=False, key=None):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict, query string
+        :param json: json body
+        :param data: dict, form body, or MultipartBody
+        :param headers: dict, None for the access token headers of the client
+        :param compress: bool, compress the json body as the client's compress_requests asks
+        :param key: str, return only this key of the response data
+        """
+        self.method = method
+        self.url = url
+        self.params = params
+        self.json = json
+        self.data = data
+        self.headers = headers
+        self.compress = compress
+        self.key = key
+
+    def result(self, response):
+        data = parse_response(response)
+        if self.key is None:
+            return data
+        return data.get(self.key)
+
+
+def encode_json_body(json_data, headers, encoding=None):
+    """ Serialize a json request body, compressed with `encoding` when it
+    is at least COMPRESS_MIN_SIZE bytes
+
+    :param json_data: dict
+    :param headers: dict, request headers, not modified
+    :param encoding: str, 'gzip', 'deflate' or None to send it as is
+    :return: dict, keyword arguments for session.request
+    """
+    if not encoding:
+        return {'json': json_data, 'headers': headers}
+    if encoding not in REQUEST_ENCODINGS:
+        raise ValueError('compress_requests must be one of %s' % (', '.join(REQUEST_ENCODINGS),))
+    body = json.dumps(json_data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json'
+    if len(body) >= COMPRESS_MIN_SIZE:
+        if encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+        else:
+            body = zlib.compress(body, COMPRESS_LEVEL)
+        headers['Content-Encoding'] = encoding
+    return {'data': body, 'headers': headers}
+
+
+def request_kwargs(obj, request):
+    """ The keyword arguments of session.request for an ApiRequest of obj,
+    only the parts the request has
+
+    :param obj: SeaTableAPI, APIGateway or their async versions
+    :param request: ApiRequest
+    :return: dict
+    """
+    headers = obj.headers if request.headers is None else request.headers
+    if request.json is not None and request.compress:
+        kwargs = encode_json_body(request.json, headers, obj.compress_requests)
+    else:
+        kwargs = {'headers': headers}
+        if request.json is not None:
+            kwargs['json'] = request.json
+    if request.params is not None:
+        kwargs['params'] = request.params
+    if request.data is not None:
+        kwargs['data'] = request.data
+    return kwargs
+
+
+def _is_unsupported_encoding(response, kwargs):
+    return response.status_code == 415 and 'Content-Encoding' in kwargs['headers']
+
+
+def send_request(obj, request):
+    """ Send an ApiRequest with the session, headers and timeout of obj
+
+    A server that answers a compressed body with 415 Unsupported Media
+    Type gets it again uncompressed, and obj stops compressing.
+
+    :param obj: SeaTableAPI or APIGateway
+    :param request: ApiRequest
+    :return: requests.Response
+    """
+    send = getattr(obj.session, request.method.lower())
+    kwargs = request_kwargs(obj, request)
+    response = send(request.url, timeout=obj.timeout, **kwargs)
+    if _is_unsupported_encoding(response, kwargs):
+        obj.compress_requests = None
+        response = send(request.url, timeout=obj.timeout, **request_kwargs(obj, request))
+    return response
+
+
+def send_json(obj, method, url, json_data):
+    """ Send a json body with the session, headers and timeout of obj,
+    compressed as obj.compress_requests asks, see send_request
+
+    :param obj: SeaTableAPI or APIGateway
+    :param method: str, 'POST', 'PUT' or 'DELETE'
+    :return: requests.Response
+    """
+    return send_request(obj, ApiRequest(method, url, json=json_data, compress=True))
+
+
+async def _iter_body(body):
+    body.seek(0)
+    while True:
+        block = body.read(UPLOAD_BLOCK_SIZE)
+        if not block:
+            break
+        yield block
+
+
+def _async_request_kwargs(obj, request):
+    kwargs = request_kwargs(obj, request)
+    data = kwargs.pop('data', None)
+    if isinstance(data, MultipartBody):
+        # streamed from the start on every attempt
+        kwargs['content'] = _iter_body(data)
+        kwargs['headers'] = dict(kwargs['headers'], **{'Content-Length': str(len(data))})
+    elif isinstance(data, bytes):
+        kwargs['content'] = data
+    elif data is not None:
+        kwargs['data'] = data
+    return kwargs
+
+
+async def send_request_async(obj, request):
+    """ Send an ApiRequest with the httpx session, headers and timeout of obj
+
+    Rate limited and unavailable responses are retried as RetryPolicy
+    retries them for the sync client, obj.max_retries being the policy,
+    and a 415 answer to a compressed body as send_request does.
+
+    :param obj: AsyncSeaTableAPI or AsyncAPIGateway
+    :param request: ApiRequest
+    :return: httpx.Response
+    """
+    retry = obj.max_retries
+    while True:
+        kwargs = _async_request_kwargs(obj, request)
+        response = await obj.session.request(request.method, request.url, timeout=obj.timeout, **kwargs)
+        if _is_unsupported_encoding(response, kwargs):
+            obj.compress_requests = None
+            continue
+        next_retry = retry.retry_after(request.method, request.url, response.status_code,
+                                       response.headers.get('Retry-After')) if retry else None
+        if next_retry is None:
+            return response
+        retry, wait = next_retry
+        await response.aclose()
+        await asyncio.sleep(wait)
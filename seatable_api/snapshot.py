@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .columnar import convert_rows_columns
+from .constants import LIST_ROWS_LIMIT, ColumnTypes
+from .utils import iter_pages
+
+try:
+    # https://arrow.apache.org/docs/python
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+SNAPSHOT_FORMATS = ('jsonl', 'parquet')
+SNAPSHOT_PAGE_SIZE = LIST_ROWS_LIMIT
+MANIFEST_NAME = 'manifest.json'
+METADATA_NAME = 'metadata.json'
+
+# parquet keeps the arrow types convert_rows_columns gives these columns,
+# every other cell is stored as text, json encoded unless it is a string
+TYPED_COLUMN_TYPES = (
+    ColumnTypes.NUMBER.value,
+    ColumnTypes.CHECKBOX.value,
+    ColumnTypes.DATE.value,
+    ColumnTypes.CTIME.value,
+    ColumnTypes.MTIME.value,
+    ColumnTypes.SINGLE_SELECT.value,
+)
+SYSTEM_FIELDS = ('_id', '_ctime', '_mtime')
+
+
+def _write_json(file_path, data):
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, file_path)
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _arrow_page(columns, rows):
+    """One page as a RecordBatch whose schema only depends on the columns,
+    so the parts of a table read back as one dataset
+    """
+    batch = convert_rows_columns(columns, rows, 'arrow')
+    names, arrays = [], []
+    for name in SYSTEM_FIELDS:
+        names.append(name)
+        arrays.append(pyarrow.array([row.get(name) for row in rows], type=pyarrow.string()))
+    for column in columns:
+        name = column['name']
+        array = batch.column(batch.schema.get_field_index(name))
+        if column['type'] not in TYPED_COLUMN_TYPES or pyarrow.types.is_null(array.type) or \
+                (column['type'] == ColumnTypes.SINGLE_SELECT.value and not pyarrow.types.is_dictionary(array.type)):
+            array = pyarrow.array([_to_text(row.get(name)) for row in rows], type=pyarrow.string())
+        names.append(name)
+        arrays.append(array)
+    return pyarrow.RecordBatch.from_arrays(arrays, names=names)
+
+
+class SnapshotExport(object):
+    """Export the rows of a base, table by table, into a folder
+
+    Every table is paged through in its own worker and written page by
+    page, to <table id>.jsonl, or to <table id>/part-<page>.parquet, one
+    file per page. manifest.json records the pages written so far, after
+    each page, so running the export again into the same folder resumes
+    every table after its last complete page. Rows are paged by offset, a
+    resumed table only lines up if it was not modified in between.
+    """
+
+    def __init__(self, base, path, tables=None, workers=4, format='jsonl', page_size=SNAPSHOT_PAGE_SIZE):
+        if format not in SNAPSHOT_FORMATS:
+            raise ValueError('format must be one of %s' % (', '.join(SNAPSHOT_FORMATS),))
+        if format == 'parquet' and pyarrow is None:
+            raise ImportError('format "parquet" requires pyarrow, install it with "pip install seatable-api[arrow]"')
+        if not 0 < page_size <= LIST_ROWS_LIMIT:
+            raise ValueError('page_size must be between 1 and %d' % LIST_ROWS_LIMIT)
+        self.base = base
+        self.path = path
+        self.tables = tables
+        self.workers = workers
+        self.format = format
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.manifest = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {
+                'dtable_uuid': self.base.dtable_uuid,
+                'format': self.format,
+                'page_size': self.page_size,
+                'tables': {},
+            }
+        with open(self.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if (manifest.get('dtable_uuid'), manifest.get('format'), manifest.get('page_size')) != \
+                (self.base.dtable_uuid, self.format, self.page_size):
+            raise ValueError('%s holds a snapshot of another base, format or page size' % self.path)
+        return manifest
+
+    def _save_manifest(self):
+        # callers hold self.lock
+        _write_json(self.manifest_path, self.manifest)
+
+    def _update_table(self, table_id, **kwargs):
+        with self.lock:
+            self.manifest['tables'][table_id].update(kwargs)
+            self._save_manifest()
+
+    def _select_tables(self, metadata):
+        tables = metadata.get('tables') or []
+        if self.tables is None:
+            return tables
+        selected = []
+        for name in self.tables:
+            table = next((t for t in tables if name in (t['name'], t['_id'])), None)
+            if table is None:
+                raise ValueError('table %s does not exist' % name)
+            selected.append(table)
+        return selected
+
+    def _iter_new_pages(self, table_name, start):
+        def fetch_page(offset, limit):
+            return self.base.list_rows(table_name, start=start + offset, limit=limit)
+        return iter_pages(fetch_page, self.page_size)
+
+    def _export_jsonl(self, table, entry):
+        file_path = os.path.join(self.path, entry['file'])
+        with open(file_path, 'ab') as f:
+            # drop rows of a page that was cut off by the previous run
+            f.truncate(entry['bytes'])
+            for rows in self._iter_new_pages(table['name'], entry['pages'] * self.page_size):
+                f.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                self._update_table(table['_id'], pages=entry['pages'] + 1, rows=entry['rows'] + len(rows),
+                                   bytes=f.tell())
+
+    def _export_parquet(self, table, entry):
+        dir_path = os.path.join(self.path, entry['file'])
+        os.makedirs(dir_path, exist_ok=True)
+        # drop parts written after the last checkpoint of the previous run
+        for file_name in os.listdir(dir_path):
+            if file_name.startswith('part-') and \
+                    (file_name.endswith('.tmp') or file_name[5:11] >= '%06d' % entry['pages']):
+                os.remove(os.path.join(dir_path, file_name))
+        columns = table.get('columns') or []
+        for rows in self._iter_new_pages(table['name'], entry['pages'] * self.page_size):
+            part_path = os.path.join(dir_path, 'part-%06d.parquet' % entry['pages'])
+            batch = _arrow_page(columns, rows)
+            pyarrow.parquet.write_table(pyarrow.Table.from_batches([batch]), part_path + '.tmp')
+            os.replace(part_path + '.tmp', part_path)
+            self._update_table(table['_id'], pages=entry['pages'] + 1, rows=entry['rows'] + len(rows))
+
+    def _export_table(self, table):
+        entry = self.manifest['tables'][table['_id']]
+        try:
+            if self.format == 'jsonl':
+                self._export_jsonl(table, entry)
+            else:
+                self._export_parquet(table, entry)
+        except Exception as e:
+            self._update_table(table['_id'], error=str(e))
+        else:
+            self._update_table(table['_id'], done=True)
+
+    def run(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = self._load_manifest()
+        metadata = self.base.get_metadata()
+        _write_json(os.path.join(self.path, METADATA_NAME), metadata)
+
+        pending = []
+        with self.lock:
+            for table in self._select_tables(metadata):
+                entry = self.manifest['tables'].setdefault(table['_id'], {
+                    'name': table['name'],
+                    'file': table['_id'] + ('.jsonl' if self.format == 'jsonl' else ''),
+                    'pages': 0,
+                    'rows': 0,
+                    'bytes': 0,
+                    'done': False,
+                })
+                entry['name'] = table['name']
+                entry.pop('error', None)
+                if not entry['done']:
+                    pending.append(table)
+            self._save_manifest()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            list(executor.map(self._export_table, pending))
+        return self.manifest
+
+
+def export_snapshot(base, path, tables=None, workers=4, format='jsonl', page_size=SNAPSHOT_PAGE_SIZE):
+    """Export the rows of every table of a base into the folder path, see SnapshotExport
+
+    :param base: SeaTableAPI, authorized
+    :param path: str, folder of the snapshot, created if needed
+    :param tables: list of table names or ids, None for all tables
+    :param workers: int, tables exported at the same time
+    :param format: str, 'jsonl' or 'parquet'
+    :param page_size: int, rows per request and per manifest checkpoint
+    :return: dict, the manifest, tables that failed carry an 'error'
+    """
+    return SnapshotExport(base, path, tables, workers, format, page_size).run()
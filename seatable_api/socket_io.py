@@ -37,7 +37,7 @@ class SocketIO(object):
         self.sio.on('disconnect', self._on_disconnect)
         self.sio.on('io-disconnect', self._on_io_disconnect)
         self.sio.on('connect_error', self._on_connect_error)
-        self.sio.on(UPDATE_DTABLE, self.on_update_dtable)
+        self.sio.on(UPDATE_DTABLE, self._on_update_dtable)
         self.sio.on(NEW_NOTIFICATION, self.on_new_notification)
 
         self.sio.connect(self._dtable_ws_url())
@@ -67,6 +67,12 @@ class SocketIO(object):
     def _on_connect_error(self, error_msg):
         print(datetime.now(), '[ SeaTable SocketIO connection error ]', error_msg)
 
+    def _on_update_dtable(self, *args):
+        metadata_cache = self.base.metadata_cache
+        if metadata_cache is not None and metadata_cache.invalidate_on_update:
+            metadata_cache.invalidate()
+        return self.on_update_dtable(*args)
+
     def on_update_dtable(self, data, index, *args):
         """ Default is print received data
             You can overwrite this event
@@ -82,6 +88,10 @@ class SocketIO(object):
         print(data)
 
     def on(self, event, handler):
+        if event == UPDATE_DTABLE:
+            # keep the metadata cache invalidation in front of the handler
+            self.on_update_dtable = handler
+            return
         self.sio.on(event, handler)
 
     def wait(self):
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+def _normalize(value):
+    # the shapes a value takes in the source and in seatable, made equal
+    if value == '' or value == []:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def row_fingerprint(row, columns):
+    """
+    :param row: dict
+    :param columns: list of column names compared
+    :return: str
+    """
+    values = [_normalize(row.get(column)) for column in columns]
+    data = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+
+class SyncState(object):
+    """What sync_rows knows about a table between runs, kept in a json file
+
+    rows maps each key to [row id, fingerprint of the synced columns] as
+    of the watermark, the largest _mtime seen so far. A state made for
+    another table, key or columns is discarded, which rebuilds the index.
+    """
+
+    def __init__(self, table_name, key, columns):
+        self.table_name = table_name
+        self.key = key
+        self.columns = list(columns)
+        self.watermark = None
+        self.rows = {}
+        self.keys_by_id = {}
+
+    @classmethod
+    def load(cls, path, table_name, key, columns):
+        state = cls(table_name, key, columns)
+        if not os.path.exists(path):
+            return state
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if (data.get('table_name'), data.get('key'), data.get('columns')) != (table_name, key, state.columns):
+            return state
+        state.watermark = data.get('watermark')
+        state.rows = {row_key: entry for row_key, entry in data.get('rows') or []}
+        state.keys_by_id = {entry[0]: row_key for row_key, entry in state.rows.items()}
+        return state
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'table_name': self.table_name,
+                'key': self.key,
+                'columns': self.columns,
+                'watermark': self.watermark,
+                # a list, keys need not be strings
+                'rows': list(self.rows.items()),
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def set_row(self, row_key, row_id, fingerprint):
+        old_key = self.keys_by_id.get(row_id)
+        if old_key is not None and old_key != row_key:
+            # the key of the row was changed in seatable
+            self.rows.pop(old_key, None)
+        self.rows[row_key] = [row_id, fingerprint]
+        self.keys_by_id[row_id] = row_key
+
+    def remove_row(self, row_key):
+        entry = self.rows.pop(row_key, None)
+        if entry:
+            self.keys_by_id.pop(entry[0], None)
+
+
+def _quote(name):
+    return '`%s`' % name
+
+
+def fetch_changes(base, state):
+    """Read the rows modified since the watermark into the state
+
+    :return: int, rows read
+    """
+    names = ['_id', '_mtime', state.key] + state.columns
+    sql = 'SELECT %s FROM %s' % (', '.join(_quote(name) for name in names), _quote(state.table_name))
+    if state.watermark:
+        # >= so rows saved within the same instant as the watermark are not lost
+        sql += " WHERE `_mtime` >= '%s'" % state.watermark.replace("'", "''")
+    # _id breaks the ties of rows saved by one batch, iter_query pages could skip or repeat them
+    sql += ' ORDER BY `_mtime`, `_id`'
+    count = 0
+    for row in base.iter_query(sql):
+        count += 1
+        row_key = row.get(state.key)
+        if row_key is not None:
+            state.set_row(row_key, row['_id'], row_fingerprint(row, state.columns))
+        elif row['_id'] in state.keys_by_id:
+            state.remove_row(state.keys_by_id[row['_id']])
+        mtime = row.get('_mtime')
+        if mtime and (state.watermark is None or mtime > state.watermark):
+            state.watermark = mtime
+    return count
+
+
+def _chunk_counts(result, report):
+    succeeded = 0
+    for chunk in result.get('chunks') or []:
+        if chunk['success']:
+            succeeded += chunk['count']
+        else:
+            report['errors'].append(chunk['error'])
+    return succeeded
+
+
+def sync_rows(base, table_name, source_rows, key, state_path, columns=None, delete_missing=False, full=False):
+    """Bring a table in line with source_rows, matching rows by the key column
+
+    Only rows modified in the table since the previous run are read, with
+    a `_mtime >=` watermark query, and only the differences are written,
+    through the chunked batch append, update and delete methods. Rows
+    deleted in seatable by others are not noticed until a run with full.
+
+    :param base: SeaTableAPI, authorized
+    :param table_name: str
+    :param source_rows: iterable of dict, the wanted rows, column name -> value
+    :param key: str, name of the column that identifies a row
+    :param state_path: str, json file keeping the watermark and row index between runs
+    :param columns: list of column names to sync, defaults to the keys of source_rows
+    :param delete_missing: bool, delete rows whose key is not in source_rows
+    :param full: bool, read the whole table again instead of the changes only
+    :return: dict, counts of rows fetched, appended, updated and deleted, errors of failed chunks
+    """
+    source = OrderedDict()
+    source_columns = OrderedDict()
+    for row in source_rows:
+        if row.get(key) is None:
+            raise ValueError('source row without key %s: %s' % (key, row))
+        source[row[key]] = row
+        if columns is None:
+            for name in row:
+                source_columns.setdefault(name, None)
+    if columns is None:
+        columns = [name for name in source_columns if name != key]
+
+    state = SyncState(table_name, key, columns) if full else SyncState.load(state_path, table_name, key, columns)
+    report = {'fetched': 0, 'appended': 0, 'updated': 0, 'deleted': 0, 'errors': []}
+    try:
+        report['fetched'] = fetch_changes(base, state)
+
+        appends, updates = [], []
+        for row_key, row in source.items():
+            values = {name: row.get(name) for name in columns}
+            entry = state.rows.get(row_key)
+            if entry is None:
+                values[key] = row_key
+                appends.append(values)
+            elif entry[1] != row_fingerprint(values, columns):
+                updates.append({'row_id': entry[0], 'row': values})
+        delete_keys = [row_key for row_key in state.rows if row_key not in source] if delete_missing else []
+
+        # appended and updated rows come back with the next run's changes,
+        # deleted ones never do, so they leave the index here
+        if appends:
+            report['appended'] = _chunk_counts(base.batch_append_rows(table_name, appends), report)
+        if updates:
+            report['updated'] = _chunk_counts(base.batch_update_rows(table_name, updates), report)
+        if delete_keys:
+            result = base.batch_delete_rows(table_name, [state.rows[row_key][0] for row_key in delete_keys])
+            report['deleted'] = _chunk_counts(result, report)
+            for chunk in result.get('chunks') or []:
+                if chunk['success']:
+                    for row_key in delete_keys[chunk['offset']:chunk['offset'] + chunk['count']]:
+                        state.remove_row(row_key)
+    finally:
+        state.save(state_path)
+    report['watermark'] = state.watermark
+    return report
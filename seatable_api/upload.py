@@ -0,0 +1,118 @@
+import io
+import os
+import threading
+import uuid
+
+
+def _quote_param(value):
+    # html5 style, as browsers and urllib3 send file names
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+def _stream_size(stream):
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size - position
+
+
+class MultipartBody(object):
+    """A multipart/form-data body with one file, read piece by piece
+
+    requests sends it with a Content-Length and reads it in blocks, so
+    the file is never held in memory. seek(0) rewinds it for a retry.
+    """
+
+    def __init__(self, fields, file_field, file_name, stream):
+        """
+        :param fields: dict, form fields sent before the file
+        :param file_field: str
+        :param file_name: str
+        :param stream: binary file object, read from its current position
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % boundary
+        head = ''.join(
+            '--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n' % (boundary, key, value)
+            for key, value in fields.items()
+        )
+        head += '--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n' \
+                'Content-Type: application/octet-stream\r\n\r\n' % (boundary, file_field, _quote_param(file_name))
+        tail = '\r\n--%s--\r\n' % boundary
+        self.parts = [
+            (io.BytesIO(head.encode('utf-8')), 0),
+            (stream, stream.tell()),
+            (io.BytesIO(tail.encode('utf-8')), 0),
+        ]
+        self.length = sum(_stream_size(part) for part, _ in self.parts)
+        self.index = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if offset != 0 or whence != os.SEEK_SET:
+            raise io.UnsupportedOperation('MultipartBody can only be rewound to the start')
+        for part, start in self.parts:
+            part.seek(start)
+        self.index = 0
+        self.position = 0
+        return 0
+
+    def read(self, size=-1):
+        chunks = []
+        while self.index < len(self.parts) and size != 0:
+            chunk = self.parts[self.index][0].read(size)
+            if not chunk:
+                self.index += 1
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        data = b''.join(chunks)
+        self.position += len(data)
+        return data
+
+
+class UploadLink(object):
+    """An upload link shared by the uploads of a batch
+
+    It is fetched on first use, and fetched again, once for all threads,
+    when the file server rejects it with 403.
+    """
+
+    def __init__(self, fetch):
+        """
+        :param fetch: callable returning a new upload link dict
+        """
+        self.fetch = fetch
+        self.lock = threading.Lock()
+        self.data = None
+
+    def get(self):
+        with self.lock:
+            if self.data is None:
+                self.data = self.fetch()
+            return self.data
+
+    def refresh(self, stale_data):
+        with self.lock:
+            if self.data is stale_data:
+                self.data = self.fetch()
+            return self.data
+
+    def send(self, upload):
+        """
+        :param upload: callable(upload link dict), opening its file anew on every call
+        """
+        data = self.get()
+        try:
+            return upload(data)
+        except ConnectionError as e:
+            if e.args[:1] != (403,):
+                raise
+        return upload(self.refresh(data))
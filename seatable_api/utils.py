@@ -1,8 +1,19 @@
+import asyncio
+import hashlib
 import json
 import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from seatable_api.exception import AuthExpiredError
+from seatable_api.exception import AuthExpiredError, InvalidResponseError
+
+try:
+    # https://github.com/ijl/orjson
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 
 def _get_row(data):
@@ -116,6 +127,108 @@ def is_single_multiple_structure(column):
             return True, options
     return False, []
 
+ISO_DATE_REG = re.compile(r'\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?)?$')
+
+CONVERTERS_CACHE_SIZE = 64
+_converters_cache = OrderedDict()
+_converters_cache_lock = threading.Lock()
+
+
+def _format_date(value, date_only):
+    # same result as datetime.fromisoformat(value).strftime(...) for the usual iso strings
+    if ISO_DATE_REG.match(value):
+        if date_only:
+            return value[:10]
+        if len(value) == 10:
+            return value + ' 00:00:00'
+        if len(value) >= 19 and value[16] == ':':
+            return value[:10] + ' ' + value[11:19]
+        return value[:10] + ' ' + value[11:16] + ':00'
+    date_value = datetime.fromisoformat(value)
+    return date_value.strftime('%Y-%m-%d' if date_only else '%Y-%m-%d %H:%M:%S')
+
+
+def _gen_converter(column, select_map):
+    """The function converting a dtable-db cell value of column, None if kept as is
+    """
+    column_type = column['type']
+    s_map = select_map.get(column['key'])
+    if column_type == 'single-select' and s_map:
+        return lambda value: s_map.get(value, value) if value else value
+    elif column_type == 'multiple-select' and s_map:
+        return lambda value: [s_map.get(s, s) for s in value] if value else value
+    elif column_type == 'link' and s_map:
+        def convert_link(value):
+            if not value:
+                return value
+            for s in value:
+                old_display_value = s.get('display_value')
+                if isinstance(old_display_value, list):
+                    s['display_value'] = old_display_value and [s_map.get(v, v) for v in old_display_value] or []
+                else:
+                    s['display_value'] = s_map.get(old_display_value, old_display_value)
+            return value
+        return convert_link
+    elif column_type == 'link-formula' and s_map:
+        def convert_link_formula(value):
+            if not value:
+                return value
+            if isinstance(value[0], list):
+                return [[s_map.get(v, v) for v in s] for s in value]
+            return [s_map.get(s, s) for s in value]
+        return convert_link_formula
+    elif column_type == 'date':
+        date_format = (column.get('data') or {}).get('format')
+
+        def convert_date(value):
+            if not value:
+                return None
+            if not date_format:
+                return value
+            try:
+                return _format_date(value, date_format == 'YYYY-MM-DD')
+            except Exception as e:
+                print('[Warning] format date:', e)
+                return value
+        return convert_date
+    return None
+
+
+def compile_column_converters(metadata):
+    """Map each column key of dtable-db metadata to (column name, converter or None)
+
+    :param metadata: list
+    :return: dict
+    """
+    select_map = {}
+    for column in metadata:
+        is_sm_structure, column_options = is_single_multiple_structure(column)
+        if is_sm_structure:
+            column_data = column['data']
+            if not column_data:
+                continue
+            select_map[column['key']] = {select['id']: select['name'] for select in column_options}
+
+    return {column['key']: (column['name'], _gen_converter(column, select_map)) for column in metadata}
+
+
+def get_column_converters(metadata):
+    """compile_column_converters, cached by a hash of the metadata so repeated queries reuse it
+    """
+    key = hashlib.sha1(json.dumps(metadata, sort_keys=True).encode('utf-8')).hexdigest()
+    with _converters_cache_lock:
+        converters = _converters_cache.get(key)
+        if converters is not None:
+            _converters_cache.move_to_end(key)
+            return converters
+    converters = compile_column_converters(metadata)
+    with _converters_cache_lock:
+        _converters_cache[key] = converters
+        while len(_converters_cache) > CONVERTERS_CACHE_SIZE:
+            _converters_cache.popitem(last=False)
+    return converters
+
+
 def convert_db_rows(metadata, results):
     """ Convert dtable-db rows data to readable rows data
 
@@ -125,65 +238,17 @@ def convert_db_rows(metadata, results):
     """
     if not results:
         return []
+    converters = get_column_converters(metadata)
     converted_results = []
-    column_map = {column['key']: column for column in metadata}
-    select_map = {}
-    for column in metadata:
-            is_sm_structure, column_options = is_single_multiple_structure(column)
-            if is_sm_structure:
-                column_data = column['data']
-                if not column_data:
-                    continue
-                column_key = column['key']
-                select_map[column_key] = {
-                    select['id']: select['name'] for select in column_options}
-
     for result in results:
         item = {}
         for column_key, value in result.items():
-            if column_key in column_map:
-                column = column_map[column_key]
-                column_name = column['name']
-                column_type = column['type']
-                s_map = select_map.get(column_key)
-                if column_type == 'single-select' and value and s_map:
-                    item[column_name] = s_map.get(value, value)
-                elif column_type == 'multiple-select' and value and s_map:
-                    item[column_name] = [s_map.get(s, s) for s in value]
-                elif column_type == 'link' and value and s_map:
-                    new_data = []
-                    for s in value:
-                        old_display_value = s.get('display_value')
-                        if isinstance(old_display_value, list):
-                            s['display_value'] = old_display_value and [s_map.get(v, v) for v in old_display_value] or []
-                        else:
-                            s['display_value'] = s_map.get(old_display_value, old_display_value)
-                        new_data.append(s)
-                    item[column_name] = new_data
-                elif column_type == 'link-formula' and value and s_map:
-                    if isinstance(value[0], list):
-                        item[column_name] = [[s_map.get(v, v) for v in s] for s in value]
-                    else:
-                        item[column_name] = [s_map.get(s, s) for s in value]
-
-                elif column_type == 'date':
-                    try:
-                        if value:
-                            date_value = datetime.fromisoformat(value)
-                            date_format = column['data']['format']
-                            if date_format == 'YYYY-MM-DD':
-                                value = date_value.strftime('%Y-%m-%d')
-                            else:
-                                value = date_value.strftime('%Y-%m-%d %H:%M:%S')
-                        else:
-                            value = None
-                    except Exception as e:
-                        print('[Warning] format date:', e)
-                    item[column_name] = value
-                else:
-                    item[column_name] = value
-            else:
+            converter = converters.get(column_key)
+            if converter is None:
                 item[column_key] = value
+                continue
+            column_name, convert = converter
+            item[column_name] = convert(value) if convert else value
         converted_results.append(item)
 
     return converted_results
@@ -201,23 +266,290 @@ def parse_server_url(server_url):
 
 
 def parse_response(response):
+    """Decode the json body of a response
+
+    The body is parsed straight from bytes, with orjson when it is installed.
+    An empty body gives None, a malformed one raises InvalidResponseError.
+    """
     if response.status_code >= 400:
         try:
-            err_data = json.loads(response.text)
-        except:
+            err_data = json_loads(response.content)
+        except ValueError:
             err_data = {}
-        if err_data.get("error_msg") == "Token expired." and \
+        if isinstance(err_data, dict) and err_data.get("error_msg") == "Token expired." and \
                 response.status_code == 403:
             raise AuthExpiredError
 
         raise ConnectionError(response.status_code, response.text)
     else:
+        content = response.content
+        if not content or not content.strip():
+            return None
         try:
-            data = json.loads(response.text)
-            return data
-        except:
-            pass
+            return json_loads(content)
+        except ValueError as e:
+            raise InvalidResponseError(response.status_code, content[:200], e)
 
 
 def like_table_id(value):
     return re.match(r'^[-0-9a-zA-Z]{4}$', value)
+
+
+SQL_LIMIT_REG = re.compile(
+    r'\s+limit\s+(\d+)(?:\s*,\s*(\d+)|\s+offset\s+(\d+))?\s*;?\s*$', re.IGNORECASE)
+
+
+def split_sql_limit(sql):
+    """ Split the trailing LIMIT / OFFSET clause off a sql statement
+
+    Supports "LIMIT n", "LIMIT n OFFSET m" and "LIMIT m, n".
+
+    :param sql: str
+    :return: tuple, (sql without limit clause, offset, limit or None)
+    """
+    match = SQL_LIMIT_REG.search(sql)
+    if not match:
+        return sql.strip().rstrip(';').rstrip(), 0, None
+    first, second, offset = match.groups()
+    if second is not None:  # LIMIT m, n
+        offset, limit = int(first), int(second)
+    else:
+        offset, limit = int(offset or 0), int(first)
+    return sql[:match.start()].rstrip(), offset, limit
+
+
+SQL_ORDER_REG = re.compile(r'\b(?:order|group)\s+by\b|\bdistinct\b', re.IGNORECASE)
+
+
+def add_sql_order(sql):
+    """ Order a sql statement without LIMIT clause by _id, unless it is
+    ordered, grouped or distinct already
+
+    :param sql: str
+    :return: str
+    """
+    if SQL_ORDER_REG.search(sql):
+        return sql
+    return '%s ORDER BY _id' % sql
+
+
+def iter_pages(fetch_page, page_size, prefetch=1, total=None):
+    """ Walk a paginated endpoint and yield one page at a time
+
+    The next `prefetch` pages are requested in background threads while
+    the caller processes the current one, so at most prefetch + 1 pages
+    are in memory. A page is only requested once the page `prefetch`
+    before it came back full, so with prefetch 1 no request goes past
+    the end, with more up to prefetch - 1 may. Iteration stops at the
+    first short page, so page_size must not exceed what the endpoint
+    returns per request.
+
+    :param fetch_page: callable(offset, limit) -> list
+    :param page_size: int
+    :param prefetch: int, pages requested ahead, 0 to fetch sequentially
+    :param total: int, max number of items to fetch, None for all
+    :return: generator of list
+    """
+    if page_size <= 0:
+        raise ValueError('page_size must be a positive integer.')
+
+    def page_limits():
+        offset = 0
+        while total is None or offset < total:
+            limit = page_size if total is None else min(page_size, total - offset)
+            yield offset, limit
+            offset += limit
+
+    limits = page_limits()
+    if prefetch <= 0:
+        for offset, limit in limits:
+            page = fetch_page(offset, limit) or []
+            if page:
+                yield page
+            if len(page) < limit:
+                return
+        return
+
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    futures = deque()
+    try:
+        for offset, limit in limits:
+            futures.append((executor.submit(fetch_page, offset, limit), limit))
+            if len(futures) >= prefetch:
+                break
+        while futures:
+            future, limit = futures.popleft()
+            page = future.result() or []
+            if len(page) < limit:
+                if page:
+                    yield page
+                return
+            next_limits = next(limits, None)
+            if next_limits:
+                offset, next_limit = next_limits
+                futures.append((executor.submit(fetch_page, offset, next_limit), next_limit))
+            yield page
+    finally:
+        for future, _ in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def chunk_items(items, chunk_size):
+    """ Split any iterable into lists of at most chunk_size items
+
+    :param items: iterable
+    :param chunk_size: int
+    :return: generator of list
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be a positive integer.')
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def merge_batch_results(results):
+    """ Merge the responses of several batch requests into one dict
+
+    Counters are summed, lists concatenated, flags and-ed, other values
+    keep the first response's value.
+
+    :param results: list of dict
+    :return: dict
+    """
+    merged = {}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        for key, value in result.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, bool):
+                merged[key] = merged[key] and value
+            elif isinstance(value, (int, float)):
+                merged[key] += value
+            elif isinstance(value, list):
+                merged[key].extend(value)
+    return merged
+
+
+def chunk_arguments(signature, bound, items_arg, items_map_arg, chunk):
+    """ The arguments of a batch method call for one chunk of its items
+
+    :param signature: inspect.Signature of the method
+    :param bound: inspect.BoundArguments of the whole call
+    :param items_arg: str, name of the items argument
+    :param items_map_arg: str, name of a dict keyed by the items, or None
+    :param chunk: list
+    :return: tuple, (args, kwargs)
+    """
+    chunk_bound = signature.bind(*bound.args, **bound.kwargs)
+    chunk_bound.arguments[items_arg] = chunk
+    if items_map_arg:
+        items_map = bound.arguments[items_map_arg]
+        chunk_bound.arguments[items_map_arg] = {item: items_map[item] for item in chunk if item in items_map}
+    return chunk_bound.args, chunk_bound.kwargs
+
+
+class _ChunkResults(object):
+
+    def __init__(self):
+        self.reports = []
+        self.results = []
+        self.errors = []
+
+    def add(self, offset, chunk, result=None, error=None):
+        report = {'offset': offset, 'count': len(chunk), 'success': error is None}
+        if error is None:
+            self.results.append(result)
+        else:
+            report['error'] = str(error)
+            self.errors.append(error)
+        self.reports.append(report)
+
+    def merged(self):
+        if self.errors and len(self.errors) == len(self.reports):
+            raise self.errors[0]
+        merged = merge_batch_results(self.results)
+        merged['chunks'] = self.reports
+        return merged
+
+
+def send_in_chunks(items, send_chunk, chunk_size, workers=1):
+    """ Send items in chunks through send_chunk, at most `workers` at a time
+
+    A failed chunk does not stop the others, every chunk is reported in
+    the returned dict under 'chunks' as
+    {'offset': int, 'count': int, 'success': bool[, 'error': str]}.
+    If every chunk failed the first error is raised.
+
+    :param items: iterable
+    :param send_chunk: callable(list) -> dict
+    :param chunk_size: int
+    :param workers: int
+    :return: dict, the merged chunk responses plus 'chunks'
+    """
+    results = _ChunkResults()
+
+    def collect(offset, chunk, future=None):
+        try:
+            result = future.result() if future else send_chunk(chunk)
+        except Exception as e:
+            results.add(offset, chunk, error=e)
+        else:
+            results.add(offset, chunk, result)
+
+    offset = 0
+    if workers <= 1:
+        for chunk in chunk_items(items, chunk_size):
+            collect(offset, chunk)
+            offset += len(chunk)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+            for chunk in chunk_items(items, chunk_size):
+                futures.append((offset, chunk, executor.submit(send_chunk, chunk)))
+                offset += len(chunk)
+                if len(futures) >= workers:
+                    collect(*futures.popleft())
+            while futures:
+                collect(*futures.popleft())
+    return results.merged()
+
+
+async def send_in_chunks_async(items, send_chunk, chunk_size, workers=1):
+    """ send_in_chunks for a coroutine function send_chunk, at most
+    `workers` chunks are in flight at a time
+
+    :return: dict, the merged chunk responses plus 'chunks'
+    """
+    results = _ChunkResults()
+    pending = deque()
+
+    async def collect(offset, chunk, task):
+        try:
+            result = await task
+        except Exception as e:
+            results.add(offset, chunk, error=e)
+        else:
+            results.add(offset, chunk, result)
+
+    offset = 0
+    try:
+        for chunk in chunk_items(items, chunk_size):
+            pending.append((offset, chunk, asyncio.ensure_future(send_chunk(chunk))))
+            offset += len(chunk)
+            if len(pending) >= max(1, workers):
+                await collect(*pending.popleft())
+        while pending:
+            await collect(*pending.popleft())
+    finally:
+        for _, _, task in pending:
+            task.cancel()
+    return results.merged()
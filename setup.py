@@ -19,5 +19,11 @@ setup(
     platforms='any',
     packages=find_packages(),  # folder with __init__.py
     install_requires=['requests', 'python-socketio>5', 'ply', 'python_dateutil'],
+    extras_require={
+        'async': ['httpx'],
+        'numpy': ['numpy'],
+        'arrow': ['pyarrow'],
+        'orjson': ['orjson'],
+    },
     classifiers=['Programming Language :: Python'],
 )
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../demo'))
+from seatable_api.async_main import AsyncSeaTableAPI
+from seatable_api.session import RetryPolicy
+from stub_server import DTABLE_UUID, StubServer, gen_file_bytes
+
+
+def run_with_base(server, coroutine_function, **kwargs):
+    async def main():
+        async with AsyncSeaTableAPI('token', server.url, **kwargs) as base:
+            await base.auth()
+            return await coroutine_function(base)
+    return asyncio.run(main())
+
+
+def test_auth_and_list_rows():
+    async def list_rows(base):
+        return base, await base.list_rows('Table1', limit=10), await base.list_rows('Table1', limit=3, format='columns')
+
+    with StubServer(total_rows=50) as server:
+        base, rows, columns = run_with_base(server, list_rows)
+
+    assert base.is_authed
+    assert base.jwt_token == 'stub-jwt-token-0'
+    assert base.dtable_uuid == DTABLE_UUID
+    assert [row['_id'] for row in rows] == ['row%06d' % i for i in range(10)]
+    assert columns['Number'] == [0, 1, 2]
+    assert AsyncSeaTableAPI.list_rows.__name__ == 'list_rows'
+
+
+def test_api_gateway_shares_the_token():
+    async def list_rows(base):
+        server.expire_tokens()
+        return base, await base.list_rows('Table1', limit=2)
+
+    with StubServer() as server:
+        server.httpd.use_api_gateway = True
+        base, rows = run_with_base(server, list_rows)
+
+    assert len(rows) == 2
+    assert base.api_gateway.headers is base.headers
+    assert base.api_gateway.headers['Authorization'] == 'Token stub-jwt-token-1'
+
+
+def test_batch_rows_sent_in_chunks():
+    async def batch(base):
+        appended = await base.batch_append_rows('Table1', ({'Name': str(i)} for i in range(250)),
+                                                chunk_size=100, workers=2)
+        deleted = await base.batch_delete_rows('Table1', ['row%06d' % i for i in range(30)], chunk_size=20)
+        return appended, deleted
+
+    with StubServer() as server:
+        appended, deleted = run_with_base(server, batch)
+        assert server.stats['items_received'] == 250
+
+    assert appended['success'] is True
+    assert appended['chunks'] == [
+        {'offset': 0, 'count': 100, 'success': True},
+        {'offset': 100, 'count': 100, 'success': True},
+        {'offset': 200, 'count': 50, 'success': True},
+    ]
+    assert [chunk['count'] for chunk in deleted['chunks']] == [20, 10]
+
+
+def test_refresh_once_for_all_clones():
+    async def list_after_expiry(base):
+        clones = [base._clone() for _ in range(8)]
+        server.expire_tokens()
+        server.reset_stats()
+        pages = await asyncio.gather(*(clone.list_rows('Table1', limit=1) for clone in clones))
+        return base, pages
+
+    with StubServer() as server:
+        base, pages = run_with_base(server, list_after_expiry)
+        assert server.stats['auths'] == 1
+
+    assert base.jwt_token == 'stub-jwt-token-1'
+    assert base.headers['Authorization'] == 'Token stub-jwt-token-1'
+    assert all(page == [{'_id': 'row000000', 'Name': 'name-0', 'Number': 0}] for page in pages)
+
+
+def test_retries_unavailable_responses():
+    async def fail_then_answer(base):
+        server.httpd.fail_statuses = [503, 504]
+        rows = await base.list_rows('Table1', limit=1)
+        # a POST is only retried when the server did not process it
+        server.httpd.fail_statuses = [504]
+        with pytest.raises(ConnectionError):
+            await base.append_row('Table1', {'Name': 'a'})
+        return rows
+
+    with StubServer() as server:
+        rows = run_with_base(server, fail_then_answer, max_retries=RetryPolicy(total=3, backoff_factor=0.01))
+        # auth, list_rows tried three times, append_row once
+        assert server.stats['requests'] == 5
+
+    assert len(rows) == 1
+
+
+def test_upload_and_resumed_download(tmp_path):
+    local_path = tmp_path / 'data.bin'
+    local_path.write_bytes(os.urandom(200000))
+    save_path = str(tmp_path / 'file.bin')
+
+    async def transfer(base):
+        info = await base.upload_local_file(str(local_path))
+        bytes_info = await base.upload_bytes_file('hello.txt', b'hello')
+        url = '%s/workspace/1/asset/%s/files/2024-01/file.bin' % (server.url, DTABLE_UUID)
+        await base.download_file(url, save_path)
+        return info, bytes_info
+
+    with StubServer(file_size=300000) as server:
+        server.break_download(100000)
+        info, bytes_info = run_with_base(server, transfer)
+        assert server.stats['uploads'] == 2
+        assert server.stats['downloads'] == 2
+
+    assert info['name'] == 'data.bin'
+    assert info['size'] == 200000
+    assert info['url'] == '%s/workspace/1/asset/%s/files/2024-01/data.bin' % (server.url, DTABLE_UUID)
+    assert bytes_info['size'] == 5
+    with open(save_path, 'rb') as f:
+        assert f.read() == b''.join(gen_file_bytes(0, 300000))
+    assert not os.path.exists(save_path + '.part')
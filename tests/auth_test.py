@@ -0,0 +1,37 @@
+import base64
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.auth import AccessToken, parse_jwt_exp
+
+
+def gen_jwt(payload):
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+    return 'e30.%s.signature' % encoded
+
+
+def test_parse_jwt_exp():
+    exp = datetime(2030, 1, 1, 12, 0, 0)
+    assert parse_jwt_exp(gen_jwt({'exp': int(exp.timestamp())})) == exp
+    assert parse_jwt_exp(gen_jwt({})) is None
+    assert parse_jwt_exp('not-a-jwt') is None
+
+
+def test_access_token():
+    access_token = AccessToken()
+    assert not access_token.expires_soon()
+
+    access_token.set('not-a-jwt', {'Authorization': 'Token not-a-jwt'})
+    headers = access_token.headers
+    assert not access_token.expires_soon()
+
+    exp = datetime.now() + timedelta(minutes=1)
+    jwt_token = gen_jwt({'exp': int(exp.timestamp())})
+    access_token.set(jwt_token, {'Authorization': 'Token ' + jwt_token})
+    assert access_token.headers is headers
+    assert headers['Authorization'] == 'Token ' + jwt_token
+    assert access_token.expires_soon()
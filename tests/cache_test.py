@@ -0,0 +1,79 @@
+import os
+import sys
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.cache import FileCache, MetadataCache
+
+METADATA = {
+    'tables': [{
+        '_id': '0000',
+        'name': 'Table1',
+        'columns': [
+            {'key': '0000', 'name': 'Name', 'type': 'text'},
+            {'key': 'a1b2', 'name': 'Link', 'type': 'link', 'data': {'link_id': 'l1'}},
+        ],
+    }],
+}
+
+
+class Fetcher(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return METADATA
+
+
+def test_metadata_cache_lookups():
+    cache = MetadataCache(ttl=60)
+    fetch = Fetcher()
+    assert cache.get(fetch) is METADATA
+    assert cache.get_table(fetch, 'Table1')['_id'] == '0000'
+    assert cache.get_table(fetch, '0000')['name'] == 'Table1'
+    assert cache.get_table(fetch, 'Missing') is None
+    assert cache.get_column(fetch, 'Table1', 'Link')['data']['link_id'] == 'l1'
+    assert cache.get_column(fetch, '0000', 'a1b2')['name'] == 'Link'
+    assert cache.get_column(fetch, 'Missing', 'Link') is None
+    assert fetch.calls == 1
+
+
+def test_metadata_cache_expiry():
+    fetch = Fetcher()
+    cache = MetadataCache(ttl=60)
+    cache.get(fetch)
+    cache.invalidate()
+    cache.get(fetch)
+    assert fetch.calls == 2
+
+    cache = MetadataCache(ttl=0)
+    cache.get(fetch)
+    cache.get(fetch)
+    assert fetch.calls == 4
+
+
+def test_file_cache(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_size=250)
+    for name in ('a', 'b'):
+        with open(str(tmp_path / name), 'wb') as f:
+            f.write(name.encode() * 100)
+        assert cache.put('uuid/files/' + name, str(tmp_path / name))
+    save_path = str(tmp_path / 'saved')
+    assert cache.get('uuid/files/a', save_path)
+    with open(save_path, 'rb') as f:
+        assert f.read() == b'a' * 100
+
+    # b is the least recently used and makes room for c
+    with open(str(tmp_path / 'c'), 'wb') as f:
+        f.write(b'c' * 100)
+    cache.put('uuid/files/c', str(tmp_path / 'c'))
+    assert not cache.get('uuid/files/b', save_path)
+    assert cache.size == 200
+
+    # the index is rebuilt from the folder
+    cache = FileCache(str(tmp_path / 'cache'), max_size=250)
+    assert cache.size == 200 and cache.get('uuid/files/c', save_path)
+    cache.invalidate('uuid/files/c')
+    assert not cache.get('uuid/files/c', save_path)
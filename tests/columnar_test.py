@@ -0,0 +1,83 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.columnar import convert_db_columns, convert_rows_columns
+
+OPTIONS = [{'id': 'a1', 'name': 'Done'}, {'id': 'b2', 'name': 'Open'}]
+METADATA = [
+    {'key': '_id', 'name': '_id', 'type': 'text'},
+    {'key': '0000', 'name': 'Status', 'type': 'single-select', 'data': {'options': OPTIONS}},
+    {'key': '0001', 'name': 'Number', 'type': 'number'},
+    {'key': '0002', 'name': 'Checked', 'type': 'checkbox'},
+    {'key': '0003', 'name': 'Day', 'type': 'date', 'data': {'format': 'YYYY-MM-DD HH:mm'}},
+]
+RESULTS = [
+    {'_id': 'r1', '0000': 'a1', '0001': 1.5, '0002': True, '0003': '2024-03-01T09:30:00+01:00'},
+    {'_id': 'r2', '0000': 'b2', '0001': None, '0003': None},
+    {'_id': 'r3', '0000': None, '0001': 3, '0002': False, '0003': '2024-03-02T00:00:00+00:00'},
+]
+
+
+def test_convert_db_columns():
+    columns = convert_db_columns(METADATA, RESULTS)
+    assert columns == {
+        '_id': ['r1', 'r2', 'r3'],
+        'Status': ['Done', 'Open', None],
+        'Number': [1.5, None, 3],
+        'Checked': [True, None, False],
+        'Day': ['2024-03-01 09:30:00', None, '2024-03-02 00:00:00'],
+    }
+    with pytest.raises(ValueError):
+        convert_db_columns(METADATA, RESULTS, format='dataframe')
+
+
+class Py39Datetime(datetime):
+
+    @classmethod
+    def fromisoformat(cls, value):
+        if value.endswith('Z'):
+            raise ValueError('Invalid isoformat string: %r' % value)
+        return datetime.fromisoformat(value)
+
+
+def test_convert_db_columns_numpy(monkeypatch):
+    numpy = pytest.importorskip('numpy')
+    columns = convert_db_columns(METADATA, RESULTS, format='numpy')
+    assert columns['Number'].dtype == numpy.float64
+    assert numpy.isnan(columns['Number'][1])
+    assert columns['Checked'].tolist() == [True, False, False]
+    assert columns['Day'].dtype == numpy.dtype('datetime64[us]')
+    # the wall-clock time, as format 'columns' shows it
+    assert str(columns['Day'][0]) == '2024-03-01T09:30:00.000000'
+    assert numpy.isnat(columns['Day'][1])
+    assert columns['Status'].tolist() == [0, 1, -1]
+    assert columns.categories['Status'] == ['Done', 'Open']
+
+    columns = convert_db_columns(METADATA, RESULTS, format='numpy', utc=True)
+    assert str(columns['Day'][0]) == '2024-03-01T08:30:00.000000'
+    assert str(columns['Day'][2]) == '2024-03-02T00:00:00.000000'
+
+    # a Z suffix, as dtable-db sends for UTC, which fromisoformat rejects before python 3.11
+    monkeypatch.setattr('seatable_api.columnar.datetime', Py39Datetime)
+    columns = convert_db_columns(METADATA, [{'_id': 'r1', '0003': '2024-03-01T09:30:00.000Z'}], format='numpy')
+    assert str(columns['Day'][0]) == '2024-03-01T09:30:00.000000'
+    assert convert_db_columns(METADATA, [{'_id': 'r1', '0003': '2024-03-01T09:30:00.000Z'}])['Day'] == [
+        '2024-03-01 09:30:00']
+
+
+def test_convert_rows_columns_arrow():
+    pyarrow = pytest.importorskip('pyarrow')
+    columns = [{'key': column['key'], 'name': column['name'], 'type': column['type'], 'data': column.get('data')}
+               for column in METADATA[1:]]
+    rows = [{'_id': 'r1', 'Status': 'Open', 'Number': 2, 'Checked': True, 'Day': '2024-03-01 09:30'}, {'_id': 'r2'}]
+    batch = convert_rows_columns(columns, rows, format='arrow')
+    assert batch.num_rows == 2
+    assert batch.schema.field('Number').type == pyarrow.float64()
+    assert batch.schema.field('Day').type == pyarrow.timestamp('us')
+    assert batch.column(batch.schema.get_field_index('Status')).to_pylist() == ['Open', None]
+    assert batch.column(batch.schema.get_field_index('_id')).to_pylist() == ['r1', 'r2']
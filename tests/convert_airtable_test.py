@@ -0,0 +1,205 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+import requests
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.constants import ColumnTypes
+from seatable_api.convert_airtable import AirtableAPI, AirtableConvertor, FilesConvertor, RowsConvertor
+from seatable_api.main import SeaTableAPI
+
+DTABLE_UUID = '6a4b12d7-5ab8-4d8e-9d6f-6c59f5b4e3a1'
+
+
+def gen_response(status_code, content):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+class FakeSeaTableSession(object):
+
+    def __init__(self):
+        self.uploads = []
+
+    def get(self, url, **kwargs):
+        return gen_response(200, json.dumps({
+            'upload_link': 'http://stub/upload', 'parent_path': '/asset',
+            'img_relative_path': 'images/2024-01', 'file_relative_path': 'files/2024-01',
+        }).encode())
+
+    def post(self, url, data=None, **kwargs):
+        body = data.read()
+        name = body.split(b'filename="')[1].split(b'"')[0]
+        self.uploads.append(name.decode())
+        return gen_response(200, b'[{"name": "%s", "size": %d}]' % (name, len(body)))
+
+
+class FakeAirtableSession(object):
+    """Serves attachments once released, a url containing 'broken' fails"""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.downloads = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.released.wait(5)
+        self.downloads.append(url)
+        if 'broken' in url:
+            return gen_response(404, b'Not found')
+        return gen_response(200, url.encode() * 1000)
+
+
+def test_attachments_migrated_concurrently():
+    seatable_session = FakeSeaTableSession()
+    base = SeaTableAPI('token', 'http://stub', session=seatable_session)
+    base.is_authed = True
+    base.dtable_uuid = DTABLE_UUID
+    base.workspace_id = 1
+    files_convertor = FilesConvertor('key', base, workers=4)
+    files_convertor.session = FakeAirtableSession()
+    rows_convertor = RowsConvertor(files_convertor)
+
+    logo = {'id': 'att1', 'url': 'https://airtable/logo', 'filename': 'logo.png'}
+    columns = [
+        {'name': 'Name', 'type': ColumnTypes.TEXT.value},
+        {'name': 'Files', 'type': ColumnTypes.FILE.value},
+        {'name': 'Images', 'type': ColumnTypes.IMAGE.value},
+    ]
+    airtable_rows = [
+        {'_id': 'rec1', 'Name': 'a', 'Files': [logo], 'Images': [logo]},
+        {'_id': 'rec2', 'Name': 'b', 'Files': [
+            logo, {'id': 'att2', 'url': 'https://airtable/broken', 'filename': 'broken.txt'}]},
+    ]
+
+    # the rows are converted while every download is still held back
+    rows = rows_convertor.convert(columns, airtable_rows, 'Table1')
+    assert rows == [{'_id': 'rec1', 'Name': 'a'}, {'_id': 'rec2', 'Name': 'b'}]
+    assert files_convertor.session.downloads == []
+
+    files_convertor.session.released.set()
+    updates = files_convertor.pop_cells('Table1')
+    files_convertor.close()
+
+    url = 'http://stub/workspace/1/asset/%s/%s/logo.png'
+    assert updates[0]['row_id'] == 'rec1'
+    assert updates[0]['row']['Files'][0]['url'] == url % (DTABLE_UUID, 'files/2024-01')
+    assert updates[0]['row']['Images'] == [url % (DTABLE_UUID, 'images/2024-01')]
+    # the failed attachment is left out
+    assert updates[1] == {'row_id': 'rec2', 'row': {'Files': updates[0]['row']['Files']}}
+    # once per attachment and asset type
+    assert sorted(files_convertor.session.downloads) == [
+        'https://airtable/broken', 'https://airtable/logo', 'https://airtable/logo']
+    assert seatable_session.uploads == ['logo.png', 'logo.png']
+    assert files_convertor.pop_cells('Table1') == []
+
+
+def test_airtable_iter_pages():
+    airtable_api = AirtableAPI('key', 'base')
+    pages = {'': ([{'_id': 'rec1'}], 'page2'), 'page2': ([{'_id': 'rec2'}], None)}
+    requested = []
+
+    def list_rows(table_name, offset=''):
+        requested.append(offset)
+        return pages[offset]
+
+    airtable_api.list_rows = list_rows
+    page_iter = airtable_api.iter_pages('Table1')
+    assert next(page_iter) == [{'_id': 'rec1'}]
+    assert list(page_iter) == [[{'_id': 'rec2'}]]
+    assert requested == ['', 'page2']
+
+
+class FakeAirtableAPI(object):
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def iter_pages(self, table_name):
+        for page in self.tables[table_name]:
+            yield page
+
+
+class FakeBase(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.appended = {}
+        self.links = []
+
+    def get_metadata(self):
+        return {'tables': [
+            {'_id': 't1', 'name': 'Projects', 'columns': [
+                {'name': 'Name', 'type': ColumnTypes.TEXT.value},
+                {'name': 'Client', 'type': ColumnTypes.LINK.value,
+                 'data': {'link_id': 'l1', 'table_id': 't1', 'other_table_id': 't2'}},
+            ]},
+            {'_id': 't2', 'name': 'Clients', 'columns': [{'name': 'Name', 'type': ColumnTypes.TEXT.value}]},
+        ]}
+
+    def get_file_upload_link(self):
+        raise AssertionError('no attachments to upload')
+
+    def list_rows(self, table_name):
+        return []
+
+    def batch_append_rows(self, table_name, rows, chunk_size=None):
+        with self.lock:
+            self.appended.setdefault(table_name, []).append(rows)
+        return {'chunks': [{'offset': 0, 'count': len(rows), 'success': True}]}
+
+    def batch_update_links(self, link_id, table_id, other_table_id, row_id_list, other_rows_ids_map, chunk_size=None):
+        self.links.append((link_id, row_id_list, other_rows_ids_map))
+        return {'chunks': [{'offset': 0, 'count': len(row_id_list), 'success': True}]}
+
+
+def test_convert_data_pipelined(monkeypatch):
+    monkeypatch.setattr('seatable_api.convert_airtable.time.sleep', lambda seconds: None)
+    monkeypatch.setattr('seatable_api.convert_airtable.LIMIT', 3)
+    base = FakeBase()
+    convertor = AirtableConvertor('key', 'base', base, ['Projects', 'Clients'],
+                                  links=[('Projects', 'Client', 'Clients')])
+    convertor.airtable_api = FakeAirtableAPI({
+        'Projects': [
+            [{'_id': 'rec%d' % i, 'Name': 'p%d' % i, 'Client': ['cli1']} for i in range(2)],
+            [{'_id': 'rec%d' % i, 'Name': 'p%d' % i} for i in range(2, 4)],
+        ],
+        'Clients': [[{'_id': 'cli1', 'Name': 'c1'}]],
+    })
+    convertor.convert_data(pipelined=True, table_workers=2)
+
+    # pages are appended once LIMIT rows are converted, and the rest at the end
+    assert [[row['_id'] for row in rows] for rows in base.appended['Projects']] == [
+        ['rec0', 'rec1', 'rec2', 'rec3']]
+    assert base.appended['Clients'] == [[{'_id': 'cli1', 'Name': 'c1'}]]
+    # only the link cells are kept for the links
+    assert convertor.airtable_row_map['Projects'][0] == {'_id': 'rec0', 'Client': ['cli1']}
+    assert base.links == [('l1', ['rec0', 'rec1'], {'rec0': ['cli1'], 'rec1': ['cli1']})]
+
+
+class FailingBase(FakeBase):
+
+    def batch_append_rows(self, table_name, rows, chunk_size=None):
+        super(FailingBase, self).batch_append_rows(table_name, rows, chunk_size)
+        return {'chunks': [
+            {'offset': 0, 'count': 2, 'success': True},
+            {'offset': 2, 'count': 2, 'success': False, 'error': "(502, 'Bad Gateway')"},
+        ]}
+
+
+def test_convert_data_raises_on_failed_chunk(monkeypatch):
+    monkeypatch.setattr('seatable_api.convert_airtable.time.sleep', lambda seconds: None)
+    base = FailingBase()
+    convertor = AirtableConvertor('key', 'base', base, ['Clients'])
+    convertor.airtable_api = FakeAirtableAPI({
+        'Clients': [[{'_id': 'cli%d' % i, 'Name': 'c%d' % i} for i in range(4)]],
+    })
+    with pytest.raises(Exception, match='1 of 2 chunks failed in table "Clients"'):
+        convertor.convert_data(pipelined=True)
+    assert base.links == []
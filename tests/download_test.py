@@ -0,0 +1,155 @@
+import os
+import sys
+
+import pytest
+import requests
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.download import stream_download
+from seatable_api.main import SeaTableAPI
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, headers, body, break_after=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.break_after = break_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size):
+        if self.break_after is not None:
+            yield self.body[:self.break_after]
+            raise requests.exceptions.ChunkedEncodingError('connection broken')
+        yield self.body
+
+
+class FakeSession(object):
+    """Serves CONTENT with Range support, the first responses break off after the given byte counts
+    """
+
+    def __init__(self, breaks=(), single_use_links=False, etag='"v1"'):
+        self.breaks = list(breaks)
+        self.single_use_links = single_use_links
+        self.etag = etag
+        self.used_links = set()
+        self.requests = []
+        self.if_ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, headers.get('Range')))
+        self.if_ranges.append(headers.get('If-Range'))
+        if self.single_use_links and url in self.used_links:
+            return FakeResponse(403, {}, b'')
+        self.used_links.add(url)
+        break_after = self.breaks.pop(0) if self.breaks else None
+        if headers.get('Range') and headers.get('If-Range', self.etag) == self.etag:
+            start = int(headers['Range'][6:-1])
+            if start >= len(CONTENT):
+                return FakeResponse(416, {'Content-Range': 'bytes */%d' % len(CONTENT)}, b'')
+            content_range = 'bytes %d-%d/%d' % (start, len(CONTENT) - 1, len(CONTENT))
+            return FakeResponse(206, {'Content-Range': content_range, 'ETag': self.etag}, CONTENT[start:],
+                                break_after)
+        return FakeResponse(200, {'Content-Length': str(len(CONTENT)), 'ETag': self.etag}, CONTENT, break_after)
+
+
+def read(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def test_stream_download(tmp_path):
+    save_path = str(tmp_path / 'file.bin')
+    session = FakeSession(breaks=[1000, 500])
+    assert stream_download(session, lambda: 'link', save_path) == len(CONTENT)
+    assert read(save_path) == CONTENT and not os.path.exists(save_path + '.part')
+    assert session.requests == [('link', None), ('link', 'bytes=1000-'), ('link', 'bytes=1500-')]
+
+    with pytest.raises(Exception):
+        stream_download(FakeSession(breaks=[10] * 5), lambda: 'link', save_path, resumes=3)
+
+
+def interrupted_download(save_path, key, size):
+    with pytest.raises(Exception):
+        stream_download(FakeSession(breaks=[size]), lambda: 'link', save_path, resumes=0, key=key)
+    assert os.path.getsize(save_path + '.part') == size
+
+
+def test_stream_download_resumes_part_file(tmp_path):
+    save_path = str(tmp_path / 'file.bin')
+    interrupted_download(save_path, 'uuid/file.bin', 3000)
+    session = FakeSession()
+    stream_download(session, lambda: 'link', save_path, key='uuid/file.bin')
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link', 'bytes=3000-')]
+    assert session.if_ranges == ['"v1"']
+    assert not os.path.exists(save_path + '.part.json')
+
+    # the file changed on the server since the part was written
+    interrupted_download(save_path, 'uuid/file.bin', 3000)
+    session = FakeSession(etag='"v2"')
+    stream_download(session, lambda: 'link', save_path, key='uuid/file.bin')
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link', 'bytes=3000-')]
+
+    # a part that is already complete
+    interrupted_download(save_path, 'uuid/file.bin', len(CONTENT))
+    session = FakeSession()
+    stream_download(session, lambda: 'link', save_path, key='uuid/file.bin')
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link', 'bytes=%d-' % len(CONTENT))]
+
+
+def test_stream_download_ignores_foreign_part_file(tmp_path):
+    save_path = str(tmp_path / 'a.bin')
+    # left behind by another program, or by a download of another file
+    with open(save_path + '.part', 'wb') as f:
+        f.write(b'X' * 300)
+    session = FakeSession()
+    stream_download(session, lambda: 'link', save_path, key='uuid/a.bin')
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link', None)]
+
+    interrupted_download(save_path, 'uuid/b.bin', 300)
+    session = FakeSession()
+    stream_download(session, lambda: 'link', save_path, key='uuid/a.bin')
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link', None)]
+
+
+def test_stream_download_refreshes_link(tmp_path):
+    save_path = str(tmp_path / 'file.bin')
+    links = iter(['link-1', 'link-2'])
+    session = FakeSession(breaks=[100], single_use_links=True)
+    stream_download(session, lambda: next(links), save_path)
+    assert read(save_path) == CONTENT
+    assert session.requests == [('link-1', None), ('link-1', 'bytes=100-'), ('link-2', 'bytes=100-')]
+
+
+def test_download_files(tmp_path):
+    base = SeaTableAPI('token', 'http://stub')
+    base.is_authed = True
+
+    def download_file(url, save_path):
+        if 'broken' in url:
+            raise Exception('download file error')
+        with open(save_path, 'w') as f:
+            f.write(url)
+    base.download_file = download_file
+
+    asset_url = 'http://stub/workspace/1/asset/uuid/files/%s'
+    urls = [asset_url % '2024-01/a%20b.txt', asset_url % '2024-02/a%20b.txt', asset_url % 'broken.txt']
+    results = base.download_files(urls, str(tmp_path / 'dest'), workers=2)
+    assert [os.path.basename(result['path']) for result in results] == ['a b.txt', 'a b (1).txt', 'broken.txt']
+    with open(results[1]['path']) as f:
+        assert f.read() == urls[1]
+    assert 'error' not in results[0] and results[2]['error'] == 'download file error'
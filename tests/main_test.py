@@ -0,0 +1,116 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../demo'))
+from seatable_api.main import SeaTableAPI
+from stub_server import DTABLE_UUID, StubServer, gen_file_bytes
+
+
+def test_iter_rows_page_size_above_server_limit():
+    with StubServer(total_rows=2500) as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        server.reset_stats()
+        rows = list(base.iter_rows('Table1', page_size=5000))
+        # three pages of at most 1000 rows, the last one short
+        assert server.stats['requests'] == 3
+
+    assert [row['_id'] for row in rows] == ['row%06d' % i for i in range(2500)]
+
+
+def test_iter_query_pages_in_a_stable_order():
+    with StubServer(total_rows=25) as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        queries = []
+        query = base.query
+
+        def record_query(sql, convert=True):
+            queries.append(sql)
+            return query(sql, convert=convert)
+
+        base.query = record_query
+        rows = list(base.iter_query('SELECT * FROM Table1 LIMIT 5, 18', page_size=10, prefetch=0))
+
+    assert [row['_id'] for row in rows] == ['row%06d' % i for i in range(5, 23)]
+    assert queries == [
+        'SELECT * FROM Table1 ORDER BY _id LIMIT 10 OFFSET 5',
+        'SELECT * FROM Table1 ORDER BY _id LIMIT 8 OFFSET 15',
+    ]
+
+
+def test_set_jwt_token():
+    with StubServer() as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        clone = base._clone()
+        base.jwt_token = 'new-token'
+        base.jwt_exp = datetime(2030, 1, 1)
+
+    assert clone.jwt_token == 'new-token'
+    assert clone.jwt_exp == datetime(2030, 1, 1)
+    assert clone.headers['Authorization'] == 'Token new-token'
+
+
+def test_refresh_once_for_all_threads():
+    with StubServer() as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        clones = [base._clone() for _ in range(32)]
+        base.jwt_exp = datetime.now() - timedelta(minutes=1)
+        server.expire_tokens()
+        server.reset_stats()
+        with ThreadPoolExecutor(32) as executor:
+            pages = list(executor.map(lambda clone: clone.list_rows('Table1', limit=1), clones))
+        assert server.stats['auths'] == 1
+        # one refresh and one list rows per clone, none rejected
+        assert server.stats['requests'] == 33
+
+    assert base.jwt_token == 'stub-jwt-token-1'
+    assert all(page == [{'_id': 'row000000', 'Name': 'name-0', 'Number': 0}] for page in pages)
+
+
+def test_retry_after_token_expired():
+    with StubServer() as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        server.expire_tokens()
+        server.reset_stats()
+        rows = base.list_rows('Table1', limit=2)
+        # rejected with "Token expired.", refreshed and sent again
+        assert server.stats['requests'] == 3
+        assert server.stats['auths'] == 1
+
+    assert len(rows) == 2
+    assert base.headers['Authorization'] == 'Token stub-jwt-token-1'
+
+
+def test_filter_first_in_one_query():
+    with StubServer() as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        queryset = base.filter('Table1', 'Number = 0')
+        server.reset_stats()
+        row = queryset.first()
+        # one LIMIT 1 query, no list rows request
+        assert server.stats['requests'] == 1
+        assert server.stats['queries'] == ['SELECT * FROM `Table1` WHERE `Number` = 0 LIMIT 1']
+
+    assert row == {'_id': 'row000000', 'Name': 'name-0', 'Number': 0}
+
+
+def test_download_file_ignores_foreign_part_file(tmp_path):
+    save_path = str(tmp_path / 'a.bin')
+    with open(save_path + '.part', 'wb') as f:
+        f.write(b'X' * 300)
+    with StubServer(file_size=1000) as server:
+        base = SeaTableAPI('token', server.url)
+        base.auth()
+        base.download_file('%s/workspace/1/asset/%s/files/2024-01/a.bin' % (server.url, DTABLE_UUID), save_path)
+
+    with open(save_path, 'rb') as f:
+        assert f.read() == b''.join(gen_file_bytes(0, 1000))
@@ -0,0 +1,215 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.query import QuerySet, compile_conditions, get_conditions_parser, split_sql_conditions
+
+COLUMNS = [
+    {'name': 'Name', 'type': 'text'},
+    {'name': 'Number', 'type': 'number'},
+    {'name': 'Done', 'type': 'checkbox'},
+    {'name': 'Tags', 'type': 'multiple-select'},
+    {'name': 'Notes', 'type': 'long-text'},
+    {'name': 'Day', 'type': 'date'},
+    {'name': 'Created', 'type': 'ctime'},
+]
+SCHEMA = tuple((column['name'], column['type']) for column in COLUMNS)
+ROWS = [{'_id': str(i), 'Name': 'name-%d' % i, 'Number': i, 'Done': i % 2 == 0} for i in range(10)]
+# rows as list_rows returns them
+TABLE_ROWS = [{
+    '_id': str(i),
+    'Name': 'Name-%d' % i,
+    'Number': i,
+    'Notes': 'note %d\n' % i,
+    'Day': '2024-03-%02d 09:30' % (i + 1),
+    # days apart, so comparisons hold in any local time zone
+    'Created': '2024-03-%02dT09:30:00.000+00:00' % (3 * i + 1),
+} for i in range(10)]
+
+
+def filter_ids(conditions, rows=ROWS):
+    queryset = QuerySet(None, 'Table1')
+    queryset.raw_rows = rows
+    queryset.raw_columns = COLUMNS
+    queryset.conditions = conditions
+    queryset._execute_conditions()
+    return [row['_id'] for row in queryset]
+
+
+def test_filter():
+    assert filter_ids("Number >= 7") == ['7', '8', '9']
+    assert filter_ids("Number > 2 and Done = true and Number < 7") == ['4', '6']
+    assert filter_ids("Name = 'name-3' or Number = 1") == ['1', '3']
+    assert filter_ids("Name like name-1%") == ['1']
+    # and / or share one precedence and group from the left
+    assert filter_ids("Number = 1 or Number = 2 and Done = true") == ['2']
+    assert filter_ids("Number = 1 or (Number = 2 and Done = true)") == ['1', '2']
+    assert filter_ids("(Number < 2 or Number > 7) and (Done = true)") == ['0', '8']
+    try:
+        filter_ids("Missing = 1")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('an unknown column should raise')
+    try:
+        filter_ids("(Number = 1")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('an unclosed parenthesis should raise')
+
+
+def test_compile_conditions_cached():
+    schema = (('Number', 'number'),)
+    assert compile_conditions('Number = 1', schema) is compile_conditions('Number = 1', schema)
+    assert compile_conditions('Number = 1', schema) is not compile_conditions('Number = 1', (('Number', 'text'),))
+    assert get_conditions_parser() is get_conditions_parser()
+
+
+def test_filter_threads():
+    conditions = ['Number = %d or Number = %d' % (i, 9 - i) for i in range(10)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(filter_ids, conditions * 20))
+    assert results == [filter_ids(c) for c in conditions] * 20
+
+
+def test_split_sql_conditions():
+    def split(conditions):
+        sql, rest = split_sql_conditions(compile_conditions(conditions, SCHEMA))
+        return sql, rest and getattr(rest, 'column', 'merge')
+
+    assert split("Number > 2 and Done = true") == ("(`Number` > 2 AND `Done` = true)", None)
+    assert split("Number != 2.5") == ("(`Number` != 2.5 OR `Number` IS NULL)", None)
+    assert split("Done = false") == ("(`Done` = false OR `Done` IS NULL)", None)
+    assert split("Done != false") == ("`Done` = true", None)
+    assert split("Number > 2 and Tags = a") == ("`Number` > 2", 'Tags')
+    assert split("Number = ''") == (None, 'Number')
+    assert split("Number > 2 or Tags = a")[0] is None
+    # text may compare case-insensitively in sql, dates in another time zone
+    assert split("Number > 2 and Name like name%") == ("`Number` > 2", 'Name')
+    assert split("Name = abc") == (None, 'Name')
+    assert split("Day > 2024-03-01") == (None, 'Day')
+
+
+class FakeBase(object):
+    """iter_query and query answer with sql_rows, as if sql selected them"""
+
+    def __init__(self, rows, sql_rows=None):
+        self.rows = rows
+        self.sql_rows = sql_rows if sql_rows is not None else rows
+        self.calls = []
+
+    def iter_rows(self, table_name, view_name=None):
+        self.calls.append(('iter_rows', view_name))
+        return iter(self.rows)
+
+    def iter_query(self, sql):
+        self.calls.append(('iter_query', sql))
+        return (dict(row) for row in self.sql_rows)
+
+    def batch_update_rows(self, table_name, rows_data, chunk_size=None, workers=None):
+        self.calls.append(('batch_update_rows', len(rows_data), chunk_size))
+        return {'success': True, 'chunks': [
+            {'offset': 0, 'count': 2, 'success': True},
+            {'offset': 2, 'count': 1, 'success': False, 'error': 'failed'},
+        ]}
+
+    def batch_delete_rows(self, table_name, row_ids):
+        self.calls.append(('batch_delete_rows', row_ids))
+        return {'success': True, 'chunks': [
+            {'offset': 0, 'count': 2, 'success': False, 'error': 'failed'},
+            {'offset': 2, 'count': len(row_ids) - 2, 'success': True},
+        ]}
+
+    def query(self, sql):
+        self.calls.append(('query', sql))
+        if sql.startswith('SELECT COUNT(*)'):
+            return [{'COUNT(*)': 42}]
+        return [dict(row) for row in self.sql_rows[:1]]
+
+
+def lazy_queryset(base, conditions, view_name=None):
+    queryset = QuerySet(base, 'Table1', view_name)
+    queryset.raw_columns = COLUMNS
+    return queryset.filter(conditions)
+
+
+def test_lazy_queryset():
+    base = FakeBase(ROWS)
+    queryset = lazy_queryset(base, 'Number > 2').filter('Done = true')
+    assert base.calls == []
+    assert queryset.count() == 42
+    assert queryset.exists()
+    assert base.calls == [
+        ('query', 'SELECT COUNT(*) FROM `Table1` WHERE (`Number` > 2 AND `Done` = true)'),
+        ('query', 'SELECT `_id` FROM `Table1` WHERE (`Number` > 2 AND `Done` = true) LIMIT 1'),
+    ]
+
+    # a condition sql expresses completely is not matched again on the client
+    base = FakeBase(ROWS, sql_rows=[ROWS[4], ROWS[6], ROWS[8]])
+    queryset = lazy_queryset(base, 'Number > 2 and Done = true')
+    assert queryset.first()['_id'] == '4'
+    assert [row['_id'] for row in queryset] == ['4', '6', '8']
+    assert base.calls == [
+        ('query', 'SELECT * FROM `Table1` WHERE (`Number` > 2 AND `Done` = true) LIMIT 1'),
+        ('iter_query', 'SELECT * FROM `Table1` WHERE (`Number` > 2 AND `Done` = true)'),
+    ]
+
+    # the multiple-select comparison is matched on the client, over the sql results
+    base = FakeBase(ROWS, sql_rows=ROWS[7:])
+    assert lazy_queryset(base, 'Number > 6 and Tags = a').count() == 0
+    assert base.calls == [('iter_query', 'SELECT * FROM `Table1` WHERE `Number` > 6')]
+
+    base = FakeBase(ROWS)
+    assert [row['_id'] for row in lazy_queryset(base, 'Number > 6', view_name='Default')] == ['7', '8', '9']
+    assert lazy_queryset(base, 'Number > 6', view_name='Default').get('Done = true')['_id'] == '8'
+    assert [call[0] for call in base.calls] == ['iter_rows', 'iter_rows']
+
+
+def test_update():
+    base = FakeBase(ROWS)
+    queryset = QuerySet(base, 'Table1')
+    queryset.raw_rows = ROWS
+    queryset.raw_columns = COLUMNS
+    queryset = queryset.filter('Number < 3')
+    results = queryset.update({'Name': 'new'}, chunk_size=2)
+    assert base.calls == [('batch_update_rows', 3, 2)]
+    assert [(result['_id'], result['success']) for result in results] == [('0', True), ('1', True), ('2', False)]
+    assert [row['Name'] for row in queryset] == ['new', 'new', 'name-2']
+    assert ROWS[0]['Name'] == 'name-0'
+
+
+def test_delete():
+    base = FakeBase(ROWS)
+    queryset = QuerySet(base, 'Table1')
+    queryset.raw_rows = ROWS
+    queryset.raw_columns = COLUMNS
+    queryset = queryset.filter('Number < 5')
+    # the first chunk fails, its rows are kept
+    assert queryset.delete() == 3
+    assert base.calls == [('batch_delete_rows', ['0', '1', '2', '3', '4'])]
+    assert [row['_id'] for row in queryset] == ['0', '1']
+
+
+def test_mixed_plan_on_table_rows():
+    # rows as query() returns them, dates without date format are not formatted
+    sql_rows = [dict(TABLE_ROWS[i], Day='2024-03-%02dT09:30:00+00:00' % (i + 1),
+                     Created='2024-03-%02dT09:30:00.000Z' % (3 * i + 1)) for i in range(5, 10)]
+    base = FakeBase(TABLE_ROWS, sql_rows=sql_rows)
+    queryset = lazy_queryset(base, 'Number > 4 and Notes like %note% and Created > 2024-03-18 and Day < 2024-03-09')
+    assert [row['_id'] for row in queryset] == ['6', '7']
+    assert base.calls == [('iter_query', 'SELECT * FROM `Table1` WHERE `Number` > 4')]
+    # the cells the comparisons parse have the list_rows formats
+    assert queryset[0]['Created'] == TABLE_ROWS[6]['Created']
+    assert queryset[0]['Day'] == '2024-03-07 09:30:00'
+
+    # text comparisons stay on the client, case-sensitive as before
+    base = FakeBase(TABLE_ROWS, sql_rows=[])
+    assert lazy_queryset(base, 'Name = name-3').count() == 0
+    assert lazy_queryset(base, 'Name = Name-3 or Number = 1').count() == 2
+    assert base.calls == [('iter_rows', None), ('iter_rows', None)]
+
+    assert lazy_queryset(base, 'Number > 20 and Name like Name%').first() is None
+    assert not lazy_queryset(base, 'Number > 20').exists()
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../demo'))
+from seatable_api.main import SeaTableAPI
+from seatable_api.rate_limit import RateLimiter, ThrottledSession, TokenBucket
+from seatable_api.session import RetryPolicy
+from stub_server import StubServer
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+    elapsed = time.monotonic() - start
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    assert 0.06 <= elapsed < 0.5
+    metrics = bucket.metrics()
+    assert metrics['requests'] == 6
+    assert metrics['waits'] == 4
+    assert abs(metrics['wait_time'] - sum(waits)) < 1e-9
+
+
+def test_token_bucket_threads():
+    bucket = TokenBucket(rate=100, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.09
+    assert bucket.metrics()['requests'] == 11
+
+
+def test_rate_limiter_buckets():
+    limiter = RateLimiter(rate=10, query_rate=1)
+    assert limiter.bucket_for('https://cloud.seatable.io/dtable-db/api/v1/query/abc/') is limiter.query
+    assert limiter.bucket_for('https://cloud.seatable.io/api-gateway/api/v2/dtables/abc/sql') is limiter.query
+    assert limiter.bucket_for('https://cloud.seatable.io/dtable-server/api/v1/dtables/abc/rows/?table_name=T') \
+        is limiter.rows
+    limiter.throttle('https://cloud.seatable.io/dtable-db/api/v1/query/abc/')
+    assert limiter.metrics()['query']['requests'] == 1
+    assert limiter.metrics()['rows']['requests'] == 0
+
+
+def test_throttled_session():
+    limiter = RateLimiter(rate=20, burst=1)
+    with StubServer() as server:
+        base = SeaTableAPI('token', server.url, rate_limiter=limiter,
+                           max_retries=RetryPolicy(total=3, backoff_factor=0.01))
+        assert isinstance(base.session, ThrottledSession)
+        base.auth()
+        clone = base._clone()
+        start = time.monotonic()
+        for _ in range(3):
+            clone.list_rows('Table1', limit=1)
+        base.query('SELECT * FROM Table1 LIMIT 1')
+        # three row requests after auth, 1 / 20 seconds apart
+        assert time.monotonic() - start >= 0.14
+        assert limiter.metrics()['rows']['requests'] == 4
+        assert limiter.metrics()['query']['requests'] == 1
+
+        # the retry the adapter makes is not throttled again
+        limiter.reset_metrics()
+        server.reset_stats()
+        server.httpd.fail_statuses = [503]
+        base.list_rows('Table1', limit=1)
+        assert server.stats['requests'] == 2
+
+    assert limiter.metrics()['rows']['requests'] == 1
@@ -0,0 +1,163 @@
+import gzip
+import json
+import os
+import sys
+import zlib
+
+import pytest
+import requests
+from urllib3.util.retry import RequestHistory
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../demo'))
+from seatable_api.main import Account, SeaTableAPI
+from seatable_api.session import COMPRESS_MIN_SIZE, RetryPolicy, encode_json_body, send_json
+from stub_server import StubServer
+
+HEADERS = {'Authorization': 'Token jwt'}
+LARGE_DATA = {'rows': [{'Name': 'name-%d' % i} for i in range(COMPRESS_MIN_SIZE // 10)]}
+
+
+class FakeSession(object):
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def put(self, url, **kwargs):
+        self.requests.append(kwargs)
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        return response
+
+
+class FakeBase(object):
+
+    def __init__(self, session, compress_requests):
+        self.session = session
+        self.headers = HEADERS
+        self.timeout = 30
+        self.compress_requests = compress_requests
+
+
+def test_encode_json_body():
+    assert encode_json_body(LARGE_DATA, HEADERS) == {'json': LARGE_DATA, 'headers': HEADERS}
+
+    kwargs = encode_json_body({'rows': []}, HEADERS, 'gzip')
+    assert json.loads(kwargs['data']) == {'rows': []}
+    assert 'Content-Encoding' not in kwargs['headers']
+
+    kwargs = encode_json_body(LARGE_DATA, HEADERS, 'gzip')
+    assert json.loads(gzip.decompress(kwargs['data'])) == LARGE_DATA
+    assert kwargs['headers'] == {
+        'Authorization': 'Token jwt', 'Content-Type': 'application/json', 'Content-Encoding': 'gzip',
+    }
+    assert HEADERS == {'Authorization': 'Token jwt'}
+
+    kwargs = encode_json_body(LARGE_DATA, HEADERS, 'deflate')
+    assert json.loads(zlib.decompress(kwargs['data'])) == LARGE_DATA
+
+    with pytest.raises(ValueError):
+        encode_json_body(LARGE_DATA, HEADERS, 'br')
+
+
+def test_send_json_falls_back_on_415():
+    base = FakeBase(FakeSession([415, 200]), 'gzip')
+    response = send_json(base, 'PUT', 'http://stub/rows/', LARGE_DATA)
+    assert response.status_code == 200
+    assert base.compress_requests is None
+    first, second = base.session.requests
+    assert first['headers']['Content-Encoding'] == 'gzip'
+    assert second == {'json': LARGE_DATA, 'headers': HEADERS, 'timeout': 30}
+
+
+def test_shared_session():
+    with StubServer() as server:
+        account = Account('user@example.com', 'password', server.url)
+        account.auth()
+        base = account.get_base(1, 'stub')
+        clone = base._clone()
+        assert base.session is account.session
+        assert clone.session is base.session
+
+        server.httpd.use_api_gateway = True
+        gateway_base = SeaTableAPI('stub-api-token', server.url, session=base.session)
+        gateway_base.auth()
+        assert gateway_base.api_gateway.session is base.session
+        assert gateway_base._clone().api_gateway is gateway_base.api_gateway
+
+        adapter = account.session.get_adapter(server.url)
+        assert adapter is base.session.get_adapter(server.url + '/dtable-server/')
+        server.reset_stats()
+        base.get_metadata()
+        clone.list_rows('Table1')
+        gateway_base.get_metadata()
+        account.list_workspaces()
+        # every call went through the one pooled connection
+        assert server.stats['requests'] == 4
+        assert len(server.stats['connections']) == 1
+
+
+def gen_retry_base(server, sleeps, monkeypatch):
+    # the adapter waits with time.sleep, record the waits instead
+    monkeypatch.setattr('urllib3.util.retry.time.sleep', sleeps.append)
+    base = SeaTableAPI('token', server.url, max_retries=RetryPolicy(total=3, backoff_factor=0.1))
+    base.auth()
+    server.reset_stats()
+    return base
+
+
+def test_retry_post_only_if_unprocessed(monkeypatch):
+    sleeps = []
+    with StubServer() as server:
+        base = gen_retry_base(server, sleeps, monkeypatch)
+        # 429 and 503 are answered before the request is processed
+        server.httpd.retry_after = None
+        server.httpd.fail_statuses = [503, 429]
+        base.append_row('Table1', {'Name': 'a'})
+        assert server.stats['requests'] == 3
+        assert server.stats['items_received'] == 0
+
+        # a 502 or 504 may come after the row was saved, it is not sent again
+        server.reset_stats()
+        for status in (502, 504):
+            server.httpd.fail_statuses = [status]
+            with pytest.raises(ConnectionError):
+                base.append_row('Table1', {'Name': 'a'})
+        assert server.stats['requests'] == 2
+
+        # any of them is retried for a GET
+        server.reset_stats()
+        server.httpd.fail_statuses = [502, 504, 503]
+        assert len(base.list_rows('Table1', limit=1)) == 1
+        assert server.stats['requests'] == 4
+
+    # the backoff of the nth retry is 0.1 * 2 ** (n - 1), half of it jitter
+    bounds = [(0.05, 0.1), (0.1, 0.2), (0.05, 0.1), (0.1, 0.2), (0.2, 0.4)]
+    assert len(sleeps) == len(bounds)
+    assert all(low <= sleep <= high for sleep, (low, high) in zip(sleeps, bounds))
+
+
+def test_retry_after_header(monkeypatch):
+    sleeps = []
+    with StubServer() as server:
+        base = gen_retry_base(server, sleeps, monkeypatch)
+        server.httpd.retry_after = '7'
+        server.httpd.fail_statuses = [429, 429, 429, 429]
+        # retried 3 times, the last 429 is reported
+        with pytest.raises(ConnectionError):
+            base.list_rows('Table1', limit=1)
+        assert server.stats['requests'] == 4
+
+    assert sleeps == [7, 7, 7]
+
+
+def test_backoff_capped_with_jitter():
+    retry = RetryPolicy(total=20, backoff_factor=1)
+    history = (RequestHistory('GET', '/', None, 503, None),) * 10
+    backoffs = [retry.new(history=history).get_backoff_time() for _ in range(100)]
+    # 2 ** 9 seconds are capped at MAX_BACKOFF, of which the second half is random
+    assert all(RetryPolicy.MAX_BACKOFF / 2 <= backoff <= RetryPolicy.MAX_BACKOFF for backoff in backoffs)
+    assert len(set(backoffs)) > 1
+    assert retry.get_backoff_time() == 0
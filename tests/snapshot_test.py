@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+
+import pytest
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.snapshot import export_snapshot
+
+OPTIONS = [{'id': 'a1', 'name': 'Done'}, {'id': 'b2', 'name': 'Open'}]
+METADATA = {
+    'tables': [{
+        '_id': 't1',
+        'name': 'Table1',
+        'columns': [
+            {'key': '0000', 'name': 'Name', 'type': 'text'},
+            {'key': '0001', 'name': 'Number', 'type': 'number'},
+            {'key': '0002', 'name': 'Status', 'type': 'single-select', 'data': {'options': OPTIONS}},
+            {'key': '0003', 'name': 'Tags', 'type': 'multiple-select'},
+        ],
+    }, {
+        '_id': 't2',
+        'name': 'Table2',
+        'columns': [{'key': '0000', 'name': 'Name', 'type': 'text'}],
+    }],
+}
+TABLE_ROWS = {
+    'Table1': [{
+        '_id': 'r%d' % i, 'Name': 'name-%d' % i, 'Number': i, 'Status': 'Done' if i % 2 else 'Open',
+        'Tags': ['x'] if i % 3 else None,
+    } for i in range(25)],
+    'Table2': [{'_id': 's%d' % i, 'Name': 'other-%d' % i} for i in range(3)],
+}
+
+
+class FakeBase(object):
+    dtable_uuid = 'uuid'
+
+    def __init__(self, fail_at=None):
+        # (table name, start) of the one request that fails
+        self.fail_at = fail_at
+        self.requests = []
+
+    def get_metadata(self):
+        return METADATA
+
+    def list_rows(self, table_name, start=None, limit=None):
+        self.requests.append((table_name, start))
+        if (table_name, start) == self.fail_at:
+            self.fail_at = None
+            raise ConnectionError(502, 'bad gateway')
+        return TABLE_ROWS[table_name][start:start + limit]
+
+
+def read_jsonl(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_export_snapshot_jsonl(tmp_path):
+    manifest = export_snapshot(FakeBase(), str(tmp_path), workers=2, page_size=10)
+    assert manifest['tables']['t1']['rows'] == 25 and manifest['tables']['t1']['done']
+    assert read_jsonl(tmp_path / 't1.jsonl') == TABLE_ROWS['Table1']
+    assert read_jsonl(tmp_path / 't2.jsonl') == TABLE_ROWS['Table2']
+    with open(tmp_path / 'manifest.json') as f:
+        assert json.load(f) == manifest
+
+    with pytest.raises(ValueError):
+        export_snapshot(FakeBase(), str(tmp_path), page_size=100)
+    # the server returns at most 1000 rows per request
+    with pytest.raises(ValueError):
+        export_snapshot(FakeBase(), str(tmp_path / 'large'), page_size=5000)
+
+
+def test_export_snapshot_resumes(tmp_path):
+    manifest = export_snapshot(FakeBase(fail_at=('Table1', 20)), str(tmp_path), page_size=10)
+    assert manifest['tables']['t1']['pages'] == 2 and 'bad gateway' in manifest['tables']['t1']['error']
+    assert manifest['tables']['t2']['done']
+    # a half written page of the failed run is dropped on resume
+    with open(tmp_path / 't1.jsonl', 'a') as f:
+        f.write('{"_id": "partial"')
+
+    base = FakeBase()
+    manifest = export_snapshot(base, str(tmp_path), page_size=10)
+    assert base.requests[0] == ('Table1', 20) and ('Table2', 0) not in base.requests
+    assert 'error' not in manifest['tables']['t1'] and manifest['tables']['t1']['done']
+    assert read_jsonl(tmp_path / 't1.jsonl') == TABLE_ROWS['Table1']
+
+
+def test_export_snapshot_parquet(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    export_snapshot(FakeBase(fail_at=('Table1', 10)), str(tmp_path), format='parquet', page_size=10)
+    manifest = export_snapshot(FakeBase(), str(tmp_path), tables=['Table1'], format='parquet', page_size=10)
+    assert manifest['tables']['t1']['rows'] == 25
+    rows = parquet.read_table(str(tmp_path / 't1')).to_pylist()
+    assert [row['_id'] for row in rows] == ['r%d' % i for i in range(25)]
+    assert rows[1]['Status'] == 'Done' and rows[1]['Number'] == 1.0
+    assert rows[1]['Tags'] == '["x"]' and rows[0]['Tags'] is None
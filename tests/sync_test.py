@@ -0,0 +1,151 @@
+import os
+import re
+import sys
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.auth import AccessToken
+from seatable_api.main import SeaTableAPI
+from seatable_api.sync import SyncState, sync_rows
+from seatable_api.utils import split_sql_limit
+
+WATERMARK_REG = re.compile(r"`_mtime` >= '([^']+)'")
+ORDER_BY_REG = re.compile(r'ORDER BY (.+)$')
+
+
+class FakeBase(object):
+    """A table in memory, _mtime is a counter bumped by every write
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.clock = 0
+        self.queries = []
+        self.writes = []
+
+    def _save(self, row_id, row):
+        self.clock += 1
+        row.update({'_id': row_id, '_mtime': '2024-01-01T00:00:%02d' % self.clock})
+        self.table[row_id] = row
+
+    def iter_query(self, sql):
+        self.queries.append(sql)
+        match = WATERMARK_REG.search(sql)
+        rows = sorted(self.table.values(), key=lambda row: row['_mtime'])
+        return [dict(row) for row in rows if not match or row['_mtime'] >= match.group(1)]
+
+    def _result(self, items):
+        return {'success': True, 'chunks': [{'offset': 0, 'count': len(items), 'success': True}]}
+
+    def batch_append_rows(self, table_name, rows_data):
+        self.writes.append(('append', len(rows_data)))
+        for row in rows_data:
+            self._save('r%d' % (len(self.table) + 1), dict(row))
+        return self._result(rows_data)
+
+    def batch_update_rows(self, table_name, rows_data):
+        self.writes.append(('update', len(rows_data)))
+        for update in rows_data:
+            self._save(update['row_id'], dict(self.table[update['row_id']], **update['row']))
+        return self._result(rows_data)
+
+    def batch_delete_rows(self, table_name, row_ids):
+        self.writes.append(('delete', len(row_ids)))
+        for row_id in row_ids:
+            del self.table[row_id]
+        return self._result(row_ids)
+
+
+def gen_source(count):
+    return [{'Name': 'name-%d' % i, 'Number': i} for i in range(count)]
+
+
+def test_sync_rows(tmp_path):
+    base = FakeBase()
+    state_path = str(tmp_path / 'state.json')
+
+    report = sync_rows(base, 'Table1', gen_source(5), 'Name', state_path)
+    assert (report['appended'], report['updated'], report['deleted']) == (5, 0, 0)
+
+    # the rows appended by the first run are read back once, nothing is written
+    report = sync_rows(base, 'Table1', gen_source(5), 'Name', state_path)
+    assert report['fetched'] == 5 and base.writes == [('append', 5)]
+
+    # later runs only read the rows at the watermark
+    source = gen_source(6)
+    source[2]['Number'] = 20.0
+    report = sync_rows(base, 'Table1', source, 'Name', state_path)
+    assert report['fetched'] == 1
+    assert base.writes[1:] == [('append', 1), ('update', 1)]
+    assert "WHERE `_mtime` >= '2024-01-01T00:00:05'" in base.queries[-1]
+
+    # a changed number that compares equal is not written again
+    source[2]['Number'] = 20
+    report = sync_rows(base, 'Table1', source, 'Name', state_path)
+    assert (report['appended'], report['updated']) == (0, 0)
+
+    report = sync_rows(base, 'Table1', source[1:], 'Name', state_path, delete_missing=True)
+    assert report['deleted'] == 1
+    assert sorted(row['Name'] for row in base.table.values()) == sorted(row['Name'] for row in source[1:])
+    state = SyncState.load(state_path, 'Table1', 'Name', ['Number'])
+    assert set(state.rows) == set(row['Name'] for row in source[1:])
+
+
+def test_sync_rows_follows_edits_in_seatable(tmp_path):
+    base = FakeBase()
+    state_path = str(tmp_path / 'state.json')
+    sync_rows(base, 'Table1', gen_source(3), 'Name', state_path)
+    sync_rows(base, 'Table1', gen_source(3), 'Name', state_path)
+
+    # someone renames a row and edits another one in seatable
+    base._save('r1', dict(base.table['r1'], Name='renamed'))
+    base._save('r2', dict(base.table['r2'], Number=100))
+    report = sync_rows(base, 'Table1', gen_source(3), 'Name', state_path, delete_missing=True)
+    assert (report['appended'], report['updated'], report['deleted']) == (1, 1, 1)
+    assert 'r1' not in base.table and base.table['r2']['Number'] == 1
+
+
+class PagedBase(FakeBase):
+    """Rows of one batch share their _mtime, and iter_query pages through
+    query like SeaTableAPI does. Rows tied in the ORDER BY come in another
+    order on every page
+    """
+
+    is_authed = True
+    jwt_token = None
+    iter_query_pages = SeaTableAPI.iter_query
+
+    def __init__(self):
+        super(PagedBase, self).__init__()
+        self.access_token = AccessToken()
+
+    def batch_append_rows(self, table_name, rows_data):
+        self.writes.append(('append', len(rows_data)))
+        self.clock += 1
+        for row in rows_data:
+            row_id = 'r%02d' % (len(self.table) + 1)
+            self.table[row_id] = dict(row, _id=row_id, _mtime='2024-01-01T00:00:%02d' % self.clock)
+        return self._result(rows_data)
+
+    def iter_query(self, sql):
+        return self.iter_query_pages(sql, page_size=4, prefetch=0)
+
+    def query(self, sql, convert=True):
+        self.queries.append(sql)
+        base_sql, offset, limit = split_sql_limit(sql)
+        names = [name.strip(' `') for name in ORDER_BY_REG.search(base_sql).group(1).split(',')]
+        rows = sorted(self.table.values(), key=lambda row: row['_id'], reverse=(offset // limit) % 2 == 1)
+        rows.sort(key=lambda row: [row[name] for name in names])
+        return [dict(row) for row in rows[offset:offset + limit]]
+
+
+def test_sync_rows_reads_tied_mtimes_across_pages(tmp_path):
+    base = PagedBase()
+    state_path = str(tmp_path / 'state.json')
+    sync_rows(base, 'Table1', gen_source(10), 'Name', state_path)
+    report = sync_rows(base, 'Table1', gen_source(10), 'Name', state_path)
+    # no row was missed on a page boundary and appended twice
+    assert base.writes == [('append', 10)]
+    assert len(base.table) == 10
+    assert report['fetched'] == 10
+    assert 'ORDER BY `_mtime`, `_id` LIMIT 4 OFFSET 4' in base.queries[2]
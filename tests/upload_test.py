@@ -0,0 +1,149 @@
+import io
+import json
+import os
+import re
+import sys
+
+import requests
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.dedup import UploadIndex
+from seatable_api.main import SeaTableAPI
+from seatable_api.upload import MultipartBody
+
+DTABLE_UUID = '6a4b12d7-5ab8-4d8e-9d6f-6c59f5b4e3a1'
+FILENAME_REG = re.compile(rb'filename="([^"]*)"\r\nContent-Type: [^\r]*\r\n\r\n')
+
+
+def read_all(body, block_size):
+    chunks = []
+    while True:
+        chunk = body.read(block_size)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def test_multipart_body():
+    content = os.urandom(10000)
+    body = MultipartBody({'parent_dir': '/asset', 'replace': 0}, 'file', 'a "b".jpg', io.BytesIO(content))
+    data = read_all(body, 777)
+    assert len(body) == len(data)
+    boundary = body.content_type.split('boundary=')[1].encode()
+    assert data.startswith(b'--' + boundary + b'\r\nContent-Disposition: form-data; name="parent_dir"\r\n\r\n/asset\r\n')
+    assert b'filename="a %22b%22.jpg"' in data
+    assert data.endswith(content + b'\r\n--' + boundary + b'--\r\n')
+
+    # rewound for a retry
+    assert body.seek(0) == 0 and body.tell() == 0
+    assert body.read() == data
+
+
+class FakeSession(object):
+    """Hands out upload links, the first one expires after `expire_after` uploads.
+    remote_files is the file list of the custom folder.
+    """
+
+    def __init__(self, expire_after=None, remote_files=()):
+        self.expire_after = expire_after
+        self.remote_files = list(remote_files)
+        self.links = 0
+        self.uploads = []
+
+    def _response(self, status_code, content):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = content
+        return response
+
+    def get(self, url, params=None, **kwargs):
+        if url.endswith('/custom/app-asset-dir/'):
+            return self._response(200, json.dumps({'dir_list': [], 'file_list': self.remote_files}).encode())
+        if url.endswith('/custom/app-asset-file/'):
+            return self._response(200, json.dumps({
+                'dirent': {'obj_name': params['name'], 'uuid': 'uuid-' + params['name'], 'file_size': 1}
+            }).encode())
+        self.links += 1
+        return self._response(200, (
+            '{"upload_link": "http://stub/upload-%d", "parent_path": "/asset", '
+            '"img_relative_path": "images/2024-01", "file_relative_path": "files/2024-01"}' % self.links
+        ).encode())
+
+    def post(self, url, data=None, **kwargs):
+        if url.startswith('http://stub/upload-1') and self.expire_after is not None and \
+                len(self.uploads) >= self.expire_after:
+            return self._response(403, b'Access denied')
+        body = data.read()
+        match = FILENAME_REG.search(body)
+        self.uploads.append((match.group(1).decode(), b'name="replace"\r\n\r\n1' in body))
+        # the file is followed by the 40 bytes of the closing boundary
+        return self._response(200, b'[{"name": "%s", "size": %d}]' % (match.group(1), len(body) - match.end() - 40))
+
+
+def gen_base(session):
+    base = SeaTableAPI('token', 'http://stub', session=session)
+    base.is_authed = True
+    base.dtable_uuid = DTABLE_UUID
+    base.workspace_id = 1
+    return base
+
+
+def test_upload_files(tmp_path):
+    file_path = str(tmp_path / 'local.txt')
+    with open(file_path, 'wb') as f:
+        f.write(b'x' * 100)
+    session = FakeSession(expire_after=2)
+    base = gen_base(session)
+
+    files = [file_path, ('a.png', b'a' * 10), ('b.png', b'b' * 20), ('c.png', str(tmp_path / 'missing'))]
+    results = base.upload_files(files, file_type='image', workers=1)
+    assert [info['name'] for info in results] == ['local.txt', 'a.png', 'b.png', 'c.png']
+    assert [info['size'] for info in results[:3]] == [100, 10, 20]
+    assert results[0]['url'] == 'http://stub/workspace/1/asset/%s/images/2024-01/local.txt' % DTABLE_UUID
+    assert results[3]['url'] is None and 'missing' in results[3]['error']
+    # one link for the batch, and one more once it expired
+    assert session.links == 2
+
+
+def test_upload_deduplicates(tmp_path):
+    session = FakeSession()
+    base = gen_base(session)
+    base.upload_index = UploadIndex(str(tmp_path / 'uploads.sqlite3'))
+
+    logo = b'logo' * 100
+    first = base.upload_bytes_file('logo.png', logo, file_type='image')
+    results = base.upload_files([('logo-%d.png' % i, logo) for i in range(5)], file_type='image', workers=3)
+    assert results == [first] * 5
+    assert session.uploads == [('logo.png', False)]
+
+    # another base on the same index file, or a different asset type, is kept apart
+    assert base.upload_bytes_file('logo.png', logo, file_type='file')['type'] == 'file'
+    base.upload_index = UploadIndex(str(tmp_path / 'uploads.sqlite3'))
+    assert base.upload_bytes_file('again.png', logo, file_type='image') == first
+    assert len(session.uploads) == 2
+
+
+def test_sync_custom_folder(tmp_path):
+    local_dir = tmp_path / 'local'
+    local_dir.mkdir()
+    for name, content in (('same.txt', b'1'), ('changed.txt', b'22'), ('new.txt', b'333')):
+        with open(str(local_dir / name), 'wb') as f:
+            f.write(content)
+    session = FakeSession(remote_files=[{'name': 'same.txt', 'size': 1}, {'name': 'changed.txt'}])
+    base = gen_base(session)
+    base.upload_index = UploadIndex(':memory:')
+
+    result = base.sync_custom_folder(str(local_dir), '/logos')
+    assert result['unchanged'] == ['same.txt']
+    assert [info['name'] for info in result['uploaded']] == ['changed.txt', 'new.txt']
+    assert sorted(session.uploads) == [('changed.txt', True), ('new.txt', False)]
+    assert session.links == 1
+
+    # the index now knows every file, only a file edited since is sent again
+    session.remote_files = [{'name': name} for name in ('same.txt', 'changed.txt', 'new.txt')]
+    with open(str(local_dir / 'same.txt'), 'wb') as f:
+        f.write(b'9')
+    result = base.sync_custom_folder(str(local_dir), '/logos')
+    assert result['unchanged'] == ['changed.txt', 'new.txt']
+    assert session.uploads[2:] == [('same.txt', True)]
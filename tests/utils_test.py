@@ -0,0 +1,128 @@
+import gc
+import os
+import sys
+
+import pytest
+import requests
+
+# sys.path = []
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from seatable_api.exception import AuthExpiredError, InvalidResponseError
+from seatable_api.utils import add_sql_order, chunk_items, convert_db_rows, get_column_converters, \
+    iter_pages, merge_batch_results, parse_response, send_in_chunks, split_sql_limit
+
+
+def gen_response(status_code, content):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+def test_chunk_items():
+    assert list(chunk_items(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunk_items([], 2)) == []
+
+
+def test_merge_batch_results():
+    merged = merge_batch_results([
+        {'inserted_row_count': 2, 'row_ids': [{'_id': 'a'}, {'_id': 'b'}], 'success': True},
+        {'inserted_row_count': 1, 'row_ids': [{'_id': 'c'}], 'success': False},
+    ])
+    assert merged == {
+        'inserted_row_count': 3,
+        'row_ids': [{'_id': 'a'}, {'_id': 'b'}, {'_id': 'c'}],
+        'success': False,
+    }
+
+
+def test_send_in_chunks():
+    def send_chunk(chunk):
+        if 'bad' in chunk:
+            raise ConnectionError(400, 'bad chunk')
+        return {'inserted_row_count': len(chunk)}
+
+    for workers in (1, 3):
+        result = send_in_chunks(['a', 'b', 'c', 'bad', 'd'], send_chunk, 2, workers=workers)
+        assert result['inserted_row_count'] == 3
+        assert [c['success'] for c in result['chunks']] == [True, False, True]
+        assert [c['offset'] for c in result['chunks']] == [0, 2, 4]
+
+    try:
+        send_in_chunks(['bad'], send_chunk, 2)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError('a batch where every chunk failed should raise')
+
+
+def test_split_sql_limit():
+    assert split_sql_limit('select * from T;') == ('select * from T', 0, None)
+    assert split_sql_limit('select * from T limit 10') == ('select * from T', 0, 10)
+    assert split_sql_limit('select * from T LIMIT 10 OFFSET 5;') == ('select * from T', 5, 10)
+    assert split_sql_limit('select * from T limit 5, 10') == ('select * from T', 5, 10)
+
+
+def test_add_sql_order():
+    assert add_sql_order('select * from T') == 'select * from T ORDER BY _id'
+    assert add_sql_order('select * from T order by Name') == 'select * from T order by Name'
+    assert add_sql_order('select Name, count(*) from T GROUP BY Name') == 'select Name, count(*) from T GROUP BY Name'
+    assert add_sql_order('select distinct Name from T') == 'select distinct Name from T'
+
+
+def test_iter_pages():
+    def fetch_page(offset, limit):
+        return list(range(offset, min(offset + limit, 25)))
+
+    for prefetch in (0, 1, 3):
+        pages = list(iter_pages(fetch_page, 10, prefetch=prefetch))
+        assert [len(page) for page in pages] == [10, 10, 5]
+        pages = list(iter_pages(fetch_page, 10, prefetch=prefetch, total=12))
+        assert sum(pages, []) == list(range(12))
+
+    # with one page prefetched nothing past the short page is requested
+    offsets = []
+    for _ in range(20):
+        list(iter_pages(lambda offset, limit: offsets.append(offset) or fetch_page(offset, limit), 10))
+    assert offsets == [0, 10, 20] * 20
+
+
+def test_convert_db_rows():
+    options = [{'id': 'a1', 'name': 'Done'}, {'id': 'b2', 'name': 'Open'}]
+    metadata = [
+        {'key': '0000', 'name': 'Status', 'type': 'single-select', 'data': {'options': options}},
+        {'key': '0001', 'name': 'Tags', 'type': 'multiple-select', 'data': {'options': options}},
+        {'key': '0002', 'name': 'Lookup', 'type': 'link-formula', 'data': {
+            'array_type': 'single-select', 'array_data': {'options': options}}},
+        {'key': '0003', 'name': 'Day', 'type': 'date', 'data': {'format': 'YYYY-MM-DD'}},
+        {'key': '0004', 'name': 'Time', 'type': 'date', 'data': {'format': 'YYYY-MM-DD HH:mm'}},
+    ]
+    results = [
+        {'_id': 'r1', '0000': 'a1', '0001': ['a1', 'b2', 'c3'], '0002': [['b2']],
+         '0003': '2024-03-01T00:00:00+08:00', '0004': '2024-03-01T09:30:15.123+00:00'},
+        {'_id': 'r2', '0000': None, '0001': [], '0002': ['a1'], '0003': '', '0004': '2024-03-01 09:30'},
+    ]
+    assert convert_db_rows(metadata, results) == [
+        {'_id': 'r1', 'Status': 'Done', 'Tags': ['Done', 'Open', 'c3'], 'Lookup': [['Open']],
+         'Day': '2024-03-01', 'Time': '2024-03-01 09:30:15'},
+        {'_id': 'r2', 'Status': None, 'Tags': [], 'Lookup': ['Done'], 'Day': None, 'Time': '2024-03-01 09:30:00'},
+    ]
+    assert get_column_converters(metadata) is get_column_converters([dict(column) for column in metadata])
+
+
+def test_parse_response():
+    assert parse_response(gen_response(200, b'{"rows": [{"Name": "\xc3\xa4"}]}')) == {'rows': [{'Name': '\xe4'}]}
+    assert parse_response(gen_response(200, b'')) is None
+    assert parse_response(gen_response(200, b' \n')) is None
+    with pytest.raises(InvalidResponseError):
+        parse_response(gen_response(200, b'<html>'))
+    with pytest.raises(AuthExpiredError):
+        parse_response(gen_response(403, b'{"error_msg": "Token expired."}'))
+    with pytest.raises(ConnectionError):
+        parse_response(gen_response(502, b'<html>'))
+
+
+def test_parse_response_leaves_gc_enabled(monkeypatch):
+    monkeypatch.setattr(gc, 'disable', lambda: pytest.fail('parse_response paused the garbage collector'))
+    content = b'{"rows": [%s]}' % b','.join([b'{"Name": "name"}'] * 100000)
+    assert len(parse_response(gen_response(200, content))['rows']) == 100000